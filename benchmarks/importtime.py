@@ -0,0 +1,109 @@
+"""Check the import time of the CLI against a budget.
+
+Usage: python benchmarks/importtime.py [--budget MS] [--runs N] [--top N]
+
+The CLI module is imported --runs times in fresh interpreters under
+``python -X importtime``, and the fastest cumulative time is compared with
+--budget milliseconds. The slowest modules of that run are listed, and the
+modules that only a scan needs must not have been imported at all. Exits with
+status 1 when either check fails, so it can guard against regressions.
+"""
+
+import argparse
+import subprocess  # noqa: S404
+import sys
+from typing import List, Tuple
+
+MODULE = "heatfile.console.application"
+
+# Only loaded once a command runs, or by some of its options.
+DEFERRED = (
+    "asyncio",
+    "bz2",
+    "click_help_colors",
+    "colorama",
+    "concurrent.futures",
+    "csv",
+    "ctypes",
+    "gzip",
+    "heatfile.console.commands.formats",
+    "heatfile.console.commands.tree",
+    "heatfile.core.scanner",
+    "json",
+    "locale",
+    "lzma",
+    "multiprocessing",
+    "socket",
+    "sqlite3",
+    "tarfile",
+    "zipfile",
+)
+
+CHECK = f"""
+import sys
+import {MODULE}
+print(",".join(name for name in {DEFERRED!r} if name in sys.modules))
+"""
+
+
+def import_once() -> Tuple[List[Tuple[int, str, bool]], List[str]]:
+    process = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", CHECK],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    # "import time: self [us] | cumulative | imported package", nested imports
+    # being indented by two more spaces per level.
+    timings = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        top_level = not name.startswith("  ")
+        timings.append((int(cumulative), name.strip(), top_level))
+    loaded = [name for name in process.stdout.strip().split(",") if name]
+    return timings, loaded
+
+
+def total(timings: List[Tuple[int, str, bool]]) -> float:
+    """Milliseconds spent importing the package, dependencies included."""
+    return (
+        sum(
+            time
+            for time, name, top_level in timings
+            if top_level and name.split(".")[0] == "heatfile"
+        )
+        / 1000
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--budget", type=float, default=60.0)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    timings, loaded = min(
+        (import_once() for _ in range(args.runs)), key=lambda run: total(run[0])
+    )
+    elapsed = total(timings)
+
+    print(f"{MODULE}: {elapsed:.1f}ms (budget {args.budget:.1f}ms)")
+    for time, name, _ in sorted(timings, reverse=True)[: args.top]:
+        print(f"{time / 1000:>8.1f}ms  {name}")
+
+    failed = False
+    if elapsed > args.budget:
+        print(f"Over budget by {elapsed - args.budget:.1f}ms.")
+        failed = True
+    if loaded:
+        print(f"Imported too early: {', '.join(loaded)}.")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Compare the memory kept by the nodes of a tree and by a NodeStore of them.
+
+Usage: python benchmarks/memory.py [--subtrees N] [--depth N] [--files N]
+                                   [--path DIR [--search STRING]]
+
+By default the tree is synthetic, built in memory: --subtrees chains of --depth
+nested directories, each holding --files files named alike in every directory.
+With --path a real directory is scanned instead, searching --search if given.
+
+The same nodes are kept once as a list of Tree objects, and once added to a
+NodeStore as they come. The memory each keeps is measured with tracemalloc,
+then both are rendered to /dev/null, the store materialising its nodes again.
+"""
+
+import argparse
+from contextlib import redirect_stdout
+import gc
+import os
+from pathlib import Path
+import time
+import tracemalloc
+from typing import Any, Callable, cast, Iterable, Iterator, Tuple
+
+from heatfile.console.commands import Tree
+from heatfile.core.scanner import Scanner
+from heatfile.core.store import NodeStore
+from synthetic import make_nodes
+
+
+def kept_memory(keep: Callable[[], Any]) -> Tuple[Any, int, int]:
+    """The memory still allocated by what keep() returns, and its peak."""
+    gc.collect()
+    tracemalloc.start()
+    kept = keep()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return kept, current, peak
+
+
+def render_time(nodes: Iterable[Tree]) -> float:
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        start = time.perf_counter()
+        Tree._write_lines(nodes)
+        return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--subtrees", type=int, default=200)
+    parser.add_argument("--depth", type=int, default=10)
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--path", type=Path, default=None)
+    parser.add_argument("--search", default=None)
+    args = parser.parse_args()
+
+    def nodes() -> Iterator[Tree]:
+        if args.path is None:
+            return make_nodes(args.subtrees, args.depth, args.files)
+        scanner = Scanner(args.search, node_class=Tree, use_cache=False)
+        return cast(Iterator[Tree], iter(scanner.scan(args.path)))
+
+    def store() -> NodeStore:
+        kept = NodeStore(Tree)
+        kept.extend(nodes())
+        return kept
+
+    objects, objects_size, _ = kept_memory(lambda: list(nodes()))
+    count = len(objects)
+    print(f"{count:,} nodes")
+    print(
+        f"Tree objects: {objects_size / 2 ** 20:,.1f} MB,"
+        + f" {objects_size / count:,.0f} bytes/node,"
+        + f" rendered in {render_time(objects):.2f}s"
+    )
+    del objects
+
+    stored, store_size, store_peak = kept_memory(store)
+    print(
+        f"NodeStore:    {store_size / 2 ** 20:,.1f} MB,"
+        + f" {store_size / count:,.0f} bytes/node"
+        + f" (peak {store_peak / 2 ** 20:,.1f} MB),"
+        + f" rendered in {render_time(stored):.2f}s"
+    )
+    print(f"{objects_size / store_size:.1f}x less memory")
+
+
+if __name__ == "__main__":
+    main()
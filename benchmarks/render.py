@@ -0,0 +1,82 @@
+"""Time the rendering of a synthetic 1M-node, depth-30 tree.
+
+Usage: python benchmarks/render.py [--subtrees N] [--depth N] [--files N]
+
+Nodes are built in memory, so only _mount_tree_line and the output are
+measured. The tree has --subtrees chains of --depth nested directories, each
+holding --files files, and is rendered both with the previous parent-chain walk
+and with Tree's cached prefixes. Writing the lines to /dev/null one print()
+at a time is then compared with Tree's batched writes.
+"""
+
+import argparse
+from contextlib import redirect_stdout
+import io
+import os
+import time
+from typing import Callable, List
+
+from heatfile.console.commands import Tree
+from synthetic import make_nodes
+
+
+def walk_parents(line: Tree) -> str:
+    # Rendering before prefixes were cached: one walk up the parents per line.
+    if line.parent_path is None:
+        return line.display_name
+
+    filename_prefix = (
+        line._filename_prefix_last if line.is_last else line._filename_prefix_middle
+    )
+    parts = [f"{filename_prefix} {line.display_name} "]
+    previous_parent = line.parent_path
+    while previous_parent and previous_parent.parent_path is not None:
+        parts.append(
+            line._parent_prefix_middle
+            if previous_parent.is_last
+            else line._parent_prefix_last
+        )
+        previous_parent = previous_parent.parent_path
+    return "".join(reversed(parts))
+
+
+def measure(name: str, nodes: List[Tree], render: Callable[[Tree], str]) -> None:
+    output = io.StringIO()
+    start = time.perf_counter()
+    for node in nodes:
+        output.write(render(node) + "\n")
+    elapsed = time.perf_counter() - start
+    print(f"{name}: {elapsed:.2f}s, {len(nodes) / elapsed:,.0f} lines/s")
+
+
+def measure_output(name: str, nodes: List[Tree], write: Callable) -> None:
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        start = time.perf_counter()
+        write(nodes)
+        elapsed = time.perf_counter() - start
+    print(f"{name}: {elapsed:.2f}s, {len(nodes) / elapsed:,.0f} lines/s")
+
+
+def print_lines(nodes: List[Tree]) -> None:
+    for node in nodes:
+        print(node._mount_tree_line())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--subtrees", type=int, default=1100)
+    parser.add_argument("--depth", type=int, default=30)
+    parser.add_argument("--files", type=int, default=30)
+    args = parser.parse_args()
+
+    sizes = args.subtrees, args.depth, args.files
+    nodes = list(make_nodes(*sizes))
+    print(f"{len(nodes):,} nodes, depth {args.depth}")
+    measure("parent walk", nodes, walk_parents)
+    measure("cached prefix", nodes, Tree._mount_tree_line)
+    measure_output("print per line", list(make_nodes(*sizes)), print_lines)
+    measure_output("batched writes", list(make_nodes(*sizes)), Tree._write_lines)
+
+
+if __name__ == "__main__":
+    main()
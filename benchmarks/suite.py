@@ -0,0 +1,244 @@
+"""Measure walking, searching and rendering on synthetic trees.
+
+Usage: python benchmarks/suite.py [--scenario NAME ...] [--scale X] [--repeat N]
+                                  [--save PATH] [--compare PATH]
+
+Each scenario generates a tree in a temporary directory:
+
+  wide    50 directories of 400 small text files
+  deep    a chain of 400 nested directories of 20 files each
+  small   100 directories of 500 files of 100 bytes
+  huge    4 text files of 32 MB
+  binary  5,000 files of 4 kB, four in five of them binary
+
+--scale multiplies the number of files, or the size of the huge ones. Every
+phase then runs in a fresh interpreter, so its peak RSS is its own:
+
+  walk    Scanner(), tree only: files/s
+  search  Scanner("needle") without the cache: files/s and MB/s read
+  render  Tree._write_lines() to /dev/null: lines/s
+
+Times are the best of --repeat runs. Results are saved as JSON (by default in
+.benchmarks/, named after the date and commit) and --compare prints the change
+of every metric against a previous result file.
+"""
+
+import argparse
+from contextlib import redirect_stdout
+import json
+import os
+from pathlib import Path
+import platform
+import resource
+import shutil
+import subprocess  # noqa: S404
+import sys
+import tempfile
+import time
+from typing import Callable, cast, Dict, List, Optional
+
+from synthetic import TEXT_LINE, write_files
+
+SEARCH = "needle"
+PHASES = ("walk", "search", "render")
+UNITS = {
+    "files_per_s": "files/s",
+    "mb_per_s": "MB/s",
+    "lines_per_s": "lines/s",
+    "peak_rss_mb": "MB peak RSS",
+}
+
+Metrics = Dict[str, float]
+
+
+def make_wide(root: Path, scale: float) -> int:
+    return sum(
+        write_files(root / f"dir_{index}", int(400 * scale), 256) for index in range(50)
+    )
+
+
+def make_deep(root: Path, scale: float) -> int:
+    files = 0
+    directory = root
+    for _ in range(400):
+        directory = directory / "d"
+        files += write_files(directory, int(20 * scale), 256)
+    return files
+
+
+def make_small(root: Path, scale: float) -> int:
+    return sum(
+        write_files(root / f"dir_{index}", int(500 * scale), 100)
+        for index in range(100)
+    )
+
+
+def make_huge(root: Path, scale: float) -> int:
+    root.mkdir(parents=True, exist_ok=True)
+    block = TEXT_LINE * 16384
+    size = int(32 * 1024 * 1024 * scale)
+    for index in range(4):
+        with open(root / f"huge_{index}.log", "wb") as file:
+            for _ in range(size // len(block)):
+                file.write(block)
+    return 4
+
+
+def make_binary(root: Path, scale: float) -> int:
+    return sum(
+        write_files(root / f"dir_{index}", int(250 * scale), 4096, binary_every=5)
+        for index in range(20)
+    )
+
+
+SCENARIOS = {
+    "wide": make_wide,
+    "deep": make_deep,
+    "small": make_small,
+    "huge": make_huge,
+    "binary": make_binary,
+}  # type: Dict[str, Callable[[Path, float], int]]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def best_time(function: Callable[[], object], repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def measure(phase: str, root: Path, repeat: int) -> Metrics:
+    """Run one phase in this process; called in a child by run_phase()."""
+    from heatfile.console.commands import Tree
+    from heatfile.core.scanner import Scanner
+
+    files = sum(len(names) for _, _, names in os.walk(root))
+    if phase == "walk":
+        elapsed = best_time(lambda: list(Scanner().scan(root)), repeat)
+        return {"files_per_s": files / elapsed, "seconds": elapsed}
+
+    if phase == "search":
+        size = sum(
+            os.path.getsize(os.path.join(directory, name))
+            for directory, _, names in os.walk(root)
+            for name in names
+        )
+        scanner = Scanner(SEARCH, use_cache=False)
+        elapsed = best_time(lambda: list(scanner.scan(root)), repeat)
+        return {
+            "files_per_s": files / elapsed,
+            "mb_per_s": size / elapsed / 1024 / 1024,
+            "seconds": elapsed,
+        }
+
+    nodes = cast(List[Tree], list(Scanner(node_class=Tree).scan(root)))
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        elapsed = best_time(lambda: Tree._write_lines(nodes), repeat)
+    return {"lines_per_s": len(nodes) / elapsed, "seconds": elapsed}
+
+
+def run_phase(phase: str, root: Path, repeat: int) -> Metrics:
+    command = [sys.executable, __file__, "--measure", phase, str(root)]
+    output = subprocess.run(  # noqa: S603
+        command + ["--repeat", str(repeat)],
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    ).stdout
+    return json.loads(output)
+
+
+def run_scenario(name: str, scale: float, repeat: int) -> Dict[str, Metrics]:
+    root = Path(tempfile.mkdtemp(prefix=f"heatfile-bench-{name}-"))
+    try:
+        SCENARIOS[name](root / name, scale)
+        return {phase: run_phase(phase, root / name, repeat) for phase in PHASES}
+    finally:
+        shutil.rmtree(root)
+
+
+def revision() -> Optional[str]:
+    try:
+        return subprocess.run(  # noqa: S603, S607
+            ["git", "rev-parse", "--short", "HEAD"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(results: Dict[str, Dict[str, Metrics]], previous: Optional[dict]) -> None:
+    before = previous["scenarios"] if previous else {}
+    for name, phases in results.items():
+        print(name)
+        for phase, metrics in phases.items():
+            cells = []
+            for metric, unit in UNITS.items():
+                if metric not in metrics:
+                    continue
+                value = metrics[metric]
+                cell = f"{value:,.1f} {unit}"
+                old = before.get(name, {}).get(phase, {}).get(metric)
+                if old:
+                    cell += f" ({(value - old) / old:+.1%})"
+                cells.append(cell)
+            print(f"  {phase:<7}" + ", ".join(cells))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS))
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None)
+    parser.add_argument("--measure", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        phase, root = args.measure
+        metrics = measure(phase, Path(root), args.repeat)
+        metrics["peak_rss_mb"] = peak_rss_mb()
+        print(json.dumps(metrics))
+        return
+
+    previous = json.loads(args.compare.read_text()) if args.compare else None
+    results = {
+        name: run_scenario(name, args.scale, args.repeat)
+        for name in args.scenario or SCENARIOS
+    }
+    report(results, previous)
+
+    commit = revision()
+    save = args.save or Path(".benchmarks") / (
+        time.strftime("%Y%m%d-%H%M%S") + (f"-{commit}" if commit else "") + ".json"
+    )
+    save.parent.mkdir(parents=True, exist_ok=True)
+    document = {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": args.scale,
+        "repeat": args.repeat,
+        "scenarios": results,
+    }  # type: Dict[str, object]
+    save.write_text(json.dumps(document, indent=2) + "\n")
+    print(f"Saved to {save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Synthetic trees shared by the benchmarks: nodes built in memory, and files
+written to disk."""
+
+from pathlib import Path
+from typing import Iterator
+
+from heatfile.console.commands import Tree
+
+TEXT_LINE = b"lorem ipsum dolor sit amet, consectetur needle adipiscing elit\n"
+BINARY_HEAD = b"\x89PNG\r\n\x1a\n"
+
+
+def make_nodes(subtrees: int, depth: int, files: int) -> Iterator[Tree]:
+    """The nodes of subtrees chains of depth nested directories, each holding
+    files files named alike in every directory."""
+    root = Tree("/synthetic/root", is_dir=True)
+    yield root
+    for subtree in range(subtrees):
+        parent = root
+        for level in range(depth):
+            is_last = subtree == subtrees - 1 if level == 0 else True
+            name = f"directory_{subtree}" if level == 0 else f"level_{level}"
+            directory = Tree(parent.path / name, parent, is_last, is_dir=True)
+            yield directory
+            for index in range(files):
+                yield Tree(
+                    directory.path / f"file_{index}.txt",
+                    directory,
+                    index == files - 1 and level == depth - 1,
+                    is_dir=False,
+                    references=index,
+                )
+            parent = directory
+
+
+def write_files(directory: Path, count: int, size: int, binary_every: int = 0) -> int:
+    """Write count files of size bytes, all of text or, with binary_every, all
+    binary but one in every binary_every, and return their number."""
+    directory.mkdir(parents=True, exist_ok=True)
+    text = (TEXT_LINE * (size // len(TEXT_LINE) + 1))[:size]
+    binary = (BINARY_HEAD + bytes(range(256)) * (size // 256 + 1))[:size]
+    for index in range(count):
+        is_binary = binary_every and index % binary_every
+        (directory / f"file_{index}.dat").write_bytes(binary if is_binary else text)
+    return count
+
+
+def make_tree(root: Path, width: int, depth: int, files: int) -> int:
+    """Write a tree of width directories per level, depth levels deep, with files
+    one-line text files in each directory, and return its number of entries."""
+    entries = write_files(root, files, len(TEXT_LINE))
+    if depth > 0:
+        for index in range(width):
+            entries += 1 + make_tree(root / f"dir_{index}", width, depth - 1, files)
+    return entries
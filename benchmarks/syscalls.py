@@ -0,0 +1,90 @@
+"""Count the stat calls made while rendering a synthetic tree.
+
+Usage: python benchmarks/syscalls.py [--strace] [--search STRING] [--width N] ...
+
+By default os.stat/os.lstat are wrapped in-process, which covers every stat made
+through pathlib. With --strace the CLI runs under ``strace -c`` instead, which
+also counts the calls made by C code (getdents64, newfstatat, statx, ...).
+"""
+
+import argparse
+from contextlib import redirect_stdout
+import io
+import os
+from pathlib import Path
+import shutil
+import subprocess  # noqa: S404
+import sys
+import tempfile
+from typing import Any, Callable, Dict, Optional
+from unittest import mock
+
+from heatfile.console.commands import Tree
+from synthetic import make_tree
+
+
+def count_in_process(root: Path, search: Optional[str]) -> Dict[str, int]:
+    calls = {"stat": 0, "lstat": 0}
+
+    def counted(name: str, function: Callable) -> Callable:
+        def wrapper(*args, **kwargs):  # type: (*Any, **Any) -> Any
+            calls[name] += 1
+            return function(*args, **kwargs)
+
+        return wrapper
+
+    with mock.patch("os.stat", counted("stat", os.stat)), mock.patch(
+        "os.lstat", counted("lstat", os.lstat)
+    ), redirect_stdout(io.StringIO()):
+        Tree.build_tree(root, search)
+    return calls
+
+
+def count_with_strace(root: Path, search: Optional[str]) -> str:
+    command = [
+        "strace",
+        "-f",
+        "-c",
+        "-e",
+        "trace=%stat,getdents64,openat",
+        sys.executable,
+        "-m",
+        "heatfile",
+        "tree",
+        "--path",
+        str(root),
+    ]
+    if search is not None:
+        command += ["--search", search]
+    result = subprocess.run(  # noqa: S603
+        command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    return result.stderr
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--strace", action="store_true")
+    parser.add_argument("--search", default=None)
+    parser.add_argument("--width", type=int, default=4)
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument("--files", type=int, default=8)
+    args = parser.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix="heatfile-bench-"))
+    try:
+        entries = make_tree(root, args.width, args.depth, args.files)
+        print(f"{entries} entries")
+        if args.strace:
+            if shutil.which("strace") is None:
+                sys.exit("strace is not installed")
+            print(count_with_strace(root, args.search))
+        else:
+            for name, count in count_in_process(root, args.search).items():
+                print(f"{name}: {count} calls, {count / entries:.2f} per entry")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
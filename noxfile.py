@@ -6,7 +6,7 @@ from nox.sessions import Session
 
 package = "heatfile"
 nox.options.sessions = "lint", "safety", "mypy", "pytype", "tests"
-locations = "src", "tests", "noxfile.py"
+locations = "src", "tests", "benchmarks", "noxfile.py"
 
 
 def install_with_constraints(session: Session, *args: str, **kwargs: Any) -> None:
@@ -110,3 +110,17 @@ def tests(session: Session) -> None:
         session, "coverage[toml]", "pytest", "pytest-cov", "pytest-mock"
     )
     session.run("pytest", *args)
+
+
+@nox.session(python="3.8")
+def importtime(session: Session) -> None:
+    """Check the import time of the CLI against its budget."""
+    session.run("poetry", "install", "--no-dev", external=True)
+    session.run("python", "benchmarks/importtime.py", *session.posargs)
+
+
+@nox.session(python="3.8")
+def benchmarks(session: Session) -> None:
+    """Measure walking, searching and rendering on synthetic trees."""
+    session.run("poetry", "install", "--no-dev", external=True)
+    session.run("python", "benchmarks/suite.py", *session.posargs)
@@ -1,17 +1,65 @@
+from contextlib import contextmanager
 from os import getcwd
 from pathlib import Path
-from typing import Optional, Union
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 import click
-from click_help_colors import HelpColorsGroup
 
 from heatfile.__version__ import __version__
-from .commands.tree import Tree
+from heatfile.core.defaults import (
+    BACKENDS,
+    DEFAULT_BUFFER_SIZE,
+    DEFAULT_IN_FLIGHT,
+    DEFAULT_INTERVAL,
+    DEFAULT_MAX_SIZE,
+    FORMATS,
+    POOLS,
+)
 
 __help_message = "Display list of commands and informations"
 
 
-@click.group(cls=HelpColorsGroup, help_headers_color="green", help_options_color="blue")
+class _HelpColors:
+    # Same help as click_help_colors, which is only imported to display it.
+    help_headers_color = "green"
+    help_options_color = "blue"
+    help_options_custom_colors = None
+
+    def get_help(self, ctx: click.Context) -> str:
+        from click_help_colors import HelpColorsMixin
+
+        return HelpColorsMixin.get_help(self, ctx)
+
+
+@contextmanager
+def _profiled(path: Optional[str]) -> Iterator[None]:
+    # cProfile is only imported when a profile is asked for.
+    if path is None:
+        yield
+        return
+
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+
+class _HelpColorsCommand(_HelpColors, click.Command):
+    pass
+
+
+class _HelpColorsGroup(_HelpColors, click.Group):
+    def command(self, *args, **kwargs):  # type: (*Any, **Any) -> Any
+        kwargs.setdefault("cls", _HelpColorsCommand)
+        return super().command(*args, **kwargs)
+
+
+@click.group(cls=_HelpColorsGroup)
 @click.version_option(version=__version__, help="Display current version")
 @click.help_option("--help", "-h", help=__help_message)
 def cli() -> None:
@@ -32,9 +80,400 @@ def cli() -> None:
     "--search",
     "-s",
     type=click.STRING,
+    multiple=True,
+    help="Search string; repeat it to count several strings in one pass",
+)
+@click.option(
+    "--patterns-file",
+    type=click.Path(exists=True, dir_okay=False),
     default=None,
+    help="File with one search string per line, counted with the others",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=0),
+    default=1,
+    show_default=True,
+    help="Number of parallel workers used to search files, or to list directories"
+    " without a search (0 uses every CPU)",
+)
+@click.option(
+    "--pool",
+    type=click.Choice(POOLS),
+    default="process",
+    show_default=True,
+    help="Worker pool used when --jobs is greater than one",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(BACKENDS),
+    default="sync",
     show_default=True,
-    help="Search string",
+    help="async lists directories and reads files concurrently, for network"
+    " mounts; --jobs and --pool are then ignored",
+)
+@click.option(
+    "--in-flight",
+    type=click.IntRange(min=1),
+    default=DEFAULT_IN_FLIGHT,
+    show_default=True,
+    help="Most file system calls running at once with the async backend",
+)
+@click.option(
+    "--fixed-strings",
+    "-F",
+    "mode",
+    flag_value="fixed",
+    help="Search the string literally",
+)
+@click.option(
+    "--regex",
+    "-E",
+    "mode",
+    flag_value="regex",
+    help="Search the string as a regular expression",
 )
-def tree(path, search):  # type: (Path, Union[Optional[str], None]) -> None
-    Tree.build_tree(Path(path), search)
+@click.option(
+    "--buffer-size",
+    type=click.IntRange(min=1),
+    default=DEFAULT_BUFFER_SIZE,
+    show_default=True,
+    help="Bytes read at a time; bigger files are memory-mapped or streamed",
+)
+@click.option(
+    "--mmap/--no-mmap",
+    "use_mmap",
+    default=True,
+    show_default=True,
+    help="Memory-map files bigger than the buffer instead of streaming them",
+)
+@click.option(
+    "--cache/--no-cache",
+    "use_cache",
+    default=True,
+    show_default=True,
+    help="Reuse the counts of unchanged files from previous searches",
+)
+@click.option(
+    "--rebuild-cache",
+    is_flag=True,
+    default=False,
+    help="Drop the cached counts and index before searching",
+)
+@click.option(
+    "--cache-size",
+    type=click.IntRange(min=1),
+    default=DEFAULT_MAX_SIZE // (1024 * 1024),
+    show_default=True,
+    help="Maximum size of the cache in MiB",
+)
+@click.option(
+    "--exclude",
+    "excludes",
+    multiple=True,
+    metavar="GLOB",
+    help="Skip files and directories matching a gitignore-style glob (repeatable)",
+)
+@click.option(
+    "--include",
+    "includes",
+    multiple=True,
+    metavar="GLOB",
+    help="Only show files matching a gitignore-style glob (repeatable)",
+)
+@click.option(
+    "--ignore/--no-ignore",
+    "use_ignore_files",
+    default=True,
+    show_default=True,
+    help="Skip the files matched by .gitignore and .ignore files",
+)
+@click.option(
+    "--binary",
+    is_flag=True,
+    default=False,
+    help="Also search binary files, which are skipped by default",
+)
+@click.option(
+    "--search-compressed",
+    is_flag=True,
+    default=False,
+    help="Search gzip, bzip2 and xz files decompressed, and the members of zip"
+    " and tar archives",
+)
+@click.option(
+    "--top",
+    type=click.IntRange(min=0),
+    default=0,
+    show_default=True,
+    help="Report the N files and directories with the most references",
+)
+@click.option(
+    "--heat",
+    is_flag=True,
+    default=False,
+    help="Colour the references by how many there are",
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(FORMATS),
+    default="text",
+    show_default=True,
+    help="Output format; json, ndjson and csv write one record per node",
+)
+@click.option(
+    "--show-matches",
+    is_flag=True,
+    default=False,
+    help="Show the line and column of every match",
+)
+@click.option(
+    "--context",
+    "-C",
+    type=click.IntRange(min=0),
+    default=0,
+    show_default=True,
+    help="Lines of context shown around each match",
+)
+@click.option(
+    "--max-matches-per-file",
+    "max_matches",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Stop searching a file after this many matches",
+)
+@click.option(
+    "--follow-symlinks/--no-follow",
+    default=True,
+    show_default=True,
+    help="Walk into linked directories and search linked files, each only once",
+)
+@click.option(
+    "--one-file-system",
+    is_flag=True,
+    default=False,
+    help="Don't walk into directories on other file systems than the path's",
+)
+@click.option(
+    "--max-depth",
+    type=click.IntRange(min=0),
+    default=None,
+    help="Only descend this many directories below the path",
+)
+@click.option(
+    "--max-filesize",
+    type=click.IntRange(min=0),
+    default=None,
+    help="Skip the files bigger than this many bytes",
+)
+@click.option(
+    "--max-files",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Stop after walking this many files",
+)
+@click.option(
+    "--files-with-matches",
+    "-l",
+    is_flag=True,
+    default=False,
+    help="Only list the files that match, reading each up to its first match",
+)
+@click.option(
+    "--first-match",
+    is_flag=True,
+    default=False,
+    help="Stop at the first file that matches",
+)
+@click.option(
+    "--watch",
+    is_flag=True,
+    default=False,
+    help="Keep the references up to date as files change, until interrupted",
+)
+@click.option(
+    "--watch-interval",
+    type=click.FloatRange(min=0),
+    default=DEFAULT_INTERVAL,
+    show_default=True,
+    help="Seconds between two checks for changes in watch mode",
+)
+@click.option(
+    "--stats",
+    is_flag=True,
+    default=False,
+    help="Report the time spent walking, reading, matching and writing, and the"
+    " slowest files",
+)
+@click.option(
+    "--profile",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="Write cProfile data of the run to this file",
+)
+@click.option(
+    "--daemon",
+    is_flag=True,
+    default=False,
+    help="Have the daemon started by heatfile serve answer, from memory",
+)
+@click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Socket of the daemon, by default in $XDG_RUNTIME_DIR",
+)
+def tree(
+    path,
+    search,
+    patterns_file,
+    jobs,
+    pool,
+    backend,
+    in_flight,
+    mode,
+    buffer_size,
+    use_mmap,
+    use_cache,
+    rebuild_cache,
+    cache_size,
+    excludes,
+    includes,
+    use_ignore_files,
+    binary,
+    search_compressed,
+    top,
+    heat,
+    output_format,
+    show_matches,
+    context,
+    max_matches,
+    follow_symlinks,
+    one_file_system,
+    max_depth,
+    max_filesize,
+    max_files,
+    files_with_matches,
+    first_match,
+    watch,
+    watch_interval,
+    stats,
+    profile,
+    daemon,
+    socket_path,
+):  # type: (Path, Tuple[str, ...], Optional[str], int, str, str, int, Optional[str], int, bool, bool, bool, int, Tuple[str, ...], Tuple[str, ...], bool, bool, bool, int, bool, str, bool, int, Optional[int], bool, bool, Optional[int], Optional[int], Optional[int], bool, bool, bool, float, bool, Optional[str], bool, Optional[str]) -> None  # noqa: B950
+    patterns = list(search)
+    if patterns_file is not None:
+        with open(patterns_file, encoding="utf-8") as file:
+            patterns.extend(line.rstrip("\r\n") for line in file if line.strip())
+    search_string = (
+        None if not patterns else patterns[0] if len(patterns) == 1 else patterns
+    )  # type: Union[None, str, List[str]]
+    if watch and search_string is None:
+        raise click.UsageError("--watch needs a string to search.")
+    if watch and output_format != "text":
+        raise click.UsageError("--watch only supports the text format.")
+    if (files_with_matches or first_match) and search_string is None:
+        raise click.UsageError("--files-with-matches and --first-match need a string.")
+    if watch and (files_with_matches or first_match):
+        raise click.UsageError("--watch counts every reference, not only the first.")
+    if search_compressed and search_string is None:
+        raise click.UsageError("--search-compressed needs a string to search.")
+    if stats and output_format == "csv":
+        raise click.UsageError("--stats isn't supported by the csv format.")
+    if daemon and (watch or profile):
+        raise click.UsageError("--daemon can't be combined with --watch or --profile.")
+
+    options = dict(
+        jobs=jobs,
+        pool=pool,
+        backend=backend,
+        in_flight=in_flight,
+        mode=mode or "auto",
+        buffer_size=buffer_size,
+        use_mmap=use_mmap,
+        use_cache=use_cache,
+        rebuild_cache=rebuild_cache,
+        cache_size=cache_size * 1024 * 1024,
+        excludes=excludes,
+        includes=includes,
+        use_ignore_files=use_ignore_files,
+        skip_binary=not binary,
+        search_compressed=search_compressed,
+        top=top,
+        heat=heat,
+        output_format=output_format,
+        show_matches=show_matches,
+        context=context,
+        max_matches=max_matches,
+        follow_symlinks=follow_symlinks,
+        one_file_system=one_file_system,
+        max_depth=max_depth,
+        max_filesize=max_filesize,
+        max_files=max_files,
+        files_with_matches=files_with_matches,
+        first_match=first_match,
+        watch=watch,
+        watch_interval=watch_interval,
+        stats=stats,
+    )  # type: Dict[str, Any]
+    if daemon:
+        from .daemon import default_socket_path, query
+
+        try:
+            socket_path = socket_path or default_socket_path()
+        except OSError as error:
+            raise click.ClickException(str(error)) from error
+        try:
+            status = query(socket_path, Path(path), search_string, options)
+        except OSError as error:
+            raise click.ClickException(
+                f"No daemon answered on {socket_path}: {error}"
+            ) from error
+        if status:
+            raise SystemExit(status)
+        return
+
+    from .commands.tree import Tree
+
+    with _profiled(profile):
+        Tree.build_tree(Path(path), search_string, **options)
+
+
+@cli.command(help="Keep trees in memory to answer tree --daemon")
+@click.help_option("--help", "-h", help=__help_message)
+@click.option(
+    "--root",
+    "-r",
+    "roots",
+    type=click.Path(exists=True, file_okay=False),
+    multiple=True,
+    help="Directory kept in memory, repeatable  [default: current directory]",
+)
+@click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Socket to listen on, by default in $XDG_RUNTIME_DIR",
+)
+def serve(roots, socket_path):  # type: (Tuple[str, ...], Optional[str]) -> None
+    from .daemon import Daemon, default_socket_path
+
+    try:
+        daemon = Daemon(
+            [Path(root) for root in roots or (getcwd(),)],
+            socket_path or default_socket_path(),
+        )
+        server = daemon.bind()
+    except OSError as error:
+        raise click.ClickException(str(error)) from error
+    daemon.warm()
+    click.echo(f"Listening on {daemon.socket_path}", err=True)
+    try:
+        daemon.serve_forever(server)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,17 @@
+from functools import lru_cache
+import os
+from typing import TextIO
+
+
+def colors_enabled(stream: TextIO) -> bool:
+    """Colour only what is written to a terminal, and never if NO_COLOR is set."""
+    return "NO_COLOR" not in os.environ and stream.isatty()
+
+
+@lru_cache(maxsize=None)
+def init_colors() -> None:
+    # Only Windows consoles need colorama to convert the codes: elsewhere it
+    # leaves the streams alone.
+    from colorama import init
+
+    init(strip=False)
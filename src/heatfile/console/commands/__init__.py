@@ -1 +1,13 @@
-from .tree import Tree  # noqa: F401
+from importlib import import_module
+from typing import Any, TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .tree import Tree  # noqa: F401
+
+
+# Imported on first access, so the CLI is built without the tree command and its
+# engine.
+def __getattr__(name: str) -> Any:
+    if name != "Tree":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return import_module(".tree", __name__).Tree
@@ -0,0 +1,164 @@
+from abc import ABC, abstractmethod
+import csv
+from io import StringIO
+import json
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Dict, Sequence, TextIO, Type, TYPE_CHECKING, Union
+
+if TYPE_CHECKING:  # pragma: no cover
+    from heatfile.core.scanner import Node, ScanResult  # noqa: F401
+
+
+class RecordWriter(ABC):
+    """Writes the nodes of a scan as records, as soon as the scan yields them.
+
+    Records are formatted into an in-memory buffer that is written out every
+    _batch_size records, so memory stays constant whatever the size of the tree.
+    """
+
+    _batch_size = 1024
+
+    def __init__(self, stream, root):  # type: (TextIO, Path) -> None
+        self.stream = stream
+        self.root = root
+        self._root_depth = len(root.parts)
+        self._buffer = StringIO()
+        self._patterns = []  # type: Sequence[str]
+
+    def record(self, node: "Node") -> Dict[str, Any]:
+        record = {
+            "path": str(node.path),
+            "type": "directory" if node.is_dir else "file",
+            "depth": len(node.path.parts) - self._root_depth,
+            "references": node.references,
+        }  # type: Dict[str, Any]
+        if node.pattern_references is not None:
+            record["pattern_references"] = dict(
+                zip(self._patterns, node.pattern_references)
+            )
+        if node.matches is not None:
+            record["matches"] = [
+                {name: getattr(location, name) for name in location.__slots__}
+                for location in node.matches
+            ]
+        return record
+
+    def summary(
+        self, result, search_string
+    ):  # type: (ScanResult, Union[None, str, Sequence[str]]) -> Dict[str, Any]
+        summary = {
+            "directories": result.directories_count,
+            "files": result.files_count,
+        }  # type: Dict[str, Any]
+        if search_string is not None:
+            summary["references"] = result.total_refs
+            if result.pattern_refs is not None:
+                summary["pattern_references"] = dict(
+                    zip(self._patterns, result.pattern_refs)
+                )
+            summary["skipped_files"] = result.skipped_files
+            summary["skipped_bytes"] = result.skipped_bytes
+        if result.heat is not None:
+            for key, hottest in (
+                ("hottest_files", result.heat.hottest_files()),
+                ("hottest_directories", result.heat.hottest_directories()),
+            ):
+                summary[key] = [
+                    {"path": str(path), "references": references}
+                    for path, references in hottest
+                ]
+        if result.stats is not None:
+            summary["stats"] = result.stats.as_dict()
+        return summary
+
+    def write(
+        self, result, search_string
+    ):  # type: (ScanResult, Union[None, str, Sequence[str]]) -> None
+        if search_string is not None and not isinstance(search_string, str):
+            self._patterns = search_string
+        self.start()
+        start = perf_counter()
+        for index, node in enumerate(result, 1):
+            self.write_node(node)
+            if index % self._batch_size == 0:
+                self._flush()
+        if result.stats is not None:
+            elapsed = perf_counter() - start
+            result.stats.render_time = elapsed - result.stats.scan_time
+        self.end(self.summary(result, search_string))
+        self._flush()
+        self.stream.flush()
+
+    def _flush(self) -> None:
+        self.stream.write(self._buffer.getvalue())
+        self._buffer.seek(0)
+        self._buffer.truncate()
+
+    def start(self) -> None:  # noqa: B027
+        pass
+
+    @abstractmethod
+    def write_node(self, node: "Node") -> None:
+        pass
+
+    def end(self, summary: Dict[str, Any]) -> None:  # noqa: B027
+        pass
+
+
+class NDJSONWriter(RecordWriter):
+    """One JSON object per line and per node, then a "summary" record."""
+
+    def write_node(self, node: "Node") -> None:
+        self._buffer.write(json.dumps(self.record(node)) + "\n")
+
+    def end(self, summary: Dict[str, Any]) -> None:
+        self._buffer.write(json.dumps({"type": "summary", **summary}) + "\n")
+
+
+class JSONWriter(RecordWriter):
+    """A single {"nodes": [...], "summary": {...}} document, written as it goes."""
+
+    def __init__(self, stream, root):  # type: (TextIO, Path) -> None
+        super().__init__(stream, root)
+        self._separator = "\n"
+
+    def start(self) -> None:
+        self._buffer.write('{"nodes": [')
+
+    def write_node(self, node: "Node") -> None:
+        self._buffer.write(self._separator + json.dumps(self.record(node)))
+        self._separator = ",\n"
+
+    def end(self, summary: Dict[str, Any]) -> None:
+        self._buffer.write(f'\n], "summary": {json.dumps(summary)}}}\n')
+
+
+class CSVWriter(RecordWriter):
+    """A header row, then one row per node, without the match locations nor
+    the references of each string.
+    """
+
+    def __init__(self, stream, root):  # type: (TextIO, Path) -> None
+        super().__init__(stream, root)
+        self._writer = csv.DictWriter(
+            self._buffer,
+            fieldnames=("path", "type", "depth", "references"),
+            lineterminator="\n",
+        )
+
+    def start(self) -> None:
+        self._writer.writeheader()
+
+    def write_node(self, node: "Node") -> None:
+        record = self.record(node)
+        record.pop("matches", None)
+        record.pop("pattern_references", None)
+        self._writer.writerow(record)
+
+
+WRITERS = {
+    "json": JSONWriter,
+    "ndjson": NDJSONWriter,
+    "csv": CSVWriter,
+}  # type: Dict[str, Type[RecordWriter]]
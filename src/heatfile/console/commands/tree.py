@@ -1,148 +1,63 @@
-from collections import OrderedDict
+from functools import lru_cache
+from itertools import chain
 import locale
+import os
 from pathlib import Path
-from re import compile, findall, IGNORECASE, search
-from typing import Dict, Iterator, List, Optional, Union
+import sys
+import time
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TYPE_CHECKING,
+    Union,
+)
+
+from colorama import Fore, Style
+
+from heatfile.console.colors import colors_enabled, init_colors
+from heatfile.console.logging.alert import Alert
+from heatfile.core.counts import FileCounts
+from heatfile.core.defaults import DEFAULT_INTERVAL
+from heatfile.core.scanner import Node, Scanner, ScanResult
 
-from colorama import Fore, init, Style
+if TYPE_CHECKING:  # pragma: no cover
+    from heatfile.core.stats import Stats  # noqa: F401
+    from heatfile.core.watch import Change  # noqa: F401
 
-from heatfile.console.logging.alert import Alert
 
-init(autoreset=True)
-locale.setlocale(locale.LC_ALL, "")
+@lru_cache(maxsize=None)
+def _use_user_locale() -> None:
+    # Set on the first formatted count rather than on import: only the grouping
+    # of the counts depends on the locale.
+    locale.setlocale(locale.LC_NUMERIC, "")
 
 
-class Tree:
+class Tree(Node):
     _filename_prefix_middle = "├──"
     _filename_prefix_last = "└──"
     _parent_prefix_middle = "    "
     _parent_prefix_last = "│   "
-    _directories_count = 0
-    _files_count = 0
-    _total_refs = 0
-    _string_references = 0
-    _found_directories = {}  # type: Dict[object, bool]
-
-    __slots__ = ["path", "parent_path", "is_last", "search_string"]
-
-    def __init__(
-        self, path, search_string=None, parent_path=None, is_last=False
-    ):  # type: (Path, str, "Tree", bool) -> None
-        self.path = Path(str(path))
-        self.parent_path = parent_path
-        self.is_last = is_last
-        self.search_string = search_string
-
-    @classmethod
-    def _make_tree_with_references(
-        cls, path, search_string, parent_path=None, is_last=False
-    ):  # type: (Path, str, "Tree", bool) -> Iterator["Tree"]
-        root = Path(str(path)).resolve()
-        displayable_root = cls(root, search_string, parent_path, is_last)
-        children = []
-
-        if root.is_dir():
-            children = cls._get_directory_children(root)
-        else:
-            children.append(Path(str(displayable_root.path)))
-
-        if not cls._found_directories or displayable_root not in cls._found_directories:
-            cls._found_directories[displayable_root] = False
-
-        directory_index = 1
-        for path in children:
-            is_last = directory_index == len(children)
-            if path.is_dir():
-                yield from cls._make_tree_with_references(
-                    path, search_string, parent_path=displayable_root, is_last=is_last,
-                )
-            else:
-                cls._string_references = cls._find_string_references(
-                    path, search_string
-                )
-                if cls._string_references != 0:
-                    cls._total_refs += cls._string_references
-                    previous_parents = cls._get_previous_parents(displayable_root)
-
-                    if previous_parents is not None:
-                        for parent, is_displayed in previous_parents.items():
-                            if (
-                                cls._found_directories.get(displayable_root.parent_path)
-                                == is_displayed
-                            ):
-                                cls._directories_count += 1
-                                cls._found_directories[parent] = True
-                                yield parent
-                        del previous_parents
-
-                    if displayable_root.path.is_dir() and not cls._found_directories.get(
-                        displayable_root
-                    ):
-                        cls._directories_count += 1
-                        cls._found_directories[displayable_root] = True
-                        yield displayable_root
-                    cls._files_count += 1
-                    yield cls(path, search_string, displayable_root, is_last)
-            directory_index += 1
-
-    @classmethod
-    def _make_only_tree(
-        cls, path, parent_path=None, is_last=False
-    ):  # type: (Path, "Tree", bool) -> Iterator["Tree"]
-        root = Path(str(path)).resolve()
-        displayable_root = cls(path=root, parent_path=parent_path, is_last=is_last)
-
-        yield displayable_root
-
-        children = cls._get_directory_children(root)
-
-        directory_index = 1
-        for path in children:
-            is_last = directory_index == len(children)
-            if path.is_dir():
-                cls._directories_count += 1
-                yield from cls._make_only_tree(
-                    path, parent_path=displayable_root, is_last=is_last
-                )
-            else:
-                cls._files_count += 1
-                yield cls(path=path, parent_path=displayable_root, is_last=is_last)
-            directory_index += 1
+    # Colours of references with 1, 2, 3, 4 and 5 or more digits.
+    _heat_colors = (Fore.BLUE, Fore.CYAN, Fore.GREEN, Fore.YELLOW, Fore.RED)
 
-    @classmethod
-    def _get_previous_parents(
-        cls, root
-    ):  # type: ("Tree") -> Union[OrderedDict["Tree", Optional[bool]], None]
-        if not cls._found_directories.get(root.parent_path):
-            previous_parents = OrderedDict()
-            previous = root.parent_path
-
-            while previous is not None:
-                value = cls._found_directories.get(previous)
-                previous_parents.update({previous: value})
-                previous_parents.move_to_end(previous, last=False)
-                previous = previous.parent_path
-                return previous_parents
-        return None
+    _output_batch_size = 1024
 
-    @staticmethod
-    def _find_string_references(file_path: Path, search_string: str) -> int:
-        pattern = compile(search_string, flags=IGNORECASE)
-        length = 0
-        with open(file_path, "r", encoding="latin-1") as file:
-            content = file.read()
-            if search(pattern, content) is not None:
-                return len(findall(pattern, content))
-        return length
+    __slots__ = ["_children_prefix"]
 
-    @staticmethod
-    def _get_directory_children(root: Path) -> List[Path]:
-        return sorted(list(path for path in root.iterdir()))
+    def __init__(self, *args, **kwargs):  # type: (*Any, **Any) -> None
+        super().__init__(*args, **kwargs)
+        self._children_prefix = None  # type: Optional[str]
 
     @staticmethod
     def _validate_inputs(
-        path, search_string=None
-    ):  # type: (Path, Union[Optional[str], None]) -> None
+        path, search_string=None, error=None
+    ):  # type: (Path, Union[None, str, Sequence[str]], Optional[Exception]) -> None
         alert = Alert()
 
         alert.help()
@@ -150,66 +65,276 @@ class Tree:
             alert.error("Provide a string to find references in the given file.")
         elif not path.exists():
             alert.error("Directory/File not found.")
+        elif error is not None:
+            alert.error(str(error) or type(error).__name__)
 
     @staticmethod
     def format_counts(counts: int) -> str:
+        _use_user_locale()
         return "{0:n}".format(counts)
 
-    @property
-    def display_name(self) -> str:
-        return f"{self.path.name}/" if self.path.is_dir() else self.path.name
+    def _get_children_prefix(self) -> str:
+        # Computed once per directory from its parent's, so every line costs one
+        # concatenation whatever its depth.
+        if self._children_prefix is None:
+            parent = self.parent_path
+            if parent is None:
+                self._children_prefix = ""
+            else:
+                self._children_prefix = parent._get_children_prefix() + (  # type: ignore
+                    self._parent_prefix_middle
+                    if self.is_last
+                    else self._parent_prefix_last
+                )
+        return self._children_prefix
 
-    def _mount_tree_line(self) -> str:
+    def _mount_tree_line(
+        self, heat=False, patterns=None, counts=True
+    ):  # type: (bool, Optional[Sequence[str]], bool) -> str
         if self.parent_path is None:
             return self.display_name
 
-        tree = ""
         filename_prefix = (
             self._filename_prefix_last if self.is_last else self._filename_prefix_middle
         )
-
         references = (
-            f"({self._string_references})"
-            if self.path.is_file() and self._string_references != 0
+            f"({self.references})"
+            if counts and not self.is_dir and self.references != 0
             else ""
         )
-        parts = [f"{filename_prefix} {self.display_name} {references}"]
-
-        previous_parent = self.parent_path
-        while previous_parent and previous_parent.parent_path is not None:
-            parts.append(
-                self._parent_prefix_middle
-                if previous_parent.is_last
-                else self._parent_prefix_last
+        if heat and references:
+            color = self._heat_colors[min(len(str(self.references)), 5) - 1]
+            references = f"{color}{references}{Style.RESET_ALL}"
+        if patterns and self.pattern_references:
+            references += (
+                " ["
+                + ", ".join(
+                    f"{pattern}: {count}"
+                    for pattern, count in zip(patterns, self.pattern_references)
+                    if count
+                )
+                + "]"
             )
-            previous_parent = previous_parent.parent_path
 
-        tree = "".join(reversed(parts))
+        return (
+            self.parent_path._get_children_prefix()  # type: ignore
+            + f"{filename_prefix} {self.display_name} {references}"
+        )
+
+    def _mount_match_lines(self) -> List[str]:
+        # grep-like: "line:column: text" for each match, "line- text" for the
+        # other lines of their context. Overlapping contexts are merged, and
+        # "--" separates the others.
+        prefix = self._get_children_prefix()
+        rows = {}  # type: Dict[int, List[str]]
+        matched = set()  # type: Set[int]
+        has_context = False
+        for location in self.matches or ():
+            has_context = has_context or bool(location.before or location.after)
+            for number, text in chain(
+                enumerate(location.before, location.line - len(location.before)),
+                enumerate(location.after, location.line + 1),
+            ):
+                rows.setdefault(number, [f"{number}- {text}"])
+            if location.line not in matched:
+                matched.add(location.line)
+                rows[location.line] = []
+            rows[location.line].append(
+                f"{location.line}:{location.column}: {location.text}"
+            )
 
-        return tree
+        lines = []  # type: List[str]
+        last_line = 0
+        for number in sorted(rows):
+            if has_context and last_line and number > last_line + 1:
+                lines.append(f"{prefix}--")
+            lines.extend(prefix + row for row in rows[number])
+            last_line = number
+        return lines
 
     @classmethod
-    def build_tree(
-        cls, path, search_string=None
-    ):  # type: (Path, Union[Optional[str], None]) -> None
+    def _write_lines(
+        cls, lines, heat=False, patterns=None, counts=True
+    ):  # type: (Iterable[Tree], bool, Optional[Sequence[str]], bool) -> None
+        batch = []  # type: List[str]
+        for line in lines:
+            batch.append(line._mount_tree_line(heat, patterns, counts))
+            if line.matches:
+                batch.extend(line._mount_match_lines())
+            if len(batch) >= cls._output_batch_size:
+                sys.stdout.write("\n".join(batch) + "\n")
+                batch.clear()
+        if batch:
+            sys.stdout.write("\n".join(batch) + "\n")
+
+    @staticmethod
+    def _style(text, style, colors):  # type: (str, str, bool) -> str
+        return f"{style}{text}{Style.RESET_ALL}" if colors else text
+
+    @classmethod
+    def _print_hottest(
+        cls, title, hottest, root, suffix="", colors=False
+    ):  # type: (str, List[Tuple[Path, int]], Path, str, bool) -> None
+        print("\n" + cls._style(title, Style.BRIGHT, colors))
+        for path, references in hottest:
+            name = path.relative_to(root) if path != root else Path(path.name)
+            print(f"{cls.format_counts(references):>12}  {name}{suffix}")
+
+    @classmethod
+    def _print_stats(
+        cls, stats, root, colors=False
+    ):  # type: (Stats, Path, bool) -> None
+        print("\n" + cls._style("Stats:", Style.BRIGHT, colors))
+        for count, label in (
+            (stats.directories, "directories listed"),
+            (stats.stat_calls, "stat calls"),
+            (stats.files_read, "files read"),
+            (stats.bytes_read, "bytes read"),
+            (stats.files_skipped, "files skipped"),
+            (stats.cached_files, "files counted from the cache"),
+        ):
+            print(f"{cls.format_counts(count):>12}  {label}")
+        for seconds, label in (
+            (stats.walk_time, "listing directories"),
+            (stats.read_time - stats.match_time, "reading files"),
+            (stats.match_time, "regex matching"),
+            (stats.render_time, "writing the output"),
+        ):
+            print(f"{seconds:>10.3f} s  {label}")
+
+        slowest = stats.slowest()
+        if slowest:
+            print("\n" + cls._style("Slowest files:", Style.BRIGHT, colors))
+            for path, seconds in slowest:
+                name = path.relative_to(root) if path != root else Path(path.name)
+                print(f"{seconds:>10.4f} s  {name}")
+
+    @classmethod
+    def _print_changes(
+        cls, changes, counts, colors=False
+    ):  # type: (List[Change], FileCounts, bool) -> None
+        # Only the changed files and the directories above them are printed.
+        def name(path: str) -> str:
+            return os.path.relpath(path, counts.root) if path != counts.root else path
+
+        directories = sorted(
+            {
+                directory
+                for path, _, _ in changes
+                for directory in counts.ancestors(path)
+                if directory != counts.root
+            }
+        )
+        print("\n" + cls._style(time.strftime("%H:%M:%S"), Style.BRIGHT, colors))
+        for path, previous, references in changes:
+            print(
+                f"{name(path)} ({cls.format_counts(previous)}"
+                + f" -> {cls.format_counts(references)})"
+            )
+        for directory in directories:
+            references = counts.directory_total(directory)
+            print(f"{name(directory)}/ ({cls.format_counts(references)})")
+        total = cls.format_counts(counts.total)
+        print(
+            cls._style(f"{total} references found.", Style.BRIGHT + Fore.CYAN, colors)
+        )
+
+    @classmethod
+    def _watch(
+        cls, scanner, result, interval, colors
+    ):  # type: (Scanner, ScanResult, float, bool) -> None
+        from heatfile.core.watch import Watch
+
+        watch = Watch(scanner, result.counts)  # type: ignore
         try:
-            if search_string is not None:
-                iterable_paths = cls._make_tree_with_references(path, search_string)
-            elif path.is_dir():
-                iterable_paths = cls._make_only_tree(path)
+            with watch.open_watcher(interval) as watcher:
+                while True:
+                    changes = watch.update(watcher.changes())
+                    if changes:
+                        cls._print_changes(changes, watch.counts, colors)
+        except KeyboardInterrupt:
+            pass
 
-            for line in iterable_paths:
-                print(line._mount_tree_line())
+    @classmethod
+    def build_tree(
+        cls,
+        path,
+        search_string=None,
+        heat=False,
+        output_format="text",
+        watch=False,
+        watch_interval=DEFAULT_INTERVAL,
+        colors=None,
+        **options,
+    ):  # type: (Path, Union[None, str, Sequence[str]], bool, str, bool, float, Optional[bool], **Any) -> None  # noqa: B950
+        """Print the tree of path, coloured if colors, by default if stdout is a
+        terminal.
+
+        Files only matched up to their first match are listed without a count.
+        """
+        try:
+            scanner = Scanner(
+                search_string, node_class=cls, keep_counts=watch, **options
+            )
+            result = scanner.scan(path)
+            patterns = None if isinstance(search_string, str) else search_string
+            any_match = scanner.reader.any_match
+
+            if output_format != "text":
+                from .formats import WRITERS
+
+                writer = WRITERS[output_format](sys.stdout, Path(str(path)).resolve())
+                writer.write(result, search_string)
+                return
+
+            if colors is None:
+                colors = colors_enabled(sys.stdout)
+            if colors:
+                init_colors()
+            start = time.perf_counter()
+            cls._write_lines(
+                result, heat and colors, patterns, not any_match  # type: ignore
+            )
+            if result.stats is not None:
+                elapsed = time.perf_counter() - start
+                result.stats.render_time = elapsed - result.stats.scan_time
 
             if search_string is not None:
+                total = cls.format_counts(result.total_refs)
+                found = "files with matches" if any_match else "references found"
+                print(
+                    "\n"
+                    + cls._style(f"{total} {found}.", Style.BRIGHT + Fore.CYAN, colors)
+                )
+            if patterns and result.pattern_refs is not None and not any_match:
+                for pattern, references in zip(patterns, result.pattern_refs):
+                    print(f"{cls.format_counts(references):>12}  {pattern}")
+            if result.skipped_files:
                 print(
-                    f"\n{Style.BRIGHT + Fore.CYAN}{cls.format_counts(cls._total_refs)} references found."  # noqa: B950
+                    f"{cls.format_counts(result.skipped_files)} binary files skipped"
+                    + f" ({cls.format_counts(result.skipped_bytes)} bytes)."
+                )
+            if result.heat is not None:
+                root = Path(str(path)).resolve()
+                cls._print_hottest(
+                    "Hottest files:", result.heat.hottest_files(), root, "", colors
+                )
+                cls._print_hottest(
+                    "Hottest directories:",
+                    result.heat.hottest_directories(),
+                    root,
+                    "/",
+                    colors,
                 )
 
             print(
-                f"\n{cls.format_counts(cls._directories_count)} directories"
-                + f", {cls.format_counts(cls._files_count)} files"
+                f"\n{cls.format_counts(result.directories_count)} directories"
+                + f", {cls.format_counts(result.files_count)} files"
             )
-        except Exception:
-            cls._validate_inputs(path, search_string)
+            if result.stats is not None:
+                cls._print_stats(result.stats, Path(str(path)).resolve(), colors)
+            if watch and result.counts is not None:
+                cls._watch(scanner, result, watch_interval, colors)
+        except Exception as error:
+            cls._validate_inputs(path, search_string, error)
             raise SystemExit()
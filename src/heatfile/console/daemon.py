@@ -0,0 +1,196 @@
+from contextlib import redirect_stderr, redirect_stdout
+from io import TextIOBase
+import json
+import logging
+import os
+from pathlib import Path
+import socket
+import stat
+import sys
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Sequence, Union
+
+# Requests and answers are JSON objects, one per line. A request holds the
+# "path", "search" string(s), "colors" and the other "options" of the tree
+# command. It is answered with {"stdout": text} and {"stderr": text} messages,
+# in the order they were written, then {"exit": status}.
+
+
+def default_socket_path() -> str:
+    """The socket in $XDG_RUNTIME_DIR, or else in a private directory of the user
+    in the temporary directory, where anyone could bind it otherwise."""
+    directory = os.environ.get("XDG_RUNTIME_DIR")
+    if directory:
+        return os.path.join(directory, f"heatfile-{os.getuid()}.sock")
+
+    import tempfile
+
+    directory = os.path.join(tempfile.gettempdir(), f"heatfile-{os.getuid()}")
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    # Made by someone else, or opened to others since, it can't be trusted.
+    status = os.lstat(directory)
+    if (
+        not stat.S_ISDIR(status.st_mode)
+        or status.st_uid != os.getuid()
+        or stat.S_IMODE(status.st_mode) & 0o077
+    ):
+        raise OSError(f"{directory} isn't a directory private to its user.")
+    return os.path.join(directory, "heatfile.sock")
+
+
+def query(
+    socket_path, path, search_string, options, colors=None
+):  # type: (str, Path, Union[None, str, Sequence[str]], Dict[str, Any], Optional[bool]) -> int  # noqa: B950
+    """Have the daemon run the tree command, write its output here, and return
+    its exit status."""
+    from heatfile.console.colors import colors_enabled
+
+    request = {
+        "path": str(Path(path).resolve()),
+        "search": search_string,
+        "colors": colors_enabled(sys.stdout) if colors is None else colors,
+        "options": options,
+    }
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        connection.sendall(json.dumps(request).encode() + b"\n")
+        with connection.makefile("rb") as answers:
+            for line in answers:
+                answer = json.loads(line)
+                if "exit" in answer:
+                    return answer["exit"]
+                stream = sys.stdout if "stdout" in answer else sys.stderr
+                stream.write(answer.get("stdout", answer.get("stderr")))
+    raise ConnectionError("The daemon closed the connection before answering.")
+
+
+class _AnswerStream(TextIOBase):
+    # A text stream sending every write as a message.
+    def __init__(self, answers: BinaryIO, name: str) -> None:
+        self.answers = answers
+        self.name = name
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if text:
+            self.answers.write(json.dumps({self.name: text}).encode() + b"\n")
+        return len(text)
+
+    def flush(self) -> None:
+        self.answers.flush()
+
+
+class Daemon:
+    """Answers the queries of tree --daemon over a Unix socket, one at a time,
+    for paths under its roots.
+
+    The listings of the directories and the counts of the files are kept in
+    memory between queries. A directory is only listed again once its
+    modification time changed, and a file read again once its inode, size or
+    modification time did.
+    """
+
+    __slots__ = ["roots", "socket_path", "lister", "cache"]
+
+    def __init__(self, roots, socket_path):  # type: (Iterable[Path], str) -> None
+        from heatfile.core.cache import MemoryCache
+        from heatfile.core.walker import CachedLister
+
+        self.roots = [Path(str(root)).resolve() for root in roots]
+        self.socket_path = socket_path
+        self.lister = CachedLister()
+        self.cache = MemoryCache()
+
+    def warm(self) -> None:
+        """List every directory of the roots ahead of the first query."""
+        from heatfile.core.scanner import Scanner
+
+        scanner = Scanner(lister=self.lister)
+        for root in self.roots:
+            for _ in scanner.scan(root):
+                pass
+
+    def serves(self, path: Path) -> bool:
+        return any(path == root or root in path.parents for root in self.roots)
+
+    def bind(self) -> socket.socket:
+        # A socket left by a daemon that is gone is replaced, a live one isn't.
+        if os.path.exists(self.socket_path):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                if probe.connect_ex(self.socket_path) == 0:
+                    raise OSError(f"A daemon already listens on {self.socket_path}.")
+            os.unlink(self.socket_path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        mask = os.umask(0o077)
+        try:
+            server.bind(self.socket_path)
+        finally:
+            os.umask(mask)
+        server.listen()
+        return server
+
+    def serve_forever(self, server: socket.socket) -> None:
+        try:
+            while True:
+                connection, _ = server.accept()
+                with connection:
+                    self.answer(connection)
+        finally:
+            server.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def answer(self, connection: socket.socket) -> None:
+        with connection.makefile("rb") as requests, connection.makefile(
+            "wb"
+        ) as answers:
+            try:
+                status = self._run(json.loads(requests.readline()), answers)
+            except (ValueError, KeyError, TypeError) as error:
+                _AnswerStream(answers, "stderr").write(f"Bad request: {error}\n")
+                status = 2
+            try:
+                answers.write(json.dumps({"exit": status}).encode() + b"\n")
+                answers.flush()
+            except OSError:
+                pass  # The client is gone.
+
+    def _run(self, request: Dict[str, Any], answers: BinaryIO) -> int:
+        from heatfile.console.commands import Tree
+
+        path = Path(request["path"])
+        stdout = _AnswerStream(answers, "stdout")
+        stderr = _AnswerStream(answers, "stderr")
+        if not self.serves(path.resolve()):
+            stderr.write(f"{path} is not under the roots of the daemon.\n")
+            return 1
+
+        options = dict(request["options"])
+        if options.get("watch"):
+            stderr.write("The daemon can't watch for changes.\n")
+            return 2
+        if options.get("rebuild_cache"):
+            self.cache.clear()
+        # Errors are logged by handlers made for each of them: those made for
+        # this query write to its stream, and are removed after it.
+        logger = logging.getLogger("heatfile.console.logging.alert")
+        handlers = list(logger.handlers)  # type: List[logging.Handler]
+        try:
+            with redirect_stdout(stdout), redirect_stderr(stderr):
+                Tree.build_tree(
+                    path,
+                    request["search"],
+                    colors=request["colors"],
+                    cache=self.cache,
+                    lister=self.lister,
+                    **options,
+                )
+        except SystemExit as exit:
+            return exit.code if isinstance(exit.code, int) else 0
+        finally:
+            logger.handlers = handlers
+        return 0
@@ -1,5 +1,6 @@
 import logging
 
+from heatfile.console.colors import colors_enabled, init_colors
 from .io_formatter import IOFormatter
 
 logger = logging.getLogger(__name__)
@@ -8,7 +9,10 @@ logger = logging.getLogger(__name__)
 class Alert:
     def __init__(self) -> None:
         handler = logging.StreamHandler()
-        handler.setFormatter(IOFormatter())
+        colors = colors_enabled(handler.stream)
+        if colors:
+            init_colors()
+        handler.setFormatter(IOFormatter(colors))
         logger.addHandler(handler)
 
     def error(self, message: str) -> None:
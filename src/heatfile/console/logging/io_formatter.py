@@ -1,10 +1,6 @@
 import logging
-from sys import platform
 
-from colorama import Fore, init, Style
-
-if platform == "win":
-    init()
+from colorama import Fore, Style
 
 
 class IOFormatter(logging.Formatter):
@@ -15,13 +11,17 @@ class IOFormatter(logging.Formatter):
         "info": Fore.WHITE,
     }
 
+    def __init__(self, colors: bool = True) -> None:
+        super().__init__()
+        self.colors = colors
+
     def format(self, record):
         if not record.exc_info:
             level = record.levelname.lower()
             msg = record.msg
 
-            if level in self._colors:
-                msg = f"{Style.BRIGHT + self._colors[level]}{msg}"
+            if self.colors and level in self._colors:
+                msg = f"{Style.BRIGHT + self._colors[level]}{msg}{Style.RESET_ALL}"
 
             return msg
 
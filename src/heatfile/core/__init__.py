@@ -0,0 +1,27 @@
+from importlib import import_module
+from typing import Any, TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .engine import SearchEngine  # noqa: F401
+    from .matcher import Matcher  # noqa: F401
+    from .reader import Reader  # noqa: F401
+    from .scanner import Node, Scanner, ScanResult  # noqa: F401
+    from .store import NodeStore  # noqa: F401
+
+# Submodules are only imported on first access to their names, so importing a
+# light module of the package does not load the whole engine.
+_exports = {
+    "SearchEngine": "engine",
+    "Matcher": "matcher",
+    "Reader": "reader",
+    "Node": "scanner",
+    "Scanner": "scanner",
+    "ScanResult": "scanner",
+    "NodeStore": "store",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(f".{_exports[name]}", __name__), name)
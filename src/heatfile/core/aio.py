@@ -0,0 +1,178 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import os
+from pathlib import Path
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    TYPE_CHECKING,
+    TypeVar,
+    Union,
+)
+
+from .defaults import DEFAULT_IN_FLIGHT
+from .engine import SearchEngine
+from .reader import AnyMatcher, Reader, Scanned
+from .stats import measured_matcher, MeasuredReader, Stats
+from .walker import list_directory
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .cache import AnyCache  # noqa: F401
+
+T = TypeVar("T")
+
+
+class FileSystem:
+    """The calls of a scan that block on the file system.
+
+    The async backend runs them in threads. Wrap them to simulate a slow
+    network mount.
+    """
+
+    def list_directory(self, path: str) -> List[os.DirEntry]:
+        return list_directory(path)
+
+    def scan(
+        self, reader, path, matcher, index
+    ):  # type: (Reader, Path, AnyMatcher, bool) -> Scanned
+        return reader.scan(path, matcher, index)
+
+
+class AsyncBackend:
+    """Runs the directory listings and file reads of a scan on an asyncio loop,
+    each in a thread, with at most in_flight of them at once.
+
+    The scan itself stays synchronous, and in order. It runs the loop whenever
+    it waits for a result, and the other scheduled calls progress meanwhile.
+    The listings of the subdirectories of a listed directory are started at
+    once, so the walk finds them done by the time it gets to them.
+    """
+
+    __slots__ = [
+        "in_flight",
+        "filesystem",
+        "_loop",
+        "_executor",
+        "_semaphore",
+        "_listings",
+    ]
+
+    def __init__(
+        self, in_flight=DEFAULT_IN_FLIGHT, filesystem=None
+    ):  # type: (int, Optional[FileSystem]) -> None
+        if in_flight < 1:
+            raise ValueError("At least one call must be allowed in flight.")
+
+        self.in_flight = in_flight
+        self.filesystem = filesystem or FileSystem()
+        self._loop = asyncio.new_event_loop()
+        self._executor = ThreadPoolExecutor(max_workers=in_flight)
+        self._semaphore = None  # type: Optional[asyncio.Semaphore]
+        self._listings = {}  # type: Dict[str, asyncio.Task]
+
+    def __enter__(self) -> "AsyncBackend":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Cancel the calls that are still pending, and stop the threads."""
+        if self._loop.is_closed():
+            return
+        pending = asyncio.all_tasks(self._loop)
+        for task in pending:
+            task.cancel()
+        if pending:
+            self._loop.run_until_complete(
+                asyncio.gather(*pending, return_exceptions=True)
+            )
+        self._listings.clear()
+        self._executor.shutdown(wait=True)
+        self._loop.close()
+
+    async def _call(self, function, *args):  # type: (Callable[..., T], *Any) -> T
+        if self._semaphore is None:
+            # Created on the running loop, which Python < 3.10 binds it to.
+            self._semaphore = asyncio.Semaphore(self.in_flight)
+        async with self._semaphore:
+            return await self._loop.run_in_executor(
+                self._executor, partial(function, *args)
+            )
+
+    def submit(self, function, *args):  # type: (Callable[..., T], *Any) -> asyncio.Task
+        """Schedule a call in a thread, started once the loop runs."""
+        return self._loop.create_task(self._call(function, *args))
+
+    def result(self, awaitable: Awaitable[T]) -> T:
+        """Run the loop until the awaitable is done, and return its result."""
+        return self._loop.run_until_complete(awaitable)
+
+    def prefetch(self, paths: Iterable[str]) -> None:
+        """Start listing the directories, for list_directory() to get later."""
+        for path in paths:
+            if path not in self._listings:
+                self._listings[path] = self.submit(self.filesystem.list_directory, path)
+
+    def list_directory(self, path):  # type: (Union[str, Path]) -> List[os.DirEntry]
+        task = self._listings.pop(str(path), None)
+        if task is None:
+            task = self.submit(self.filesystem.list_directory, str(path))
+        return self.result(task)
+
+
+class AsyncSearchEngine(SearchEngine):
+    """A search engine whose files are read through an async backend.
+
+    Enough files are submitted ahead to keep every call in flight busy, and
+    the results are still yielded in the order of the files.
+    """
+
+    _batch_size = 8
+
+    def __init__(
+        self, matcher, backend, reader=None, cache=None, stats=None
+    ):  # type: (AnyMatcher, AsyncBackend, Optional[Reader], Optional[AnyCache], Optional[Stats]) -> None  # noqa: B950
+        super().__init__(matcher, reader=reader, cache=cache, stats=stats)
+        self.backend = backend
+
+    @property
+    def _window(self) -> int:
+        return max(2, 2 * self.backend.in_flight // self._batch_size)
+
+    def _scan(self, paths):  # type: (List[Path]) -> Callable[[], List[Scanned]]
+        if not paths:
+            return list
+        index = self.cache is not None
+        batch = asyncio.gather(
+            *(self.backend.submit(self._scan_file, path, index) for path in paths)
+        )
+
+        def result() -> List[Scanned]:
+            scanned = []  # type: List[Scanned]
+            for item, stats in self.backend.result(batch):
+                if stats is not None:
+                    self.stats.merge(stats)  # type: ignore
+                scanned.append(item)
+            return scanned
+
+        return result
+
+    def _scan_file(
+        self, path, index
+    ):  # type: (Path, bool) -> Tuple[Scanned, Optional[Stats]]
+        # Runs in a thread: the stats of each file are merged back by the loop.
+        filesystem = self.backend.filesystem
+        if self.stats is None:
+            return filesystem.scan(self.reader, path, self.matcher, index), None
+        stats = Stats()
+        reader = MeasuredReader(self.reader, stats)
+        matcher = measured_matcher(self.matcher, stats)
+        return filesystem.scan(reader, path, matcher, index), stats
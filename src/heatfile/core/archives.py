@@ -0,0 +1,88 @@
+import os
+from typing import BinaryIO, Generator, Optional, Tuple, Type
+
+# Compressed streams hold one file, and archives several members. The modules
+# that read them are only imported once such a file is searched.
+_STREAMS = {".gz": "gzip", ".bz2": "bz2", ".xz": "lzma", ".lzma": "lzma"}
+_TARS = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz", ".tbz2", ".tar.xz", ".txz")
+_ZIPS = (".zip",)
+
+Members = Generator[Tuple[str, int, BinaryIO], None, None]
+
+
+def compression_of(path):  # type: (os.PathLike) -> Optional[str]
+    """Tell from its name whether a file is an archive, "zip" or "tar", or a
+    compressed stream, by the module that reads it."""
+    name = os.fspath(path).lower()
+    if name.endswith(_ZIPS):
+        return "zip"
+    if name.endswith(_TARS):
+        return "tar"
+    return _STREAMS.get(os.path.splitext(name)[1])
+
+
+def is_archive(compression: Optional[str]) -> bool:
+    return compression in ("zip", "tar")
+
+
+def open_stream(path, compression):  # type: (os.PathLike, str) -> BinaryIO
+    """The decompressed content of a stream, read as it is decompressed."""
+    if compression == "gzip":
+        import gzip
+
+        return gzip.open(path, "rb")
+    if compression == "bz2":
+        import bz2
+
+        return bz2.open(path, "rb")
+    import lzma
+
+    return lzma.open(path, "rb")  # type: ignore
+
+
+def iter_members(path, compression):  # type: (os.PathLike, str) -> Members
+    """The name, size and content of each regular file of an archive, in the
+    order of the archive.
+
+    Tar archives are read as a stream, once, whatever their compression: each
+    member must be consumed before the next one is yielded.
+    """
+    return _zip_members(path) if compression == "zip" else _tar_members(path)
+
+
+def _zip_members(path: os.PathLike) -> Members:
+    from zipfile import ZipFile
+
+    with ZipFile(path) as archive:
+        for info in archive.infolist():
+            if not info.is_dir():
+                with archive.open(info) as content:
+                    yield info.filename, info.file_size, content  # type: ignore
+
+
+def _tar_members(path: os.PathLike) -> Members:
+    import tarfile
+
+    with tarfile.open(path, "r|*") as archive:
+        for info in archive:
+            if info.isfile():
+                content = archive.extractfile(info)
+                if content is not None:
+                    yield info.name, info.size, content  # type: ignore
+
+
+def archive_errors() -> Tuple[Type[BaseException], ...]:
+    """The errors of corrupted or truncated compressed files."""
+    import lzma
+    import tarfile
+    import zipfile
+    import zlib
+
+    return (
+        OSError,
+        EOFError,
+        lzma.LZMAError,
+        tarfile.TarError,
+        zipfile.BadZipFile,
+        zlib.error,
+    )
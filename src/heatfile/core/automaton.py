@@ -0,0 +1,65 @@
+from collections import deque
+from typing import Deque, Iterable, List, Sequence, Tuple
+
+
+class AhoCorasick:
+    """Counts many literals in a single pass over the bytes of a content.
+
+    The automaton is compiled into a full transition table (one row of 256 states
+    per state), so each byte costs one lookup whatever the number of literals.
+    Every literal is counted without overlapping itself, like bytes.count().
+    Content can be fed in chunks: matches across chunk boundaries are found.
+    """
+
+    __slots__ = ["lengths", "_transitions", "_outputs"]
+
+    def __init__(self, literals: Sequence[bytes]) -> None:
+        children = [{}]  # type: List[dict]
+        outputs = [()]  # type: List[Tuple[int, ...]]
+        for index, literal in enumerate(literals):
+            state = 0
+            for byte in literal:
+                if byte not in children[state]:
+                    children.append({})
+                    outputs.append(())
+                    children[state][byte] = len(children) - 1
+                state = children[state][byte]
+            outputs[state] += (index,)
+
+        # States are completed in breadth-first order, so the state a failure
+        # falls back to (always shallower) is complete before it is needed.
+        failures = [0] * len(children)
+        transitions = [[0] * 256 for _ in children]
+        for byte, child in children[0].items():
+            transitions[0][byte] = child
+        queue = deque(children[0].values())  # type: Deque[int]
+        while queue:
+            state = queue.popleft()
+            failure = failures[state]
+            outputs[state] += outputs[failure]
+            transitions[state] = list(transitions[failure])
+            for byte, child in children[state].items():
+                transitions[state][byte] = child
+                failures[child] = transitions[failure][byte]
+                queue.append(child)
+
+        self.lengths = [len(literal) for literal in literals]
+        self._transitions = transitions
+        self._outputs = outputs
+
+    def count(self, chunks: Iterable[bytes]) -> List[int]:
+        transitions, outputs, lengths = self._transitions, self._outputs, self.lengths
+        counts = [0] * len(lengths)
+        ends = [0] * len(lengths)
+        state, offset = 0, 0
+
+        for chunk in chunks:
+            for end, byte in enumerate(chunk, offset + 1):
+                state = transitions[state][byte]
+                if outputs[state]:
+                    for index in outputs[state]:
+                        if end - lengths[index] >= ends[index]:
+                            counts[index] += 1
+                            ends[index] = end
+            offset += len(chunk)
+        return counts
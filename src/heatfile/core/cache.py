@@ -0,0 +1,298 @@
+from collections import OrderedDict
+import os
+from pathlib import Path
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .defaults import DEFAULT_MAX_SIZE
+from .index import may_contain
+from .matcher import Matcher
+from .reader import SKIPPED
+
+# (path, (inode, size, mtime), pattern, count, trigrams, binary)
+_Write = Tuple[str, Tuple[int, int, int], Union[bytes, str], int, Optional[bytes], bool]
+
+# Bumped whenever _SCHEMA changes: older databases are dropped and rebuilt.
+_SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    inode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    trigrams BLOB,
+    binary INTEGER NOT NULL,
+    used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counts (
+    path TEXT NOT NULL REFERENCES files (path) ON DELETE CASCADE,
+    pattern BLOB NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (path, pattern)
+);
+CREATE INDEX IF NOT EXISTS files_used ON files (used);
+"""
+
+
+def default_cache_directory() -> Path:
+    if "HEATFILE_CACHE_DIR" in os.environ:
+        return Path(os.environ["HEATFILE_CACHE_DIR"])
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "heatfile"
+
+
+def _signature(stat: os.stat_result) -> Tuple[int, int, int]:
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class ScanCache:
+    """Reference counts and trigram filters of files, kept between runs.
+
+    Entries are keyed by path and only trusted while the file keeps the same
+    (inode, size, mtime). The index is a SQLite database in WAL mode, so several
+    heatfile processes can read and write it at once. Least recently used files
+    are evicted when the database grows over max_size bytes.
+    """
+
+    _flush_every = 512
+
+    def __init__(
+        self, directory=None, max_size=DEFAULT_MAX_SIZE, rebuild=False
+    ):  # type: (Optional[Path], int, bool) -> None
+        directory = directory or default_cache_directory()
+        directory.mkdir(parents=True, exist_ok=True)
+
+        self.max_size = max_size
+        self._connection = sqlite3.connect(str(directory / "index.sqlite3"), timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA foreign_keys=ON")
+        (version,) = self._connection.execute("PRAGMA user_version").fetchone()
+        if version != _SCHEMA_VERSION:
+            self._connection.executescript(
+                "DROP TABLE IF EXISTS counts; DROP TABLE IF EXISTS files;"
+            )
+        self._connection.executescript(_SCHEMA)
+        self._connection.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        if rebuild:
+            self._connection.execute("DELETE FROM files")
+            self._connection.commit()
+
+        self._used = {}  # type: Dict[str, float]
+        self._writes = []  # type: List[_Write]
+
+    def __enter__(self) -> "ScanCache":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def lookup(
+        self, path, matcher, skip_binary=True
+    ):  # type: (Path, Matcher, bool) -> Tuple[Optional[int], Optional[os.stat_result]]
+        """Return the cached count (if still valid) and the current stat of path.
+
+        Files known to be binary count as SKIPPED if skip_binary.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None, None
+
+        key = str(path)
+        try:
+            row = self._connection.execute(
+                "SELECT inode, size, mtime, trigrams, binary FROM files WHERE path = ?",
+                (key,),
+            ).fetchone()
+            if row is None or tuple(row[:3]) != _signature(stat):
+                return None, stat
+            if row[4] and skip_binary:
+                self._used[key] = time.time()
+                return SKIPPED, stat
+            count = self._connection.execute(
+                "SELECT count FROM counts WHERE path = ? AND pattern = ?",
+                (key, matcher.pattern.pattern),
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return None, stat
+
+        self._used[key] = time.time()
+        if count is not None:
+            return count[0], stat
+        if matcher.needle is not None and row[3] is not None:
+            if not may_contain(row[3], matcher.needle):
+                return 0, stat
+        return None, stat
+
+    def store(
+        self, path, stat, matcher, count, trigrams=None, binary=False
+    ):  # type: (Path, os.stat_result, Matcher, int, Optional[bytes], bool) -> None
+        self._writes.append(
+            (
+                str(path),
+                _signature(stat),
+                matcher.pattern.pattern,
+                count,
+                trigrams,
+                binary,
+            )
+        )
+        if len(self._writes) >= self._flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        # Writes are buffered and applied in one short transaction, so the write
+        # lock is never held while files are being read.
+        writes, self._writes = self._writes, []
+        used, self._used = self._used, {}
+        try:
+            with self._connection:
+                for path, signature, pattern, count, trigrams, binary in writes:
+                    row = self._connection.execute(
+                        "SELECT inode, size, mtime FROM files WHERE path = ?", (path,)
+                    ).fetchone()
+                    if row is None or tuple(row) != signature:
+                        self._connection.execute(
+                            "DELETE FROM files WHERE path = ?", (path,)
+                        )
+                        self._connection.execute(
+                            "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            (path, *signature, trigrams, binary, time.time()),
+                        )
+                    elif trigrams is not None:
+                        self._connection.execute(
+                            "UPDATE files SET trigrams = ? WHERE path = ?",
+                            (trigrams, path),
+                        )
+                    if count != SKIPPED:
+                        self._connection.execute(
+                            "INSERT OR REPLACE INTO counts VALUES (?, ?, ?)",
+                            (path, pattern, count),
+                        )
+                self._connection.executemany(
+                    "UPDATE files SET used = ? WHERE path = ?",
+                    [(timestamp, path) for path, timestamp in used.items()],
+                )
+        except sqlite3.OperationalError:
+            # Another process kept the database locked past the timeout: these
+            # results are simply not cached.
+            pass
+
+    def _size(self) -> int:
+        page_size, page_count, free_pages = (
+            self._connection.execute(f"PRAGMA {pragma}").fetchone()[0]
+            for pragma in ("page_size", "page_count", "freelist_count")
+        )
+        return int(page_size * (page_count - free_pages))
+
+    def evict(self) -> None:
+        while self._size() > self.max_size:
+            (files,) = self._connection.execute("SELECT COUNT(*) FROM files").fetchone()
+            if files == 0:
+                break
+            self._connection.execute(
+                "DELETE FROM files WHERE path IN "
+                "(SELECT path FROM files ORDER BY used LIMIT ?)",
+                (max(files // 4, 1),),
+            )
+            self._connection.commit()
+
+    def close(self) -> None:
+        self.flush()
+        try:
+            self.evict()
+        except sqlite3.OperationalError:
+            pass
+        self._connection.close()
+
+
+class MemoryCache:
+    """Reference counts and trigram filters of files, like ScanCache, kept in
+    memory by a long-running process.
+
+    At most max_files files are kept, the least recently used ones being
+    dropped first. Stores are applied at once, so close() does nothing.
+    """
+
+    __slots__ = ["max_files", "_files"]
+
+    def __init__(self, max_files: int = 1_000_000) -> None:
+        self.max_files = max_files
+        # path: [(inode, size, mtime), trigrams, binary, {pattern: count}]
+        self._files = OrderedDict()  # type: OrderedDict[str, List[Any]]
+
+    def __enter__(self) -> "MemoryCache":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def lookup(
+        self, path, matcher, skip_binary=True
+    ):  # type: (Path, Matcher, bool) -> Tuple[Optional[int], Optional[os.stat_result]]
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None, None
+
+        key = str(path)
+        entry = self._files.get(key)
+        if entry is None or entry[0] != _signature(stat):
+            return None, stat
+        self._files.move_to_end(key)
+        signature, trigrams, binary, counts = entry
+        if binary and skip_binary:
+            return SKIPPED, stat
+        count = counts.get(matcher.pattern.pattern)
+        if count is not None:
+            return count, stat
+        if matcher.needle is not None and trigrams is not None:
+            if not may_contain(trigrams, matcher.needle):
+                return 0, stat
+        return None, stat
+
+    def store(
+        self, path, stat, matcher, count, trigrams=None, binary=False
+    ):  # type: (Path, os.stat_result, Matcher, int, Optional[bytes], bool) -> None
+        key = str(path)
+        signature = _signature(stat)
+        entry = self._files.get(key)
+        if entry is None or entry[0] != signature:
+            entry = [signature, trigrams, binary, {}]
+            self._files[key] = entry
+        elif trigrams is not None:
+            entry[1] = trigrams
+        self._files.move_to_end(key)
+        if count != SKIPPED:
+            entry[3][matcher.pattern.pattern] = count
+        while len(self._files) > self.max_files:
+            self._files.popitem(last=False)
+
+    def clear(self) -> None:
+        self._files.clear()
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+# Either kind of cache, as the search engine takes them.
+AnyCache = Union[ScanCache, MemoryCache]
+
+
+def open_cache(
+    max_size=DEFAULT_MAX_SIZE, rebuild=False, directory=None
+):  # type: (int, bool, Optional[Path]) -> Optional[ScanCache]
+    # The cache only speeds searches up: an unwritable cache directory or a
+    # corrupted database must not stop the search itself.
+    try:
+        return ScanCache(directory, max_size=max_size, rebuild=rebuild)
+    except (OSError, sqlite3.Error):
+        return None
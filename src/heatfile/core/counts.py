@@ -0,0 +1,76 @@
+from array import array
+import os
+from typing import Dict, Iterator, List
+
+
+class FileCounts:
+    """References of the files of a tree, and the totals of their directories.
+
+    Only paths with references are kept. Each path maps to a position in one
+    array of machine integers, so a count costs a dictionary slot and 8 bytes
+    rather than a node. Directories are keyed by their path plus a separator.
+    """
+
+    __slots__ = ["root", "_positions", "_counts", "_free"]
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self._positions = {}  # type: Dict[str, int]
+        self._counts = array("q")
+        self._free = []  # type: List[int]
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    @property
+    def total(self) -> int:
+        if os.path.isdir(self.root):
+            return self.directory_total(self.root)
+        return self.get(self.root)
+
+    def get(self, path: str) -> int:
+        position = self._positions.get(path)
+        return 0 if position is None else self._counts[position]
+
+    def directory_total(self, path: str) -> int:
+        return self.get(path + os.sep)
+
+    def set(self, path: str, count: int) -> int:
+        """Store the count of a file under the root, and return the difference."""
+        delta = count - self.get(path)
+        if delta:
+            self._add(path, delta)
+            for directory in self.ancestors(path):
+                self._add(directory + os.sep, delta)
+        return delta
+
+    def ancestors(self, path: str) -> Iterator[str]:
+        """The directories from the one of path up to the root, included."""
+        while len(path) > len(self.root):
+            path = os.path.dirname(path)
+            yield path
+
+    def files_under(self, directory: str) -> List[str]:
+        prefix = directory + os.sep
+        return [
+            path
+            for path in self._positions
+            if path.startswith(prefix) and not path.endswith(os.sep)
+        ]
+
+    def _add(self, key: str, delta: int) -> None:
+        position = self._positions.get(key)
+        if position is None:
+            if self._free:
+                position = self._free.pop()
+                self._counts[position] = delta
+            else:
+                position = len(self._counts)
+                self._counts.append(delta)
+            self._positions[key] = position
+            return
+
+        self._counts[position] += delta
+        if not self._counts[position]:
+            del self._positions[key]
+            self._free.append(position)
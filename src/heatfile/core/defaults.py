@@ -0,0 +1,12 @@
+# Defaults shared by the engine and the command line options. This module
+# imports nothing, so the CLI can be built without loading the engine.
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+DEFAULT_INTERVAL = 1.0
+DEFAULT_IN_FLIGHT = 32
+POOLS = ("process", "thread")
+BACKENDS = ("sync", "async")
+# Formats of the tree command's output, written by the writers of
+# console.commands.formats for all but text.
+FORMATS = ("text", "json", "ndjson", "csv")
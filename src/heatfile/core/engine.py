@@ -0,0 +1,174 @@
+from collections import deque
+from concurrent.futures import Executor
+from functools import partial
+from itertools import islice
+import os
+from pathlib import Path
+from typing import (
+    Callable,
+    Deque,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TYPE_CHECKING,
+    TypeVar,
+)
+
+from .defaults import POOLS
+from .locations import Location
+from .matcher import Matcher
+from .reader import AnyMatcher, Member, Reader, Scanned
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .cache import AnyCache  # noqa: F401
+    from .stats import Stats  # noqa: F401
+
+T = TypeVar("T")
+
+
+def _scan_batch(
+    reader, matcher, index, paths
+):  # type: (Reader, AnyMatcher, bool, List[Path]) -> List[Scanned]
+    return [reader.scan(path, matcher, index) for path in paths]
+
+
+class SearchEngine:
+    """Count references in a stream of files, yielding results in input order.
+
+    Files whose count is still valid in the cache are never read again, and
+    binary files skipped by the reader are yielded with a SKIPPED count.
+    """
+
+    _batch_size = 32
+    _batches_per_job = 2
+
+    def __init__(
+        self, matcher, jobs=1, pool="process", reader=None, cache=None, stats=None
+    ):  # type: (AnyMatcher, int, str, Optional[Reader], Optional[AnyCache], Optional[Stats]) -> None  # noqa: B950
+        if pool not in POOLS:
+            raise ValueError(f"Unknown pool {pool!r}, expected one of {POOLS}.")
+
+        self.matcher = matcher
+        self.jobs = jobs or os.cpu_count() or 1
+        self.pool = pool
+        self.reader = reader or Reader()
+        self.cache = cache
+        self.stats = stats
+        self._executor = None  # type: Optional[Executor]
+
+    def __enter__(self) -> "SearchEngine":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            # Imported here: the process pool pulls in multiprocessing, which
+            # single-job scans never need.
+            from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+            executor_class = (
+                ProcessPoolExecutor if self.pool == "process" else ThreadPoolExecutor
+            )  # type: Callable[..., Executor]
+            self._executor = executor_class(max_workers=self.jobs)
+        return self._executor
+
+    @property
+    def _window(self) -> int:
+        # Batches submitted ahead of the one being consumed.
+        return 1 if self.jobs == 1 else self.jobs * self._batches_per_job
+
+    def _scan(self, paths):  # type: (List[Path]) -> Callable[[], List[Scanned]]
+        if self.stats is not None and paths:
+            return self._scan_measured(paths)
+        scan = partial(_scan_batch, self.reader, self.matcher, self.cache is not None)
+        if not paths:
+            return list
+        if self.jobs == 1:
+            return partial(scan, paths)
+        return self._get_executor().submit(scan, paths).result
+
+    def _scan_measured(
+        self, paths
+    ):  # type: (List[Path]) -> Callable[[], List[Scanned]]
+        # Each batch brings back its own stats, wherever it was scanned.
+        from .stats import scan_batch_measured
+
+        scan = partial(
+            scan_batch_measured, self.reader, self.matcher, self.cache is not None
+        )
+        if self.jobs == 1:
+            get = partial(
+                scan, paths
+            )  # type: Callable[[], Tuple[List[Scanned], Stats]]
+        else:
+            get = self._get_executor().submit(scan, paths).result
+
+        def result() -> List[Scanned]:
+            scanned, stats = get()
+            self.stats.merge(stats)  # type: ignore
+            return scanned
+
+        return result
+
+    def count(
+        self, items, key
+    ):  # type: (Iterable[T], Callable[[T], Path]) -> Iterator[Tuple[T, int]]
+        for item, count, _, _, _ in self.scan(items, key):
+            yield item, count
+
+    def scan(
+        self, items, key
+    ):  # type: (Iterable[T], Callable[[T], Path]) -> Iterator[Tuple[T, int, Optional[List[Location]], Optional[List[int]], Optional[List[Member]]]]  # noqa: B950
+        """Like count(), with the match locations if the reader reports them, the
+        references of each string of a PatternSet, and the members of archives.
+        """
+        iterator = iter(items)
+        window = self._window
+        pending = deque()  # type: Deque[Tuple[List[T], List[Path], List, Callable]]
+        # Only the counts of single strings are cached, not those of sets.
+        matcher = self.matcher if isinstance(self.matcher, Matcher) else None
+        cache = self.cache if matcher is not None else None
+
+        def submit() -> bool:
+            batch = list(islice(iterator, self._batch_size))
+            paths = [key(item) for item in batch]
+            if cache is None or matcher is None:
+                cached = [(None, None)] * len(paths)  # type: List
+            else:
+                cached = [
+                    cache.lookup(path, matcher, self.reader.skip_binary)
+                    for path in paths
+                ]
+            misses = [path for path, (count, _) in zip(paths, cached) if count is None]
+            if self.stats is not None:
+                self.stats.cached_files += len(paths) - len(misses)
+                if cache is not None:
+                    # Each lookup stats its file.
+                    self.stats.stat_calls += len(paths)
+            if batch:
+                pending.append((batch, paths, cached, self._scan(misses)))
+            return bool(batch)
+
+        while len(pending) < window and submit():
+            pass
+
+        while pending:
+            batch, paths, cached, result = pending.popleft()
+            scanned = iter(result())
+            submit()
+            for item, path, (count, stat) in zip(batch, paths, cached):
+                locations, each, members = None, None, None
+                if count is None:
+                    count, trigrams, binary, locations, each, members = next(scanned)
+                    if cache is not None and matcher is not None and stat is not None:
+                        cache.store(path, stat, matcher, count, trigrams, binary)
+                yield item, count, locations, each, members
@@ -0,0 +1,85 @@
+from heapq import heappush, heappushpop
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .scanner import Node
+
+# (references, -arrival, path): ties keep the first path found.
+_Entry = Tuple[int, int, Path]
+
+
+class _Hottest:
+    """The size largest entries seen so far, in a bounded min-heap."""
+
+    __slots__ = ["size", "_heap", "_arrivals"]
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._heap = []  # type: List[_Entry]
+        self._arrivals = 0
+
+    def push(self, path: Path, references: int) -> None:
+        self._arrivals += 1
+        entry = (references, -self._arrivals, path)
+        if len(self._heap) < self.size:
+            heappush(self._heap, entry)
+        elif entry > self._heap[0]:
+            heappushpop(self._heap, entry)
+
+    def items(self) -> List[Tuple[Path, int]]:
+        return [(path, references) for references, _, path in sorted(self._heap)[::-1]]
+
+
+class HeatMap:
+    """Rolls the references of a scan up into its directories, in one pass.
+
+    Files must be added in walk order. Only the directories leading to the last
+    file are kept open; a directory is closed, ranked and added to its parent as
+    soon as the walk leaves it, so memory is bounded by the depth of the tree and
+    the number of entries ranked.
+    """
+
+    __slots__ = ["_files", "_directories", "_open", "_totals"]
+
+    def __init__(self, top: int = 10) -> None:
+        self._files = _Hottest(top)
+        self._directories = _Hottest(top)
+        self._open = []  # type: List[Node]
+        self._totals = {}  # type: Dict[Node, int]
+
+    def hottest_files(self) -> List[Tuple[Path, int]]:
+        return self._files.items()
+
+    def hottest_directories(self) -> List[Tuple[Path, int]]:
+        """The hottest subtrees, by the references of every file below them."""
+        return self._directories.items()
+
+    def add(self, file: "Node") -> None:
+        self._files.push(file.path, file.references)
+
+        entered = []  # type: List[Node]
+        directory = file.parent_path  # type: Optional[Node]
+        while directory is not None and directory not in self._totals:
+            entered.append(directory)
+            directory = directory.parent_path
+        while self._open and self._open[-1] is not directory:
+            self._close()
+        for directory in reversed(entered):
+            self._open.append(directory)
+            self._totals[directory] = 0
+
+        if self._open:
+            self._totals[self._open[-1]] += file.references
+
+    def finish(self) -> None:
+        while self._open:
+            self._close()
+
+    def _close(self) -> None:
+        directory = self._open.pop()
+        references = self._totals.pop(directory)
+        if self._open:
+            self._totals[self._open[-1]] += references
+            # The root is left out: its heat is the total of the scan.
+            self._directories.push(directory.path, references)
@@ -0,0 +1,190 @@
+import os
+from pathlib import Path
+from re import compile, escape
+from typing import Collection, Iterable, List, Optional, Pattern, Tuple
+
+IGNORE_FILES = (".gitignore", ".ignore")
+
+_ALWAYS_IGNORED = (".git/",)
+
+
+def _translate(glob: str) -> str:
+    """Regex of a gitignore glob, matched against a /-separated relative path."""
+    anchored = "/" in glob
+    glob = glob.lstrip("/")
+    parts = []  # type: List[str]
+    index = 0
+
+    while index < len(glob):
+        char = glob[index]
+        if glob.startswith("**/", index):
+            parts.append("(?:.*/)?")
+            index += 3
+            continue
+        if glob.startswith("**", index) and index + 2 == len(glob):
+            parts.append(".*")
+            break
+        if char == "*":
+            parts.append("[^/]*")
+        elif char == "?":
+            parts.append("[^/]")
+        elif char == "\\" and index + 1 < len(glob):
+            index += 1
+            parts.append(escape(glob[index]))
+        elif char == "[":
+            end = glob.find("]", index + 2)
+            if end == -1:
+                parts.append(escape(char))
+            else:
+                content = glob[index + 1 : end]
+                if content.startswith("!"):
+                    content = "^" + content[1:]
+                parts.append(f"[{content}]")
+                index = end
+        else:
+            parts.append(escape(char))
+        index += 1
+
+    return ("" if anchored else "(?:.*/)?") + "".join(parts)
+
+
+class Rules:
+    """Gitignore-style rules of one directory, precompiled into two regexes.
+
+    Each rule becomes one group of an alternation, listed last rule first, so the
+    group that matches is the rule that wins. Rules ending with "/" only apply to
+    directories, hence a second regex for files without them.
+    """
+
+    __slots__ = ["base", "_start", "_directories", "_files"]
+
+    def __init__(self, base, patterns):  # type: (str, Iterable[str]) -> None
+        rules = []  # type: List[Tuple[str, bool, bool]]
+        for line in patterns:
+            line = line.rstrip("\r\n")
+            if not line.endswith("\\ "):
+                line = line.rstrip(" ")
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            if negated or line.startswith("\\!") or line.startswith("\\#"):
+                line = line[1:]
+            directory_only = line.endswith("/")
+            rules.append((_translate(line.rstrip("/")), negated, directory_only))
+
+        rules.reverse()
+        self.base = base
+        # Where the paths under base start, past its separator, which a root like
+        # "/" already ends with.
+        self._start = len(base.rstrip(os.sep)) + 1
+        self._directories = self._compile(rules)
+        self._files = self._compile([rule for rule in rules if not rule[2]])
+
+    @staticmethod
+    def _compile(
+        rules,
+    ):  # type: (List[Tuple[str, bool, bool]]) -> Optional[Tuple[Pattern[str], List[bool]]]
+        if not rules:
+            return None
+        pattern = "|".join(f"({regex})" for regex, _, _ in rules)
+        return compile(f"(?s:{pattern})\\Z"), [negated for _, negated, _ in rules]
+
+    @classmethod
+    def from_file(cls, base: str, path: str) -> "Rules":
+        with open(path, encoding="utf-8", errors="replace") as file:
+            return cls(base, file)
+
+    def match(self, relative_path: str, is_dir: bool) -> Optional[bool]:
+        """True if ignored, False if re-included by a "!" rule, None if unmatched."""
+        rules = self._directories if is_dir else self._files
+        if rules is None:
+            return None
+        pattern, negated = rules
+        match = pattern.match(relative_path)
+        if match is None:
+            return None
+        return not negated[(match.lastindex or 1) - 1]
+
+
+class PathFilter:
+    """Decides which entries a walk keeps, before it lists or descends into them.
+
+    Ignore files are picked up from the names a directory listing already
+    returned, so directories without them cost nothing extra.
+    """
+
+    __slots__ = ["_rules", "_excludes", "_includes", "_use_ignore_files"]
+
+    def __init__(
+        self, rules=(), excludes=None, includes=None, use_ignore_files=True
+    ):  # type: (Tuple[Rules, ...], Optional[Rules], Optional[Rules], bool) -> None
+        self._rules = rules
+        self._excludes = excludes
+        self._includes = includes
+        self._use_ignore_files = use_ignore_files
+
+    @classmethod
+    def for_root(
+        cls, root, excludes=(), includes=(), use_ignore_files=True
+    ):  # type: (Path, Collection[str], Collection[str], bool) -> PathFilter
+        base = str(root)
+        rules = ()  # type: Tuple[Rules, ...]
+        if use_ignore_files:
+            rules = (Rules(base, _ALWAYS_IGNORED),) + cls._parent_rules(root)
+
+        return cls(
+            rules,
+            Rules(base, excludes) if excludes else None,
+            Rules(base, includes) if includes else None,
+            use_ignore_files,
+        )
+
+    @staticmethod
+    def _parent_rules(root: Path) -> Tuple[Rules, ...]:
+        # Ignore files of the enclosing repository still apply below its root. The
+        # ones of root itself are loaded from its listing, like any directory.
+        rules = []  # type: List[Rules]
+        for directory in (root, *root.parents):
+            base = str(directory)
+            for name in reversed(IGNORE_FILES if directory != root else ()):
+                path = os.path.join(base, name)
+                if os.path.isfile(path):
+                    rules.append(Rules.from_file(base, path))
+            if os.path.exists(os.path.join(base, ".git")):
+                exclude = os.path.join(base, ".git", "info", "exclude")
+                if os.path.isfile(exclude):
+                    rules.append(Rules.from_file(base, exclude))
+                break
+        else:
+            return ()
+        return tuple(reversed(rules))
+
+    def for_directory(self, path, names):  # type: (str, Collection[str]) -> PathFilter
+        if not self._use_ignore_files:
+            return self
+
+        rules = self._rules
+        for name in IGNORE_FILES:
+            if name in names:
+                rules += (Rules.from_file(path, os.path.join(path, name)),)
+        if rules is self._rules:
+            return self
+        return PathFilter(rules, self._excludes, self._includes, True)
+
+    def is_excluded(self, path: str, is_dir: bool) -> bool:
+        if self._excludes is not None and self._match(self._excludes, path, is_dir):
+            return True
+        for rules in reversed(self._rules):
+            ignored = self._match(rules, path, is_dir)
+            if ignored is not None:
+                return ignored
+        if self._includes is not None and not is_dir:
+            return not self._match(self._includes, path, is_dir)
+        return False
+
+    @staticmethod
+    def _match(rules: Rules, path: str, is_dir: bool) -> Optional[bool]:
+        relative_path = path[rules._start :]
+        if os.sep != "/":
+            relative_path = relative_path.replace(os.sep, "/")
+        return rules.match(relative_path, is_dir)
@@ -0,0 +1,50 @@
+from re import compile
+from typing import Set
+
+MAX_INDEXED_SIZE = 256 * 1024
+
+_MIN_FILTER_SIZE = 64
+_BITS_PER_TRIGRAM = 10
+_WORDS = compile(rb"\w{3,}")
+
+
+def _trigrams(content: bytes) -> Set[bytes]:
+    # Only trigrams inside words are indexed: splitting the (few) distinct words
+    # is much cheaper than slicing every offset of the content, and binary data
+    # has almost no words at all.
+    trigrams = set()  # type: Set[bytes]
+    for word in set(_WORDS.findall(content.lower())):
+        trigrams.update(word[index : index + 3] for index in range(len(word) - 2))
+    return trigrams
+
+
+def _positions(trigram: bytes, mask: int) -> tuple:
+    value = int.from_bytes(trigram, "little")
+    first = (value * 2654435761) & 0xFFFFFFFF
+    second = ((value ^ 0x5BD1E995) * 0x01000193) & 0xFFFFFFFF
+    return first & mask, (second >> 7) & mask
+
+
+def build_filter(content: bytes) -> bytes:
+    """Bloom filter of the lowercased word trigrams of content."""
+    trigrams = _trigrams(content)
+    size = _MIN_FILTER_SIZE
+    while size * 8 < len(trigrams) * _BITS_PER_TRIGRAM:
+        size *= 2
+
+    bits = bytearray(size)
+    mask = size * 8 - 1
+    for trigram in trigrams:
+        for position in _positions(trigram, mask):
+            bits[position >> 3] |= 1 << (position & 7)
+    return bytes(bits)
+
+
+def may_contain(bloom: bytes, needle: bytes) -> bool:
+    """False only when the needle can't occur in the content of the filter."""
+    mask = len(bloom) * 8 - 1
+    for trigram in _trigrams(needle):
+        for position in _positions(trigram, mask):
+            if not bloom[position >> 3] & (1 << (position & 7)):
+                return False
+    return True
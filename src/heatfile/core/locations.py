@@ -0,0 +1,95 @@
+from bisect import bisect_left
+from typing import Iterable, List
+
+from .matcher import Buffer
+
+
+def _decode(line: Buffer) -> str:
+    return bytes(line).rstrip(b"\r").decode("utf-8", errors="replace")
+
+
+class Location:
+    """Line and column (both from 1) of a match, with its surrounding lines."""
+
+    __slots__ = ["line", "column", "text", "before", "after"]
+
+    def __init__(
+        self, line, column, text, before=(), after=()
+    ):  # type: (int, int, str, Iterable[str], Iterable[str]) -> None
+        self.line = line
+        self.column = column
+        self.text = text
+        self.before = list(before)
+        self.after = list(after)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Location) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    def __repr__(self) -> str:
+        return f"Location({self.line}, {self.column}, {self.text!r})"
+
+
+class LineIndex:
+    """Offsets of the newlines of a buffer, to locate matches with a bisect.
+
+    Newlines are indexed lazily, only as far as the last line asked for, so a
+    search stopped early doesn't index the rest of the file. Offsets must be
+    located in increasing order for that to stay a single pass.
+    """
+
+    __slots__ = ["content", "_newlines", "_next", "_complete"]
+
+    def __init__(self, content: Buffer) -> None:
+        self.content = content
+        self._newlines = []  # type: List[int]
+        self._next = 0
+        self._complete = False
+
+    def _index_line(self) -> bool:
+        position = self.content.find(b"\n", self._next)
+        if position == -1:
+            self._complete = True
+            return False
+        self._newlines.append(position)
+        self._next = position + 1
+        return True
+
+    def _has_line(self, line: int) -> bool:
+        # Lines are counted from 0; line n ends at the n-th newline, or at the end
+        # of the content for the last line.
+        while len(self._newlines) <= line and not self._complete:
+            self._index_line()
+        if line < len(self._newlines):
+            return True
+        return line == len(self._newlines) and self._next < len(self.content)
+
+    def _text(self, line: int) -> str:
+        start = self._newlines[line - 1] + 1 if line > 0 else 0
+        end = self._newlines[line] if line < len(self._newlines) else len(self.content)
+        return _decode(self.content[start:end])
+
+    def line_of(self, offset: int) -> int:
+        while (not self._newlines or self._newlines[-1] < offset) and (
+            not self._complete
+        ):
+            self._index_line()
+        return bisect_left(self._newlines, offset)
+
+    def locate(self, offset: int, context: int = 0) -> Location:
+        line = self.line_of(offset)
+        start = self._newlines[line - 1] + 1 if line > 0 else 0
+        after = []  # type: List[str]
+        for following in range(line + 1, line + 1 + context):
+            if not self._has_line(following):
+                break
+            after.append(self._text(following))
+
+        return Location(
+            line + 1,
+            offset - start + 1,
+            self._text(line),
+            [self._text(previous) for previous in range(max(line - context, 0), line)],
+            after,
+        )
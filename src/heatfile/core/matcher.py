@@ -0,0 +1,317 @@
+from functools import lru_cache
+from mmap import mmap
+from re import compile, error, escape, IGNORECASE
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Match,
+    Optional,
+    Pattern,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from .automaton import AhoCorasick
+
+Buffer = Union[bytes, mmap]
+
+MODES = ("auto", "fixed", "regex")
+
+_METACHARACTERS = frozenset(".^$*+?{}[]\\|()")
+
+# Flags that apply to a whole pattern, only allowed at its start.
+_GLOBAL_FLAGS = compile(rb"\(\?[aiLmsux]+\)")
+
+# Escapes whose meaning, in a text pattern, goes beyond ASCII.
+_TEXT_ESCAPES = compile(r"\\[wWbBsSuUNx0-9]")
+
+
+def _encode(search_string: str) -> bytes:
+    # Files are matched as raw bytes, the same way they used to be decoded
+    # (latin-1). Strings that latin-1 can't represent could never match that way,
+    # so they are looked up as UTF-8 instead.
+    try:
+        return search_string.encode("latin-1")
+    except UnicodeEncodeError:
+        return search_string.encode("utf-8")
+
+
+def _matches_as_bytes(search_string, literal):  # type: (str, bool) -> bool
+    # Bytes patterns only fold the case of ASCII letters, and their classes only
+    # know ASCII: strings that could match other latin-1 letters are matched as
+    # text instead. Strings beyond latin-1 never matched text, so stay UTF-8.
+    if not search_string.isascii():
+        try:
+            search_string.encode("latin-1")
+        except UnicodeEncodeError:
+            return True
+        return False
+    return literal or _TEXT_ESCAPES.search(search_string) is None
+
+
+class _DecodedPattern:
+    """A text pattern matched in the bytes decoded as latin-1, as files were
+    before being matched as bytes. Each byte decodes to one character, so the
+    offsets of the matches are those of the bytes."""
+
+    __slots__ = ["text_pattern", "_content", "_text"]
+
+    def __init__(self, text_pattern):  # type: (Pattern[str]) -> None
+        self.text_pattern = text_pattern
+        self._content = None  # type: Optional[Buffer]
+        self._text = ""
+
+    @property
+    def pattern(self) -> str:
+        return self.text_pattern.pattern
+
+    @property
+    def groups(self) -> int:
+        return self.text_pattern.groups
+
+    def _decode(self, content: Buffer) -> str:
+        # Kept for the next search of the same content, as an alternation or a
+        # count resumed from a position searches it several times.
+        if content is not self._content:
+            data = content if isinstance(content, bytes) else content[:]
+            self._content, self._text = content, data.decode("latin-1")
+        return self._text
+
+    def search(self, content, pos=0):  # type: (Buffer, int) -> Optional[Match]
+        return self.text_pattern.search(self._decode(content), pos)
+
+    def finditer(self, content, pos=0):  # type: (Buffer, int) -> Iterator[Match]
+        return self.text_pattern.finditer(self._decode(content), pos)
+
+
+_Pattern = Union[Pattern[bytes], _DecodedPattern]
+
+
+class Matcher:
+    """Case-insensitive counter of a search string, compiled once per search.
+
+    Strings are matched as bytes, unless they could match latin-1 letters beyond
+    ASCII, whose case bytes can't fold: those are matched as decoded text.
+    """
+
+    __slots__ = ["search_string", "needle", "pattern", "_resumable"]
+
+    def __init__(self, search_string, mode="auto"):  # type: (str, str) -> None
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode!r}, expected one of {MODES}.")
+
+        encoded = _encode(search_string)
+        literal = mode == "fixed" or (
+            mode == "auto" and not _METACHARACTERS.intersection(search_string)
+        )
+
+        self.search_string = search_string
+        self.needle = None  # type: Optional[bytes]
+        if _matches_as_bytes(search_string, literal):
+            self.needle = encoded.lower() if literal else None
+            self.pattern = compile(
+                escape(encoded) if literal else encoded, flags=IGNORECASE
+            )  # type: _Pattern
+        else:
+            self.pattern = _DecodedPattern(
+                compile(
+                    escape(search_string) if literal else search_string,
+                    flags=IGNORECASE,
+                )
+            )
+        # A literal that can't overlap with itself lets count_until() find where
+        # the last counted match ends with a single rfind().
+        self._resumable = bool(encoded) and not any(
+            encoded[:size].lower() == encoded[-size:].lower()
+            for size in range(1, len(encoded))
+        )
+
+    @property
+    def is_literal(self) -> bool:
+        return self.needle is not None
+
+    @property
+    def max_length(self) -> Optional[int]:
+        return len(self.needle) if self.needle is not None else None
+
+    def count(self, content: Buffer) -> int:
+        if self.needle is not None and isinstance(content, bytes):
+            return content.lower().count(self.needle)
+        return sum(1 for _ in self.pattern.finditer(content))
+
+    def count_until(
+        self, content, position, limit
+    ):  # type: (bytes, int, int) -> Tuple[int, int]
+        """Count matches from position that start before limit.
+
+        Returns the count and the end of the last counted match (or position).
+        """
+        if self.needle is not None and self._resumable:
+            end = limit + len(self.needle) - 1
+            lowered = content.lower()
+            count = lowered.count(self.needle, position, end)
+            if count == 0:
+                return 0, position
+            return count, lowered.rfind(self.needle, position, end) + len(self.needle)
+
+        count, last_end = 0, position
+        for match in self.pattern.finditer(content, position):
+            if match.start() >= limit:
+                break
+            count += 1
+            last_end = match.end()
+        return count, last_end
+
+
+class _Alternation:
+    """The matches of several patterns, as one alternation of them would find
+    them: the leftmost first, and of those starting at the same place, the first
+    pattern listed."""
+
+    __slots__ = ["patterns"]
+
+    def __init__(self, patterns):  # type: (Sequence[_Pattern]) -> None
+        self.patterns = list(patterns)
+
+    def search(self, content, pos=0):  # type: (Buffer, int) -> Optional[Match]
+        return next(self.finditer(content, pos), None)
+
+    def finditer(self, content, pos=0):  # type: (Buffer, int) -> Iterator[Match]
+        # The next match of each pattern, searched again once the matches found
+        # go past its start. After an empty match, the next one can't be empty
+        # at the same place.
+        matches = [pattern.search(content, pos) for pattern in self.patterns]
+        empty_at = -1
+        while True:
+            for index, match in enumerate(matches):
+                if match is not None and (
+                    match.start() < pos or match.start() == match.end() == empty_at
+                ):
+                    pattern = self.patterns[index]
+                    match = pattern.search(content, pos)
+                    if match is not None and match.start() == match.end() == empty_at:
+                        past = pos < len(content)
+                        match = pattern.search(content, pos + 1) if past else None
+                    matches[index] = match
+            found = [match for match in matches if match is not None]
+            if not found:
+                return
+            first = min(found, key=lambda match: match.start())
+            yield first
+            pos = first.end()
+            empty_at = pos if first.start() == pos else -1
+
+
+AnyPattern = Union[Pattern[bytes], _DecodedPattern, _Alternation]
+
+
+@lru_cache(maxsize=8)
+def _automaton(literals: Tuple[bytes, ...]) -> AhoCorasick:
+    # Shared by the copies of a pattern set, so a worker process compiles each
+    # automaton once rather than once per batch of files.
+    return AhoCorasick(literals)
+
+
+class PatternSet:
+    """Case-insensitive counter of several search strings, in one read of a file.
+
+    Each string is counted as if it were searched alone. Big sets of literals go
+    through a single Aho-Corasick pass. Other sets are first matched as one
+    alternation, which rules out the files that contain none of the strings in
+    one pass, before each string is counted. Regexes with groups or global flags
+    can't be joined into one, nor can strings matched as text: their alternation
+    is matched pattern by pattern.
+    """
+
+    __slots__ = ["matchers", "pattern", "_literals", "_indices"]
+
+    # Below this many literals, one bytes.count() per literal is faster.
+    automaton_threshold = 64
+    _chunk_size = 1024 * 1024
+
+    def __init__(
+        self, search_strings, mode="auto"
+    ):  # type: (Sequence[str], str) -> None
+        self.matchers = [
+            Matcher(search_string, mode) for search_string in search_strings
+        ]
+        patterns = [matcher.pattern for matcher in self.matchers]
+        # The index of each string by the pattern of its matches, the first of
+        # those alike.
+        self._indices = {}  # type: Dict[Pattern, int]
+        for index, pattern in enumerate(patterns):
+            if isinstance(pattern, _DecodedPattern):
+                self._indices.setdefault(pattern.text_pattern, index)
+            else:
+                self._indices.setdefault(pattern, index)
+        self.pattern = _Alternation(patterns)  # type: AnyPattern
+        joinable = [
+            pattern
+            for pattern in patterns
+            if not isinstance(pattern, _DecodedPattern)
+            and not pattern.groups
+            and not _GLOBAL_FLAGS.search(pattern.pattern)
+        ]
+        if len(joinable) == len(patterns):
+            # One capturing group around each alternative tells which matched.
+            try:
+                self.pattern = compile(
+                    b"|".join(b"(" + pattern.pattern + b")" for pattern in joinable),
+                    flags=IGNORECASE,
+                )
+            except error:
+                pass
+
+        literals = tuple(matcher.needle for matcher in self.matchers if matcher.needle)
+        self._literals = None  # type: Optional[Tuple[bytes, ...]]
+        if len(literals) == len(self.matchers) >= self.automaton_threshold:
+            self._literals = literals
+
+    @property
+    def search_strings(self) -> List[str]:
+        return [matcher.search_string for matcher in self.matchers]
+
+    def index_of(self, match: Match) -> int:
+        """Which search string the match of the alternation is for."""
+        if isinstance(self.pattern, _Alternation):
+            return self._indices[match.re]
+        return (match.lastindex or 1) - 1
+
+    def count(self, content: Buffer) -> int:
+        return sum(self.count_each(content))
+
+    @property
+    def counts_chunks(self) -> bool:
+        """Whether count_chunks() can count the strings, in a single pass."""
+        return self._literals is not None
+
+    def count_chunks(self, chunks: Iterable[bytes]) -> List[int]:
+        """Like count_each() on the chunks joined, if counts_chunks."""
+        if self._literals is None:
+            raise ValueError("Only sets of many literals are counted by chunks.")
+        return _automaton(self._literals).count(chunk.lower() for chunk in chunks)
+
+    def count_each(self, content: Buffer) -> List[int]:
+        if self._literals is not None:
+            return self.count_chunks(
+                content[start : start + self._chunk_size]
+                for start in range(0, len(content), self._chunk_size)
+            )
+
+        joined = not isinstance(self.pattern, _Alternation)
+        if joined and self.pattern.search(content) is None:
+            return [0] * len(self.matchers)
+        if isinstance(content, bytes):
+            lowered = content.lower()
+            return [
+                (
+                    lowered.count(matcher.needle)
+                    if matcher.needle is not None
+                    else matcher.count(content)
+                )
+                for matcher in self.matchers
+            ]
+        return [matcher.count(content) for matcher in self.matchers]
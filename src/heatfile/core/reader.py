@@ -0,0 +1,403 @@
+from contextlib import closing
+from functools import partial
+from itertools import chain, islice
+import mmap
+import os
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Match, Optional, Tuple, Union
+
+from .archives import (
+    archive_errors,
+    compression_of,
+    is_archive,
+    iter_members,
+    open_stream,
+)
+from .defaults import DEFAULT_BUFFER_SIZE
+from .index import build_filter, MAX_INDEXED_SIZE
+from .locations import LineIndex, Location
+from .matcher import Buffer, Matcher, PatternSet
+
+DEFAULT_OVERLAP = 4096
+SNIFF_SIZE = 8192
+
+# Count reported for the binary files that were not searched.
+SKIPPED = -1
+
+# (name, size, references, locations, references of each string) of a file of
+# an archive.
+Member = Tuple[str, int, int, Optional[List[Location]], Optional[List[int]]]
+
+# (references, trigram filter, binary, locations, references of each string,
+# members of an archive)
+Scanned = Tuple[
+    int,
+    Optional[bytes],
+    bool,
+    Optional[List[Location]],
+    Optional[List[int]],
+    Optional[List[Member]],
+]
+
+AnyMatcher = Union[Matcher, PatternSet]
+
+# Formats that may not have a NUL byte in their first kilobytes.
+_MAGIC_NUMBERS = (
+    b"\x89PNG",
+    b"GIF87a",
+    b"GIF89a",
+    b"\xff\xd8\xff",
+    b"%PDF-",
+    b"PK\x03\x04",
+    b"\x1f\x8b",
+    b"\xfd7zXZ",
+    b"7z\xbc\xaf\x27\x1c",
+    b"\x28\xb5\x2f\xfd",
+    b"Rar!\x1a\x07",
+    b"\x7fELF",
+    b"\xca\xfe\xba\xbe",
+    b"\xcf\xfa\xed\xfe",
+)
+
+
+def is_binary(head: Buffer) -> bool:
+    """Sniff the first SNIFF_SIZE bytes for a NUL byte or a known magic number."""
+    if head.find(b"\0", 0, SNIFF_SIZE) != -1:
+        return True
+    start = head[:12]
+    return start.startswith(_MAGIC_NUMBERS) or (
+        start.startswith(b"BZh") and start[4:10] == b"1AY&SY"
+    )
+
+
+class Reader:
+    """Count the references in a file without holding more than one buffer.
+
+    Files that fit in the buffer are read at once. Bigger files are mapped in
+    memory and matched in place, or streamed in buffer-sized chunks when they
+    can't be mapped. Consecutive chunks overlap so matches crossing a chunk
+    boundary are counted once; regex matches longer than ``overlap`` bytes may be
+    split across chunks.
+
+    Binary files are detected from their first bytes and, if skip_binary, never
+    read further.
+
+    With a context (a number of lines), the location of every match is reported
+    too. Streamed files carry the lines of context before the next match from
+    one chunk to the next, up to a few buffers: longer lines are truncated. At
+    most max_matches are counted per file, and the scan of a file stops there.
+
+    With any_match, and no context, a file's count is only 1 or 0: whether it
+    matches, which is read up to its first match.
+
+    With search_compressed, gzip, bzip2 and xz files are searched as they are
+    decompressed, and zip and tar archives member by member, each like a file
+    that can't be mapped. Files that fail to decompress are searched as they are.
+    """
+
+    __slots__ = [
+        "buffer_size",
+        "use_mmap",
+        "overlap",
+        "skip_binary",
+        "context",
+        "max_matches",
+        "any_match",
+        "search_compressed",
+    ]
+
+    def __init__(
+        self,
+        buffer_size=DEFAULT_BUFFER_SIZE,
+        use_mmap=True,
+        overlap=DEFAULT_OVERLAP,
+        skip_binary=True,
+        context=None,
+        max_matches=None,
+        any_match=False,
+        search_compressed=False,
+    ):  # type: (int, bool, int, bool, Optional[int], Optional[int], bool, bool) -> None
+        if buffer_size < 1:
+            raise ValueError("The buffer size must be a positive number of bytes.")
+
+        self.buffer_size = buffer_size
+        self.use_mmap = use_mmap
+        self.overlap = min(overlap, buffer_size - 1)
+        self.skip_binary = skip_binary
+        self.context = context
+        self.max_matches = max_matches
+        self.any_match = any_match
+        self.search_compressed = search_compressed
+
+    @property
+    def locating(self) -> bool:
+        """Whether matches are found one by one rather than just counted."""
+        return self.context is not None or self.max_matches is not None
+
+    def count(self, file_path: Path, matcher: AnyMatcher) -> int:
+        return self.scan(file_path, matcher)[0]
+
+    def scan(
+        self, file_path, matcher, index=False
+    ):  # type: (Path, AnyMatcher, bool) -> Scanned
+        """Count the references, plus the trigram filter of small files if index.
+
+        Also tells whether the file is binary, in which case the count is SKIPPED
+        if skip_binary, where the matches are if a context is set, the count of
+        each string of a PatternSet, and the members of an archive.
+        """
+        if self.search_compressed:
+            compression = compression_of(file_path)
+            if compression is not None:
+                try:
+                    return self._scan_compressed(file_path, matcher, compression)
+                except archive_errors():
+                    pass
+
+        with open(file_path, "rb") as file:
+            if self.use_mmap and self._size(file) > self.buffer_size:
+                try:
+                    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                        return self._scan_mapped(view, matcher)
+                except (OSError, ValueError):
+                    pass
+            return self._scan_stream(file, matcher, index)
+
+    # The stat calls, reads and matches of a scan, which MeasuredReader measures.
+
+    def _size(self, file: BinaryIO) -> int:
+        return os.fstat(file.fileno()).st_size
+
+    def _read(self, file: BinaryIO, size: int) -> bytes:
+        return file.read(size)
+
+    def _search(self, matcher, content):  # type: (AnyMatcher, Buffer) -> bool
+        return matcher.pattern.search(content) is not None
+
+    def _finditer(
+        self, matcher, content, position
+    ):  # type: (AnyMatcher, Buffer, int) -> Iterator[Match]
+        return matcher.pattern.finditer(content, position)
+
+    def _scan_mapped(self, view, matcher):  # type: (mmap.mmap, AnyMatcher) -> Scanned
+        binary = is_binary(view)
+        if binary and self.skip_binary:
+            return SKIPPED, None, True, None, None, None
+        return self._match(view, matcher, binary)
+
+    def _scan_stream(
+        self, file, matcher, index
+    ):  # type: (BinaryIO, AnyMatcher, bool) -> Scanned
+        buffer = self._read(file, self.buffer_size)
+        binary = is_binary(buffer)
+        if binary and self.skip_binary:
+            return SKIPPED, None, True, None, None, None
+        if self.any_match and not self.locating:
+            found = self._search_stream(file, matcher, buffer)
+            return found, None, binary, None, None, None
+        if len(buffer) < self.buffer_size:
+            if self.locating or isinstance(matcher, PatternSet):
+                return self._match(buffer, matcher, binary)
+            indexed = index and not binary and len(buffer) <= MAX_INDEXED_SIZE
+            trigrams = build_filter(buffer) if indexed else None
+            return matcher.count(buffer), trigrams, binary, None, None, None
+        if self.locating:
+            return self._locate_stream(file, matcher, buffer, binary)
+        if isinstance(matcher, PatternSet) and matcher.counts_chunks:
+            chunks = iter(partial(self._read, file, self.buffer_size), b"")
+            each = matcher.count_chunks(chain([buffer], chunks))
+        else:
+            each = self._count_stream(file, matcher, buffer)
+        if isinstance(matcher, PatternSet):
+            return sum(each), None, binary, None, each, None
+        return each[0], None, binary, None, None, None
+
+    def _scan_compressed(
+        self, file_path, matcher, compression
+    ):  # type: (Path, AnyMatcher, str) -> Scanned
+        if not is_archive(compression):
+            with open_stream(file_path, compression) as file:
+                return self._scan_stream(file, matcher, False)
+
+        # An archive counts the references of its members, binary ones aside.
+        members = []  # type: List[Member]
+        references = 0
+        each = [0] * len(matcher.matchers) if isinstance(matcher, PatternSet) else None
+        with closing(iter_members(file_path, compression)) as contents:
+            for name, size, content in contents:
+                scanned = self._scan_stream(content, matcher, False)
+                members.append((name, size, scanned[0], scanned[3], scanned[4]))
+                if scanned[0] == SKIPPED:
+                    continue
+                references += scanned[0]
+                if each is not None and scanned[4] is not None:
+                    each = [total + count for total, count in zip(each, scanned[4])]
+                if self.any_match and references:
+                    references = 1
+                    break
+        return references, None, False, None, each, members
+
+    def _match(
+        self, content, matcher, binary
+    ):  # type: (Buffer, AnyMatcher, bool) -> Scanned
+        if self.locating:
+            return self._locate(content, matcher, binary)
+        if self.any_match:
+            return int(self._search(matcher, content)), None, binary, None, None, None
+        if isinstance(matcher, PatternSet):
+            each = matcher.count_each(content)
+            return sum(each), None, binary, None, each, None
+        return matcher.count(content), None, binary, None, None, None
+
+    def _locate(
+        self, content, matcher, binary
+    ):  # type: (Buffer, AnyMatcher, bool) -> Scanned
+        # A set is matched as one alternation here: where several of its strings
+        # match at the same place, only the first one listed is counted.
+        pattern_set = matcher if isinstance(matcher, PatternSet) else None
+        each = [0] * (len(pattern_set.matchers) if pattern_set is not None else 0)
+        lines = LineIndex(content) if self.context is not None else None
+        locations = []  # type: List[Location]
+        count = 0
+
+        for match in islice(matcher.pattern.finditer(content), self.max_matches):
+            count += 1
+            if pattern_set is not None:
+                each[pattern_set.index_of(match)] += 1
+            if lines is not None:
+                locations.append(lines.locate(match.start(), self.context or 0))
+        return (
+            count,
+            None,
+            binary,
+            locations if lines is not None else None,
+            each if pattern_set is not None else None,
+            None,
+        )
+
+    def _overlap(self, matcher: AnyMatcher) -> int:
+        # Bytes a match can extend past the end of a chunk: all but one of the
+        # longest literal, or the reader's overlap when any string is a regex.
+        matchers = matcher.matchers if isinstance(matcher, PatternSet) else [matcher]
+        longest = 0
+        for each in matchers:
+            if each.max_length is None:
+                return self.overlap
+            longest = max(longest, each.max_length)
+        return max(longest - 1, 0)
+
+    def _locate_stream(
+        self, file, matcher, buffer, binary
+    ):  # type: (BinaryIO, AnyMatcher, bytes, bool) -> Scanned
+        # Like _locate() on the whole content. Matches are located once their
+        # line and its lines of context after have been read, and far enough
+        # from the end of the buffer not to be cut short; the buffer keeps the
+        # lines of context before the next match, the number of its line, and
+        # the bytes of that line it no longer has. At most `carried` bytes of
+        # lines are kept for their context: longer lines are located as far as
+        # they are read, and their context truncated.
+        pattern_set = matcher if isinstance(matcher, PatternSet) else None
+        each = [0] * (len(pattern_set.matchers) if pattern_set is not None else 0)
+        context = self.context
+        overlap = self._overlap(matcher)
+        carried = max(self.buffer_size, DEFAULT_OVERLAP)
+        locations = []  # type: List[Location]
+        count, position, first_line, first_column = 0, 0, 0, 0
+
+        while True:
+            chunk = self._read(file, self.buffer_size)
+            limit = len(buffer)
+            if chunk:
+                limit -= overlap
+                if context is not None:
+                    # Past the newline of the line followed by `context` lines.
+                    newline = len(buffer)
+                    for _ in range(context + 1):
+                        newline = buffer.rfind(b"\n", 0, newline)
+                        if newline == -1:
+                            break
+                    limit = min(limit, max(newline + 1, limit - carried))
+            lines = LineIndex(buffer) if context is not None else None
+            for match in self._finditer(matcher, buffer, position):
+                if match.start() >= limit or count == self.max_matches:
+                    break
+                count += 1
+                if pattern_set is not None:
+                    each[pattern_set.index_of(match)] += 1
+                if lines is not None:
+                    location = lines.locate(match.start(), context or 0)
+                    if location.line == 1:
+                        location.column += first_column
+                    location.line += first_line
+                    locations.append(location)
+                position = match.end()
+            if not chunk or count == self.max_matches:
+                return (
+                    count,
+                    None,
+                    binary,
+                    locations if lines is not None else None,
+                    each if pattern_set is not None else None,
+                    None,
+                )
+
+            # Carry the unsearched tail plus one byte before it, so anchors and
+            # word boundaries see the same context they would in the whole
+            # content, and the lines of context before it.
+            resume = max(position, limit)
+            start = max(resume - 1, 0)
+            if context is not None:
+                line_start = buffer.rfind(b"\n", 0, resume) + 1
+                for _ in range(context):
+                    if line_start == 0:
+                        break
+                    line_start = buffer.rfind(b"\n", 0, line_start - 1) + 1
+                start = max(min(start, line_start), resume - carried, 0)
+                newlines = buffer.count(b"\n", 0, start)
+                line_start = buffer.rfind(b"\n", 0, start) + 1
+                first_column = start - line_start + (0 if newlines else first_column)
+                first_line += newlines
+            buffer, position = buffer[start:] + chunk, resume - start
+
+    def _search_stream(
+        self, file, matcher, buffer
+    ):  # type: (BinaryIO, AnyMatcher, bytes) -> int
+        overlap = self._overlap(matcher)
+        chunk = buffer
+
+        # Each chunk is searched with the tail of the previous one, so matches
+        # across a boundary are found, and reading stops at the first match.
+        while not self._search(matcher, buffer):
+            if len(chunk) < self.buffer_size:
+                return 0
+            chunk = self._read(file, self.buffer_size)
+            if not chunk:
+                return 0
+            buffer = buffer[max(len(buffer) - overlap, 0) :] + chunk
+        return 1
+
+    def _count_stream(
+        self, file, matcher, buffer
+    ):  # type: (BinaryIO, AnyMatcher, bytes) -> List[int]
+        # The references of each string, each resuming where it left off.
+        matchers = matcher.matchers if isinstance(matcher, PatternSet) else [matcher]
+        overlap = self._overlap(matcher)
+        references = [0] * len(matchers)
+        positions = [0] * len(matchers)
+
+        while True:
+            chunk = self._read(file, self.buffer_size)
+            for index, each in enumerate(matchers):
+                position = positions[index]
+                limit = max(len(buffer) - overlap, position) if chunk else len(buffer)
+                count, end = each.count_until(buffer, position, limit)
+                references[index] += count
+                positions[index] = max(end, limit)
+            if not chunk:
+                return references
+
+            # Carry the unscanned tail plus one byte before it, so anchors and
+            # word boundaries see the same context they would in the whole file.
+            start = max(min(positions) - 1, 0)
+            buffer = buffer[start:] + chunk
+            positions = [position - start for position in positions]
@@ -0,0 +1,744 @@
+from contextlib import ExitStack
+from itertools import islice
+import os
+from pathlib import Path
+import stat
+from time import perf_counter
+from typing import (
+    Any,
+    Collection,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    TYPE_CHECKING,
+    Union,
+)
+
+from .counts import FileCounts
+from .defaults import BACKENDS, DEFAULT_BUFFER_SIZE, DEFAULT_IN_FLIGHT, DEFAULT_MAX_SIZE
+from .engine import SearchEngine
+from .heat import HeatMap
+from .ignore import PathFilter
+from .locations import Location
+from .matcher import Matcher, PatternSet
+from .reader import AnyMatcher, Member, Reader, SKIPPED
+from .walker import CachedLister, list_directory, ParallelLister
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .aio import AsyncBackend, FileSystem  # noqa: F401
+    from .cache import AnyCache  # noqa: F401
+    from .stats import Stats  # noqa: F401
+
+# What lists the directories of a walk, when not list_directory().
+Lister = Union["AsyncBackend", CachedLister, ParallelLister]
+
+# An entry of a directory, with the (device, inode) it is tracked by, if it is.
+_Keyed = Tuple[os.DirEntry, Optional[Tuple[int, int]]]
+
+# A file of the walk: its directory, itself, the depth of that directory, and
+# the (device, inode) it is searched by, if it is.
+_Walked = Tuple["Node", "Node", int, Optional[Tuple[int, int]]]
+
+# What a file searched was found to have: its references, their locations, the
+# references of each string, and the members of an archive.
+_Found = Tuple[
+    int, Optional[List[Location]], Optional[List[int]], Optional[List[Member]]
+]
+
+# What is kept of it for the other links to the file: its references, and the
+# references of each string.
+_Summary = Tuple[int, Optional[List[int]]]
+
+
+def _count_stat_calls(result):  # type: (ScanResult) -> None
+    if result.stats is not None:
+        result.stats.stat_calls += 1
+
+
+class Node:
+    __slots__ = [
+        "path",
+        "parent_path",
+        "is_last",
+        "is_dir",
+        "references",
+        "matches",
+        "pattern_references",
+        "__weakref__",
+    ]
+
+    def __init__(
+        self, path, parent_path=None, is_last=False, is_dir=None, references=0
+    ):  # type: (Union[str, Path], Optional[Node], bool, Optional[bool], int) -> None
+        self.path = path if isinstance(path, Path) else Path(path)
+        self.parent_path = parent_path
+        self.is_last = is_last
+        self.is_dir = self.path.is_dir() if is_dir is None else is_dir
+        self.references = references
+        self.matches = None  # type: Optional[List[Location]]
+        self.pattern_references = None  # type: Optional[List[int]]
+
+    @property
+    def display_name(self) -> str:
+        return f"{self.path.name}/" if self.is_dir else self.path.name
+
+
+class ScanResult:
+    """Nodes of a scan in display order, with totals updated as they are consumed."""
+
+    __slots__ = [
+        "directories_count",
+        "files_count",
+        "total_refs",
+        "skipped_files",
+        "skipped_bytes",
+        "heat",
+        "pattern_refs",
+        "counts",
+        "stats",
+        "_nodes",
+        "_backend",
+        "_lister",
+        "_device",
+        "_inodes",
+        "_found",
+    ]
+
+    def __init__(self) -> None:
+        self.directories_count = 0
+        self.files_count = 0
+        self.total_refs = 0
+        self.skipped_files = 0
+        self.skipped_bytes = 0
+        self.heat = None  # type: Optional[HeatMap]
+        # Total of each search string, when several are searched at once.
+        self.pattern_refs = None  # type: Optional[List[int]]
+        # Count of every file with references, kept to be updated in place.
+        self.counts = None  # type: Optional[FileCounts]
+        self.stats = None  # type: Optional[Stats]
+        self._nodes = iter(())  # type: Iterator[Node]
+        self._backend = None  # type: Optional[AsyncBackend]
+        # Lists the directories of the walk, when not one at a time.
+        self._lister = None  # type: Optional[Lister]
+        # Device of the root, and the (device, inode) of every directory walked
+        # and of every file searched.
+        self._device = None  # type: Optional[int]
+        self._inodes = set()  # type: Set[Tuple[int, int]]
+        # The references of the files that may have other links, by (device,
+        # inode), for those links.
+        self._found = {}  # type: Dict[Tuple[int, int], _Summary]
+
+    def __iter__(self) -> Iterator[Node]:
+        return self._nodes
+
+
+class Scanner:
+    """Builds the tree of a path, optionally counting the references of a string.
+
+    The walk goes at most max_depth directories down, skips the files bigger
+    than max_filesize bytes, and stops after max_files files. With
+    files_with_matches, files are only read up to their first match and count
+    one reference if they have any; first_match also stops the scan at the
+    first file that matches.
+
+    Each directory is walked once, whatever the links leading to it, so
+    symbolic link cycles end, and each file is searched once, whatever its hard
+    links: the later links are still shown, the directories unwalked and the
+    files with the references found the first time. Symbolic links are followed
+    unless follow_symlinks is false, and the walk stays on the file system of
+    the path if one_file_system.
+
+    With search_compressed, compressed files are searched decompressed, and the
+    members of zip and tar archives with references are shown under them, in
+    the directories they have in the archive.
+
+    The async backend lists directories and reads files concurrently, up to
+    in_flight calls at once, through filesystem. It suits file systems where
+    each call waits on the network. The nodes still come in the same order.
+
+    A long-running process can keep a cache of the counts, and a lister of the
+    directories, from one scan to the next: they are then used instead of the
+    cache on disk, and of listing every directory again.
+
+    A scanner only holds its configuration: every call to scan() gets its own
+    state, so one scanner can be shared by concurrent threads, unless it has a
+    cache or a lister.
+    """
+
+    def __init__(
+        self,
+        search_string=None,
+        mode="auto",
+        jobs=1,
+        pool="process",
+        buffer_size=DEFAULT_BUFFER_SIZE,
+        use_mmap=True,
+        use_cache=True,
+        rebuild_cache=False,
+        cache_size=DEFAULT_MAX_SIZE,
+        node_class=Node,
+        excludes=(),
+        includes=(),
+        use_ignore_files=True,
+        skip_binary=True,
+        top=0,
+        show_matches=False,
+        context=0,
+        max_matches=None,
+        keep_counts=False,
+        stats=False,
+        max_depth=None,
+        max_filesize=None,
+        max_files=None,
+        first_match=False,
+        files_with_matches=False,
+        backend="sync",
+        in_flight=DEFAULT_IN_FLIGHT,
+        filesystem=None,
+        follow_symlinks=True,
+        one_file_system=False,
+        search_compressed=False,
+        cache=None,
+        lister=None,
+    ):  # type: (Union[None, str, Sequence[str]], str, int, str, int, bool, bool, bool, int, Type[Node], Collection[str], Collection[str], bool, bool, int, bool, int, Optional[int], bool, bool, Optional[int], Optional[int], Optional[int], bool, bool, str, int, Optional[FileSystem], bool, bool, bool, Optional[AnyCache], Optional[CachedLister]) -> None  # noqa: B950
+        if backend not in BACKENDS:
+            raise ValueError(
+                f"Unknown backend {backend!r}, expected one of {BACKENDS}."
+            )
+
+        self.matcher = None  # type: Optional[AnyMatcher]
+        if isinstance(search_string, str):
+            self.matcher = Matcher(search_string, mode)
+        elif search_string is not None:
+            self.matcher = PatternSet(search_string, mode)
+        any_match = first_match or files_with_matches
+        self.reader = Reader(
+            buffer_size=buffer_size,
+            use_mmap=use_mmap,
+            skip_binary=skip_binary,
+            context=context if show_matches else None,
+            # Only the first match of a file is then shown.
+            max_matches=1 if any_match and show_matches else max_matches,
+            any_match=any_match,
+            search_compressed=search_compressed,
+        )
+        self.jobs = jobs
+        self.pool = pool
+        self.use_cache = use_cache
+        self.rebuild_cache = rebuild_cache
+        self.cache_size = cache_size
+        self.node_class = node_class
+        self.excludes = tuple(excludes)
+        self.includes = tuple(includes)
+        self.use_ignore_files = use_ignore_files
+        self.top = top
+        self.keep_counts = keep_counts
+        self.stats = stats
+        self.max_depth = max_depth
+        self.max_filesize = max_filesize
+        self.max_files = max_files
+        self.first_match = first_match
+        self.backend = backend
+        self.in_flight = in_flight
+        self.filesystem = filesystem
+        self.follow_symlinks = follow_symlinks
+        self.one_file_system = one_file_system
+        self.cache = cache
+        self.lister = lister
+
+    def scan(self, path: Path) -> ScanResult:
+        result = ScanResult()
+        if self.stats:
+            # Imported here, so that scans without stats don't even load them.
+            from .stats import Stats  # noqa: F811
+
+            result.stats = Stats()
+        if self.matcher is None:
+            result._nodes = self._make_only_tree(path, result)
+        else:
+            if self.top > 0:
+                result.heat = HeatMap(self.top)
+            if isinstance(self.matcher, PatternSet):
+                result.pattern_refs = [0] * len(self.matcher.matchers)
+            if self.keep_counts:
+                result.counts = FileCounts(str(Path(str(path)).resolve()))
+            result._nodes = self._search(path, self.matcher, result)
+        if self.backend == "async":
+            result._nodes = self._run_async(result._nodes, result)
+        elif self.lister is not None:
+            result._lister = self.lister
+        elif self.matcher is None and self.jobs != 1:
+            result._nodes = self._run_parallel(result._nodes, result)
+        if result.stats is not None:
+            result._nodes = result.stats.measure(result._nodes)
+        return result
+
+    def _run_async(
+        self, nodes, result
+    ):  # type: (Iterator[Node], ScanResult) -> Iterator[Node]
+        # Imported here, so asyncio is only loaded by the scans that use it.
+        from .aio import AsyncBackend  # noqa: F811
+
+        with AsyncBackend(self.in_flight, self.filesystem) as backend:
+            result._backend = result._lister = backend
+            yield from nodes
+        result._backend = result._lister = None
+
+    def _run_parallel(
+        self, nodes, result
+    ):  # type: (Iterator[Node], ScanResult) -> Iterator[Node]
+        # Only the tree is walked: the jobs list the directories ahead instead.
+        with ParallelLister(self.jobs or os.cpu_count() or 1) as lister:
+            result._lister = lister
+            yield from nodes
+        result._lister = None
+
+    def _search(
+        self, path, matcher, result
+    ):  # type: (Path, AnyMatcher, ScanResult) -> Iterator[Node]
+        with ExitStack() as stack:
+            cache = None
+            # Cached counts have no locations, nor any cap on the matches, and
+            # the counts of pattern sets, of files only read up to their first
+            # match, or of decompressed files, aren't cached.
+            if (
+                self.use_cache
+                and not self.reader.locating
+                and not self.reader.any_match
+                and not self.reader.search_compressed
+                and isinstance(matcher, Matcher)
+            ):
+                cache = self.cache
+                if cache is None:
+                    # Imported here, so sqlite3 is only loaded by cached searches.
+                    from .cache import open_cache
+
+                    cache = open_cache(
+                        max_size=self.cache_size, rebuild=self.rebuild_cache
+                    )
+                    if cache is not None:
+                        stack.enter_context(cache)
+            if result._backend is not None:
+                from .aio import AsyncSearchEngine
+
+                engine = AsyncSearchEngine(
+                    matcher,
+                    result._backend,
+                    reader=self.reader,
+                    cache=cache,
+                    stats=result.stats,
+                )  # type: SearchEngine
+            else:
+                engine = SearchEngine(
+                    matcher,
+                    jobs=self.jobs,
+                    pool=self.pool,
+                    reader=self.reader,
+                    cache=cache,
+                    stats=result.stats,
+                )
+            stack.enter_context(engine)
+            yield from self._make_tree_with_references(path, result, engine)
+
+    def _walk_files(
+        self, path, result
+    ):  # type: (Path, ScanResult) -> Iterator[_Walked]
+        root = Path(str(path)).resolve()
+        displayable_root = self.node_class(root)
+        _count_stat_calls(result)
+
+        if displayable_root.is_dir:
+            yield from self._walk_directory_files(
+                displayable_root, self.make_filter(root), result
+            )
+        else:
+            yield displayable_root, self.node_class(
+                root, displayable_root, is_last=True, is_dir=False
+            ), 0, None
+
+    def _walk_directory_files(
+        self, displayable_root, path_filter, result, depth=0
+    ):  # type: (Node, PathFilter, ScanResult, int) -> Iterator[_Walked]
+        if self.max_depth is not None and depth >= self.max_depth:
+            return
+        children, path_filter = self._get_directory_children(
+            displayable_root.path, path_filter, result, depth
+        )
+
+        directory_index = 1
+        for entry, key in children:
+            is_last = directory_index == len(children)
+            if entry.is_dir(follow_symlinks=self.follow_symlinks):
+                if self._first_visit(key, result):
+                    directory = self.node_class(
+                        entry.path, displayable_root, is_last, is_dir=True
+                    )
+                    yield from self._walk_directory_files(
+                        directory, path_filter, result, depth + 1
+                    )
+            else:
+                yield displayable_root, self.node_class(
+                    entry.path, displayable_root, is_last, is_dir=False
+                ), depth, key
+            directory_index += 1
+
+    def _make_tree_with_references(
+        self, path, result, engine
+    ):  # type: (Path, ScanResult, SearchEngine) -> Iterator[Node]
+        # The directories shown, by depth, down to the directory of the last
+        # file with references: only those leading to it are kept.
+        shown = []  # type: List[Optional[Node]]
+        files = self._walk_files(path, result)
+        if self.max_files is not None:
+            files = islice(files, self.max_files)
+
+        # The hard links found after the last file searched, shown once the
+        # engine is past it.
+        links = []  # type: List[_Walked]
+        for (
+            ((displayable_root, file, depth, key), links_after),
+            string_references,
+            locations,
+            each,
+            members,
+        ) in engine.scan(
+            self._group_links(files, result), key=lambda item: item[0][1].path
+        ):
+            yield from self._show_links(links, result, shown)
+            links = links_after
+            if members is not None:
+                self._count_skipped_members(members, result)
+            if string_references == SKIPPED:
+                result.skipped_files += 1
+                result.skipped_bytes += self._get_size(file.path, result)
+            elif string_references != 0:
+                found = (string_references, locations, each, members)
+                if key is not None and self._may_be_linked(file, result):
+                    result._found[key] = (string_references, each)
+                yield from self._show_file(
+                    displayable_root, file, depth, found, result, shown
+                )
+                if self.first_match:
+                    links = []
+                    break
+        yield from self._show_links(links, result, shown)
+
+        if result.heat is not None:
+            result.heat.finish()
+
+    def _group_links(
+        self, files, result
+    ):  # type: (Iterable[_Walked], ScanResult) -> Iterator[Tuple[_Walked, List[_Walked]]]  # noqa: B950
+        # Each file to search, with the hard links to files searched already that
+        # the walk finds after it, until the next file to search.
+        links = []  # type: List[_Walked]
+        for file in files:
+            if self._first_visit(file[3], result):
+                links = []
+                yield file, links
+            else:
+                links.append(file)
+
+    def _show_links(
+        self, links, result, shown
+    ):  # type: (List[_Walked], ScanResult, List[Optional[Node]]) -> Iterator[Node]
+        # Links to files without references, or skipped, aren't shown. Those shown
+        # have the references of the file, but not their locations.
+        for displayable_root, file, depth, key in links:
+            summary = result._found.get(key) if key is not None else None
+            if summary is not None:
+                references, each = summary
+                yield from self._show_file(
+                    displayable_root,
+                    file,
+                    depth,
+                    (references, None, each, None),
+                    result,
+                    shown,
+                )
+
+    def _show_file(
+        self, displayable_root, file, depth, found, result, shown
+    ):  # type: (Node, Node, int, _Found, ScanResult, List[Optional[Node]]) -> Iterator[Node]  # noqa: B950
+        file.references, file.matches, file.pattern_references, members = found
+        self._add_references(file, result)
+        for directory in self._unshown_directories(displayable_root, depth, shown):
+            result.directories_count += 1
+            yield directory
+        result.files_count += 1
+        yield file
+        if members is not None:
+            yield from self._make_archive_tree(file, members, result)
+
+    def _make_only_tree(
+        self, path, result
+    ):  # type: (Path, ScanResult) -> Iterator[Node]
+        root = Path(str(path)).resolve()
+        displayable_root = self.node_class(root, is_dir=True)
+
+        yield displayable_root
+        yield from self._make_directory_tree(
+            displayable_root, result, self.make_filter(root)
+        )
+
+    def _make_directory_tree(
+        self, displayable_root, result, path_filter, depth=0
+    ):  # type: (Node, ScanResult, PathFilter, int) -> Iterator[Node]
+        # Directories at the maximum depth are shown, but never listed.
+        if self.max_depth is not None and depth >= self.max_depth:
+            return
+        children, path_filter = self._get_directory_children(
+            displayable_root.path, path_filter, result, depth
+        )
+
+        directory_index = 1
+        for entry, key in children:
+            if self.max_files is not None and result.files_count >= self.max_files:
+                return
+            is_last = directory_index == len(children)
+            is_dir = entry.is_dir(follow_symlinks=self.follow_symlinks)
+            child = self.node_class(entry.path, displayable_root, is_last, is_dir)
+            yield child
+            if is_dir:
+                result.directories_count += 1
+                if self._first_visit(key, result):
+                    yield from self._make_directory_tree(
+                        child, result, path_filter, depth + 1
+                    )
+            else:
+                result.files_count += 1
+            directory_index += 1
+
+    @staticmethod
+    def _add_references(file, result):  # type: (Node, ScanResult) -> None
+        each = file.pattern_references
+        if result.pattern_refs is not None and each is not None:
+            for index, references in enumerate(each):
+                result.pattern_refs[index] += references
+        result.total_refs += file.references
+        if result.heat is not None:
+            result.heat.add(file)
+        if result.counts is not None:
+            result.counts.set(str(file.path), file.references)
+
+    @staticmethod
+    def _count_skipped_members(
+        members, result
+    ):  # type: (List[Member], ScanResult) -> None
+        for _, size, references, _, _ in members:
+            if references == SKIPPED:
+                result.skipped_files += 1
+                result.skipped_bytes += size
+
+    def _make_archive_tree(
+        self, archive, members, result
+    ):  # type: (Node, List[Member], ScanResult) -> Iterator[Node]
+        # The members with references, sorted like a walk would list them, under
+        # the directories leading to them in the archive.
+        tree = {}  # type: Dict[str, Any]
+        for name, _, references, locations, each in sorted(
+            members, key=lambda member: member[0].split("/")
+        ):
+            if references <= 0:
+                continue
+            *directories, base = [
+                part for part in name.split("/") if part not in ("", ".")
+            ]
+            children = tree
+            for directory in directories:
+                children = children.setdefault(directory + "/", {})
+            children[base] = (references, locations, each)
+        yield from self._make_member_nodes(archive, tree, result)
+
+    def _make_member_nodes(
+        self, parent, tree, result
+    ):  # type: (Node, Dict[str, Any], ScanResult) -> Iterator[Node]
+        for index, (name, child) in enumerate(tree.items(), 1):
+            is_last = index == len(tree)
+            is_dir = isinstance(child, dict)
+            node = self.node_class(
+                parent.path / name.rstrip("/"), parent, is_last, is_dir
+            )
+            if is_dir:
+                result.directories_count += 1
+                yield node
+                yield from self._make_member_nodes(node, child, result)
+            else:
+                node.references, node.matches, node.pattern_references = child
+                result.files_count += 1
+                yield node
+
+    @staticmethod
+    def _unshown_directories(
+        directory, depth, shown
+    ):  # type: (Node, int, List[Optional[Node]]) -> List[Node]
+        # Before its first file with references, a directory is shown, after its
+        # parent unless that was shown already; the directories above aren't.
+        # Files come in walk order, so a directory shown is the last one shown
+        # at its depth for as long as files under it come.
+        del shown[depth + 1 :]
+        shown.extend([None] * (depth + 1 - len(shown)))
+        unshown = []  # type: List[Node]
+        parent = directory.parent_path
+        if parent is not None and shown[depth - 1] is not parent:
+            shown[depth - 1] = parent
+            unshown.append(parent)
+        if directory.is_dir and shown[depth] is not directory:
+            shown[depth] = directory
+            unshown.append(directory)
+        return unshown
+
+    def searched_stat(self, path: str) -> Optional[os.stat_result]:
+        """The stat of the file at path if a scan would search it, else None."""
+        try:
+            if not self.follow_symlinks and os.path.islink(path):
+                return None
+            status = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(status.st_mode):
+            return None
+        if self.max_filesize is not None and status.st_size > self.max_filesize:
+            return None
+        return status
+
+    def make_filter(self, root: Path) -> PathFilter:
+        """Filter of the paths under root, from the options and ignore files."""
+        return PathFilter.for_root(
+            root, self.excludes, self.includes, self.use_ignore_files
+        )
+
+    def _keyed(
+        self, root, children, result
+    ):  # type: (Path, List[os.DirEntry], ScanResult) -> List[_Keyed]
+        # Each entry with the (device, inode) it is tracked by. Files are only
+        # tracked when they are searched, by the inode readdir() reports, on the
+        # device of their directory. Only the directories, and the files behind
+        # symbolic links, cost a stat().
+        searching = self.matcher is not None
+        device = -1
+        if searching or result._device is None:
+            stat = os.stat(root)
+            _count_stat_calls(result)
+            device = stat.st_dev
+            if result._device is None:
+                result._device = device
+                result._inodes.add((stat.st_dev, stat.st_ino))
+
+        keyed = []  # type: List[_Keyed]
+        for entry in children:
+            if entry.is_dir(follow_symlinks=self.follow_symlinks):
+                key = self._stat_key(entry, result)
+                if (
+                    key is not None
+                    and self.one_file_system
+                    and key[0] != result._device
+                ):
+                    continue
+            elif not searching:
+                key = None
+            elif entry.is_symlink():
+                # Unless followed, links aren't searched, nor are broken ones.
+                key = self._stat_key(entry, result) if self.follow_symlinks else None
+                if key is None:
+                    continue
+            else:
+                key = (device, entry.inode())
+            keyed.append((entry, key))
+        return keyed
+
+    @staticmethod
+    def _first_visit(
+        key, result
+    ):  # type: (Optional[Tuple[int, int]], ScanResult) -> bool
+        # Whether the walk reaches the directory or file of key for the first
+        # time, in which case it is now visited.
+        if key is None:
+            return True
+        if key in result._inodes:
+            return False
+        result._inodes.add(key)
+        return True
+
+    def _may_be_linked(self, file, result):  # type: (Node, ScanResult) -> bool
+        # Any file may be reached again through a symbolic link when they are
+        # followed, otherwise only through its other hard links.
+        if self.follow_symlinks:
+            return True
+        _count_stat_calls(result)
+        try:
+            return os.stat(file.path).st_nlink > 1
+        except OSError:
+            return False
+
+    @staticmethod
+    def _stat_key(
+        entry, result
+    ):  # type: (os.DirEntry, ScanResult) -> Optional[Tuple[int, int]]
+        _count_stat_calls(result)
+        try:
+            stat = entry.stat()
+        except OSError:
+            return None
+        return stat.st_dev, stat.st_ino
+
+    def _fits(self, entry, result):  # type: (os.DirEntry, ScanResult) -> bool
+        if entry.is_dir():
+            return True
+        _count_stat_calls(result)
+        try:
+            return entry.stat().st_size <= self.max_filesize  # type: ignore
+        except OSError:
+            return True
+
+    @staticmethod
+    def _get_size(path, result):  # type: (Path, ScanResult) -> int
+        _count_stat_calls(result)
+        try:
+            return os.stat(path).st_size
+        except OSError:
+            return 0
+
+    def _get_directory_children(
+        self, root, path_filter, result, depth
+    ):  # type: (Path, PathFilter, ScanResult, int) -> Tuple[List[_Keyed], PathFilter]
+        # Entries are filtered before the walk descends into them, so ignored
+        # subtrees are never listed.
+        stats, lister = result.stats, result._lister
+        start = perf_counter() if stats is not None else 0.0
+        if lister is None:
+            children = list_directory(root)
+        else:
+            children = lister.list_directory(root)
+            if isinstance(lister, CachedLister):
+                # Its listings are checked with a stat of the directory.
+                _count_stat_calls(result)
+        path_filter = path_filter.for_directory(
+            str(root), [entry.name for entry in children]
+        )
+        children = [
+            entry
+            for entry in children
+            if not path_filter.is_excluded(entry.path, entry.is_dir())
+        ]
+        if self.max_filesize is not None:
+            children = [entry for entry in children if self._fits(entry, result)]
+        keyed = self._keyed(root, children, result)
+        if stats is not None:
+            stats.add_directory(perf_counter() - start)
+        if lister is not None and (
+            self.max_depth is None or depth + 1 < self.max_depth
+        ):
+            lister.prefetch(
+                entry.path
+                for entry, key in keyed
+                if entry.is_dir(follow_symlinks=self.follow_symlinks)
+                and key not in result._inodes
+            )
+        return keyed, path_filter
@@ -0,0 +1,284 @@
+from heapq import heappush, heappushpop
+from mmap import mmap
+from pathlib import Path
+from time import perf_counter
+from typing import (
+    Any,
+    BinaryIO,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Match,
+    Tuple,
+    TypeVar,
+)
+
+from .matcher import Buffer, Matcher, PatternSet
+from .reader import AnyMatcher, Reader, Scanned, SKIPPED
+
+T = TypeVar("T")
+
+
+class Stats:
+    """Counters and timers of a scan, only collected when asked for.
+
+    Reads are timed where they happen, in the worker processes too, and the
+    time of the regular expressions is taken out of them. Stat calls are
+    counted where the scan makes them; those os.scandir() makes aren't seen.
+    """
+
+    __slots__ = [
+        "slowest_size",
+        "directories",
+        "stat_calls",
+        "files_read",
+        "bytes_read",
+        "files_skipped",
+        "cached_files",
+        "walk_time",
+        "read_time",
+        "match_time",
+        "scan_time",
+        "render_time",
+        "_slowest",
+    ]
+
+    def __init__(self, slowest_size: int = 10) -> None:
+        self.slowest_size = slowest_size
+        self.directories = 0
+        self.stat_calls = 0
+        self.files_read = 0
+        self.bytes_read = 0
+        self.files_skipped = 0
+        self.cached_files = 0
+        self.walk_time = 0.0
+        # Reading and matching the files, as measured where they are scanned.
+        self.read_time = 0.0
+        self.match_time = 0.0
+        # Waiting for the nodes of the scan, and writing them out.
+        self.scan_time = 0.0
+        self.render_time = 0.0
+        self._slowest = []  # type: List[Tuple[float, str]]
+
+    def add_directory(self, elapsed: float) -> None:
+        self.directories += 1
+        self.walk_time += elapsed
+
+    def add_file(
+        self, path, elapsed, size, skipped
+    ):  # type: (str, float, int, bool) -> None
+        if skipped:
+            self.files_skipped += 1
+        else:
+            self.files_read += 1
+            self.bytes_read += size
+        self.read_time += elapsed
+        self._push(elapsed, path)
+
+    def _push(self, elapsed: float, path: str) -> None:
+        if len(self._slowest) < self.slowest_size:
+            heappush(self._slowest, (elapsed, path))
+        elif (elapsed, path) > self._slowest[0]:
+            heappushpop(self._slowest, (elapsed, path))
+
+    def slowest(self) -> List[Tuple[Path, float]]:
+        return [(Path(path), elapsed) for elapsed, path in sorted(self._slowest)[::-1]]
+
+    def merge(self, other: "Stats") -> None:
+        """Add the counts of a scan made elsewhere, like in a worker process."""
+        for name in self.__slots__:
+            if name not in ("slowest_size", "_slowest"):
+                setattr(self, name, getattr(self, name) + getattr(other, name))
+        for elapsed, path in other._slowest:
+            self._push(elapsed, path)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "directories_listed": self.directories,
+            "stat_calls": self.stat_calls,
+            "files_read": self.files_read,
+            "bytes_read": self.bytes_read,
+            "files_skipped": self.files_skipped,
+            "cached_files": self.cached_files,
+            "walk_seconds": self.walk_time,
+            "read_seconds": self.read_time - self.match_time,
+            "regex_seconds": self.match_time,
+            "scan_seconds": self.scan_time,
+            "render_seconds": self.render_time,
+            "slowest_files": [
+                {"path": str(path), "seconds": elapsed}
+                for path, elapsed in self.slowest()
+            ],
+        }
+
+    def measure(self, nodes: Iterable[T]) -> Iterator[T]:
+        """Yield the nodes of a scan, adding the time taken to get each one."""
+        iterator = iter(nodes)
+        while True:
+            start = perf_counter()
+            try:
+                node = next(iterator)
+            except StopIteration:
+                self.scan_time += perf_counter() - start
+                return
+            self.scan_time += perf_counter() - start
+            yield node
+
+
+def _timed(items, elapsed):  # type: (Iterable[T], List[float]) -> Iterator[T]
+    # Yield the items, adding the time taken to get each one to elapsed[0].
+    iterator = iter(items)
+    while True:
+        start = perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            elapsed[0] += perf_counter() - start
+            return
+        elapsed[0] += perf_counter() - start
+        yield item
+
+
+class _MeasuredMatcher(Matcher):
+    __slots__ = ["stats"]
+
+    def __init__(self, matcher, stats):  # type: (Matcher, Stats) -> None
+        # A copy of the matcher, which is compiled already.
+        for name in Matcher.__slots__:
+            setattr(self, name, getattr(matcher, name))
+        self.stats = stats
+
+    def count(self, content: Buffer) -> int:
+        start = perf_counter()
+        try:
+            return super().count(content)
+        finally:
+            self.stats.match_time += perf_counter() - start
+
+    def count_until(
+        self, content, position, limit
+    ):  # type: (bytes, int, int) -> Tuple[int, int]
+        start = perf_counter()
+        try:
+            return super().count_until(content, position, limit)
+        finally:
+            self.stats.match_time += perf_counter() - start
+
+
+class _MeasuredPatternSet(PatternSet):
+    __slots__ = ["stats"]
+
+    def __init__(self, pattern_set, stats):  # type: (PatternSet, Stats) -> None
+        # A copy of the pattern set, which is compiled already.
+        for name in PatternSet.__slots__:
+            setattr(self, name, getattr(pattern_set, name))
+        self.stats = stats
+
+    def count_each(self, content: Buffer) -> List[int]:
+        if self.counts_chunks:
+            # Measured by count_chunks().
+            return super().count_each(content)
+        start = perf_counter()
+        try:
+            return super().count_each(content)
+        finally:
+            self.stats.match_time += perf_counter() - start
+
+    def count_chunks(self, chunks: Iterable[bytes]) -> List[int]:
+        # The chunks may be read as they are counted: that time isn't matching.
+        reading = [0.0]
+        start = perf_counter()
+        try:
+            return super().count_chunks(_timed(chunks, reading))
+        finally:
+            self.stats.match_time += perf_counter() - start - reading[0]
+
+
+def measured_matcher(matcher, stats):  # type: (AnyMatcher, Stats) -> AnyMatcher
+    """A copy of the matcher whose matching methods add their time to stats."""
+    if isinstance(matcher, PatternSet):
+        return _MeasuredPatternSet(matcher, stats)
+    return _MeasuredMatcher(matcher, stats)
+
+
+class MeasuredReader(Reader):
+    """A reader that adds the time, the bytes read and the matching time of each
+    file to stats."""
+
+    __slots__ = ["stats", "_bytes_read"]
+
+    def __init__(self, reader, stats):  # type: (Reader, Stats) -> None
+        super().__init__(
+            buffer_size=reader.buffer_size,
+            use_mmap=reader.use_mmap,
+            overlap=reader.overlap,
+            skip_binary=reader.skip_binary,
+            context=reader.context,
+            max_matches=reader.max_matches,
+            any_match=reader.any_match,
+            search_compressed=reader.search_compressed,
+        )
+        self.stats = stats
+        self._bytes_read = 0
+
+    def scan(
+        self, file_path, matcher, index=False
+    ):  # type: (Path, AnyMatcher, bool) -> Scanned
+        self._bytes_read = 0
+        start = perf_counter()
+        scanned = super().scan(file_path, matcher, index)
+        elapsed = perf_counter() - start
+        self.stats.add_file(
+            str(file_path), elapsed, self._bytes_read, scanned[0] == SKIPPED
+        )
+        return scanned
+
+    def _size(self, file: BinaryIO) -> int:
+        self.stats.stat_calls += 1
+        return super()._size(file)
+
+    def _read(self, file: BinaryIO, size: int) -> bytes:
+        chunk = super()._read(file, size)
+        self._bytes_read += len(chunk)
+        return chunk
+
+    def _scan_mapped(self, view, matcher):  # type: (mmap, AnyMatcher) -> Scanned
+        # Mapped files are matched as a whole, in place.
+        self._bytes_read += len(view)
+        return super()._scan_mapped(view, matcher)
+
+    def _search(self, matcher, content):  # type: (AnyMatcher, Buffer) -> bool
+        start = perf_counter()
+        try:
+            return super()._search(matcher, content)
+        finally:
+            self.stats.match_time += perf_counter() - start
+
+    def _finditer(
+        self, matcher, content, position
+    ):  # type: (AnyMatcher, Buffer, int) -> Iterator[Match]
+        elapsed = [0.0]
+        try:
+            yield from _timed(super()._finditer(matcher, content, position), elapsed)
+        finally:
+            self.stats.match_time += elapsed[0]
+
+    def _locate(
+        self, content, matcher, binary
+    ):  # type: (Buffer, AnyMatcher, bool) -> Scanned
+        start = perf_counter()
+        try:
+            return super()._locate(content, matcher, binary)
+        finally:
+            self.stats.match_time += perf_counter() - start
+
+
+def scan_batch_measured(
+    reader, matcher, index, paths
+):  # type: (Reader, AnyMatcher, bool, List[Path]) -> Tuple[List[Scanned], Stats]
+    """Scan a batch of files like the engine does, with the stats of the batch."""
+    stats = Stats()
+    measured_reader = MeasuredReader(reader, stats)
+    matcher = measured_matcher(matcher, stats)
+    return [measured_reader.scan(path, matcher, index) for path in paths], stats
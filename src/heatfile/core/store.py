@@ -0,0 +1,146 @@
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Type
+
+from .locations import Location
+from .scanner import Node
+
+_IS_DIR = 1
+_IS_LAST = 2
+
+_Extras = Tuple[Optional[List[Location]], Optional[List[int]]]
+
+
+class NodeStore:
+    """The nodes of a scan, kept without their objects until they are iterated.
+
+    Each node takes a row of machine integers: the position of its name in a
+    table of the distinct names, the row of its parent, its flags and its
+    references. Only the match locations and references of each string, when
+    a node has any, are kept as objects. Iterating the store materialises the
+    nodes again, in the order they were added, as instances of node_class
+    sharing their parents as the nodes of a scan do.
+
+    The parents of the nodes added, even those never added themselves, are
+    stored too, since rendering a node needs them.
+    """
+
+    __slots__ = [
+        "node_class",
+        "_names",
+        "_name_ids",
+        "_name_of",
+        "_parents",
+        "_flags",
+        "_references",
+        "_extras",
+        "_shown",
+        "_open",
+        "_open_rows",
+    ]
+
+    def __init__(self, node_class=Node):  # type: (Type[Node]) -> None
+        self.node_class = node_class
+        self._names = []  # type: List[str]
+        self._name_ids = {}  # type: Dict[str, int]
+        self._name_of = array("I")
+        self._parents = array("i")
+        self._flags = array("B")
+        self._references = array("q")
+        self._extras = {}  # type: Dict[int, _Extras]
+        # Rows of the nodes added, in order.
+        self._shown = array("i")
+        # The last node added and its parents, root first, and their rows by id.
+        self._open = []  # type: List[Node]
+        self._open_rows = {}  # type: Dict[int, int]
+
+    def __len__(self) -> int:
+        return len(self._shown)
+
+    def extend(self, nodes: Iterable[Node]) -> None:
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: Node) -> None:
+        """Store a node, whose parents are either stored already or new.
+
+        Nodes must be added in the order of the scan: only the parents of the
+        last node added are remembered.
+        """
+        row = self._open_rows.get(id(node))
+        if row is None:
+            missing = [node]
+            parent = node.parent_path
+            while parent is not None and id(parent) not in self._open_rows:
+                missing.append(parent)
+                parent = parent.parent_path
+            while self._open and self._open[-1] is not parent:
+                del self._open_rows[id(self._open.pop())]
+            for new_node in reversed(missing):
+                row = self._append(new_node)
+                self._open.append(new_node)
+                self._open_rows[id(new_node)] = row
+        self._shown.append(row)  # type: ignore
+
+    def _append(self, node: Node) -> int:
+        # Names are relative to the parent: the root has its whole path, and the
+        # file of a scan of that file alone, an empty name.
+        if not self._open:
+            parent_row, name = -1, str(node.path)
+        else:
+            parent = self._open[-1]
+            parent_row = self._open_rows[id(parent)]
+            name = (
+                "" if not parent.is_dir and node.path == parent.path else node.path.name
+            )
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self._names)
+            self._names.append(name)
+        row = len(self._parents)
+        self._name_of.append(name_id)
+        self._parents.append(parent_row)
+        self._flags.append(
+            (_IS_DIR if node.is_dir else 0) | (_IS_LAST if node.is_last else 0)
+        )
+        self._references.append(node.references)
+        if node.matches is not None or node.pattern_references is not None:
+            self._extras[row] = (node.matches, node.pattern_references)
+        return row
+
+    def __iter__(self) -> Iterator[Node]:
+        # The materialised nodes leading to the last one, by row, are reused:
+        # each parent is materialised once for all its children.
+        rows = []  # type: List[int]
+        nodes = {}  # type: Dict[int, Node]
+        for row in self._shown:
+            missing = []  # type: List[int]
+            parent_row = row
+            while parent_row >= 0 and parent_row not in nodes:
+                missing.append(parent_row)
+                parent_row = self._parents[parent_row]
+            while rows and rows[-1] != parent_row:
+                del nodes[rows.pop()]
+            for new_row in reversed(missing):
+                parent = nodes[rows[-1]] if rows else None
+                nodes[new_row] = self._materialize(new_row, parent)
+                rows.append(new_row)
+            yield nodes[row]
+
+    def _materialize(self, row, parent):  # type: (int, Optional[Node]) -> Node
+        name = self._names[self._name_of[row]]
+        if parent is None:
+            path = Path(name)
+        else:
+            path = parent.path / name if name else parent.path
+        flags = self._flags[row]
+        node = self.node_class(
+            path,
+            parent,
+            is_last=bool(flags & _IS_LAST),
+            is_dir=bool(flags & _IS_DIR),
+            references=self._references[row],
+        )
+        if row in self._extras:
+            node.matches, node.pattern_references = self._extras[row]
+        return node
@@ -0,0 +1,152 @@
+from collections import deque
+from operator import attrgetter
+import os
+from pathlib import Path
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    TYPE_CHECKING,
+    Union,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    from concurrent.futures import Future  # noqa: F401
+
+_by_name = attrgetter("name")
+
+
+def list_directory(path):  # type: (Union[str, Path]) -> List[os.DirEntry]
+    # DirEntry keeps the file type reported by readdir(), so callers can tell
+    # directories from files without an extra stat() per entry.
+    with os.scandir(path) as entries:
+        return sorted(entries, key=_by_name)
+
+
+class ParallelLister:
+    """Lists directories in a thread pool, ahead of a depth-first walk.
+
+    The walk tells which directories it will list, in order, with prefetch():
+    those of a directory just listed come before any other. The nearest of
+    them are listed by the pool, never more than window at a time, so memory
+    stays bounded however wide or deep the tree.
+    """
+
+    __slots__ = ["window", "_executor", "_upcoming", "_listings"]
+
+    def __init__(self, jobs, window=None):  # type: (int, Optional[int]) -> None
+        # Imported here: only parallel walks need a pool.
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.window = window or 8 * jobs
+        self._executor = ThreadPoolExecutor(max_workers=jobs)
+        self._upcoming = deque()  # type: Deque[str]
+        self._listings = {}  # type: Dict[str, Future]
+
+    def __enter__(self) -> "ParallelLister":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for listing in self._listings.values():
+            listing.cancel()
+        self._listings.clear()
+        self._upcoming.clear()
+        self._executor.shutdown(wait=True)
+
+    def prefetch(self, paths: Iterable[str]) -> None:
+        """Queue the directories to list next, before the ones already queued."""
+        self._upcoming.extendleft(reversed(list(paths)))
+        self._fill()
+
+    def list_directory(self, path):  # type: (Union[str, Path]) -> List[os.DirEntry]
+        # Refilled only now, once the walk could prefetch what comes first.
+        self._fill()
+        path = str(path)
+        if self._upcoming and self._upcoming[0] != path and path in self._upcoming:
+            # The directories queued before it were left out by the walk.
+            while self._upcoming[0] != path:
+                skipped = self._listings.pop(self._upcoming.popleft(), None)
+                if skipped is not None:
+                    skipped.cancel()
+        if self._upcoming and self._upcoming[0] == path:
+            self._upcoming.popleft()
+        listing = self._listings.pop(path, None)
+        return list_directory(path) if listing is None else listing.result()
+
+    def _fill(self) -> None:
+        for path in self._upcoming:
+            if len(self._listings) >= self.window:
+                break
+            if path not in self._listings:
+                self._listings[path] = self._executor.submit(list_directory, path)
+
+
+class CachedEntry:
+    """The parts of an os.DirEntry a walk uses, kept while its directory stays
+    the same. Unlike os.DirEntry, stat() is never cached: sizes may change."""
+
+    __slots__ = ["name", "path", "_inode", "_is_symlink", "_is_dir", "_is_target_dir"]
+
+    def __init__(self, entry: os.DirEntry) -> None:
+        self.name = entry.name
+        self.path = entry.path
+        self._inode = entry.inode()
+        self._is_symlink = entry.is_symlink()
+        self._is_dir = entry.is_dir(follow_symlinks=False)
+        self._is_target_dir = entry.is_dir() if self._is_symlink else self._is_dir
+
+    def inode(self) -> int:
+        return self._inode
+
+    def is_symlink(self) -> bool:
+        return self._is_symlink
+
+    def is_dir(self, follow_symlinks: bool = True) -> bool:
+        return self._is_target_dir if follow_symlinks else self._is_dir
+
+    def stat(self, follow_symlinks: bool = True) -> os.stat_result:
+        return os.stat(self.path, follow_symlinks=follow_symlinks)
+
+
+class CachedLister:
+    """Keeps the listing of every directory, listed again only once the
+    directory was modified, for processes that walk the same trees again.
+
+    Adding, removing or renaming an entry changes the modification time of its
+    directory, so a stat() tells whether a listing is still valid.
+    """
+
+    __slots__ = ["_listings"]
+
+    def __init__(self) -> None:
+        self._listings = {}  # type: Dict[str, Tuple[Tuple[int, int], List[Any]]]
+
+    def prefetch(self, paths: Iterable[str]) -> None:
+        pass
+
+    def list_directory(self, path):  # type: (Union[str, Path]) -> List[os.DirEntry]
+        path = str(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._listings.pop(path, None)
+            raise
+        signature = (stat.st_ino, stat.st_mtime_ns)
+        cached = self._listings.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        entries = [
+            CachedEntry(entry) for entry in list_directory(path)
+        ]  # type: List[Any]
+        self._listings[path] = (signature, entries)
+        return entries
+
+    def __len__(self) -> int:
+        return len(self._listings)
@@ -0,0 +1,343 @@
+import ctypes
+import ctypes.util
+import errno
+from functools import lru_cache
+import os
+from pathlib import Path
+import select
+import struct
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from .counts import FileCounts
+from .defaults import DEFAULT_INTERVAL
+from .ignore import PathFilter
+from .reader import SKIPPED
+from .scanner import Scanner
+from .walker import list_directory
+
+# inotify(7) event masks.
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+
+_WATCHED = (
+    _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE
+) | _IN_DELETE
+
+# struct inotify_event: wd, mask, cookie, len, then len bytes of name.
+_EVENT = struct.Struct("iIII")
+
+# (path, old count, new count)
+Change = Tuple[str, int, int]
+
+
+def _walk(
+    directory, path_filter, visited=None
+):  # type: (str, PathFilter, Optional[Set[Tuple[int, int]]]) -> Iterator[Tuple[str, PathFilter, List[os.DirEntry]]]  # noqa: B950
+    # Yields each directory with the filter of its entries and the entries left,
+    # skipping ignored subtrees, and the directories already walked, as the
+    # scanner does.
+    if visited is None:
+        visited = set()
+    try:
+        stat = os.stat(directory)
+        children = list_directory(directory)
+    except OSError:
+        return
+    if (stat.st_dev, stat.st_ino) in visited:
+        return
+    visited.add((stat.st_dev, stat.st_ino))
+    path_filter = path_filter.for_directory(
+        directory, [entry.name for entry in children]
+    )
+    children = [
+        entry
+        for entry in children
+        if not path_filter.is_excluded(entry.path, entry.is_dir())
+    ]
+    yield directory, path_filter, children
+    for entry in children:
+        if entry.is_dir():
+            yield from _walk(entry.path, path_filter, visited)
+
+
+@lru_cache(maxsize=None)
+def _inotify() -> Optional[Any]:
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    except OSError:
+        return None
+    return libc if hasattr(libc, "inotify_init1") else None
+
+
+class PollingWatcher:
+    """Finds the changed files by comparing their stats between walks of the tree."""
+
+    __slots__ = ["root", "path_filter", "interval", "_signatures"]
+
+    def __init__(
+        self, root, path_filter, interval=DEFAULT_INTERVAL
+    ):  # type: (str, PathFilter, float) -> None
+        self.root = root
+        self.path_filter = path_filter
+        self.interval = interval
+        self._signatures = self._snapshot()
+
+    def __enter__(self) -> "PollingWatcher":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        pass
+
+    def changes(self) -> Set[str]:
+        """Wait for the interval, then return the files created, modified or
+        deleted since the last call.
+        """
+        time.sleep(self.interval)
+        previous, self._signatures = self._signatures, self._snapshot()
+        return {
+            path
+            for path in previous.keys() | self._signatures.keys()
+            if previous.get(path) != self._signatures.get(path)
+        }
+
+    def _snapshot(self) -> Dict[str, int]:
+        if not os.path.isdir(self.root):
+            entries = [self.root]  # type: Iterable[Union[str, os.DirEntry]]
+        else:
+            entries = (
+                entry
+                for _, _, children in _walk(self.root, self.path_filter)
+                for entry in children
+                if not entry.is_dir()
+            )
+
+        signatures = {}  # type: Dict[str, int]
+        for entry in entries:
+            try:
+                stat = (
+                    entry.stat() if isinstance(entry, os.DirEntry) else os.stat(entry)
+                )
+            except OSError:
+                continue
+            path = entry.path if isinstance(entry, os.DirEntry) else entry
+            signatures[path] = hash((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+        return signatures
+
+
+class InotifyWatcher:
+    """Gets the changed files from inotify, with a watch on every directory.
+
+    Directories created or moved into the tree are watched as they appear, and
+    all their files are reported as changed.
+    """
+
+    __slots__ = ["root", "path_filter", "interval", "_libc", "_fd", "_directories"]
+
+    # Events arriving within this delay of the first one are reported together.
+    latency = 0.05
+
+    def __init__(
+        self, root, path_filter, interval=DEFAULT_INTERVAL
+    ):  # type: (str, PathFilter, float) -> None
+        libc = _inotify()
+        if libc is None:
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self.root = root
+        self.path_filter = path_filter
+        self.interval = interval
+        self._libc = libc
+        self._fd = fd
+        # Watched path by descriptor, with the filter of its entries.
+        self._directories = {}  # type: Dict[int, Tuple[str, Optional[PathFilter]]]
+        try:
+            if os.path.isdir(root):
+                self._watch_tree(root, path_filter)
+            else:
+                self._watch(root, None)
+        except OSError:
+            self.close()
+            raise
+
+    def __enter__(self) -> "InotifyWatcher":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def changes(self) -> Set[str]:
+        """Wait up to the interval for events, then return the paths they are on.
+
+        Deleted directories are reported as a whole, by their own path.
+        """
+        changed = set()  # type: Set[str]
+        if not select.select([self._fd], [], [], self.interval)[0]:
+            return changed
+        time.sleep(self.latency)
+
+        data = self._read()
+        offset = 0
+        while offset < len(data):
+            descriptor, mask, _, length = _EVENT.unpack_from(data, offset)
+            start = offset + _EVENT.size
+            name = data[start : start + length].rstrip(b"\0")
+            offset = start + length
+            self._handle(descriptor, mask, os.fsdecode(name), changed)
+        return changed
+
+    def _handle(
+        self, descriptor, mask, name, changed
+    ):  # type: (int, int, str, Set[str]) -> None
+        if mask & _IN_Q_OVERFLOW:
+            # Events were lost: anything may have changed.
+            changed.add(self.root)
+            changed.update(self._watch_tree(self.root, self.path_filter))
+            return
+        if mask & _IN_IGNORED:
+            self._directories.pop(descriptor, None)
+            return
+        if descriptor not in self._directories:
+            return
+
+        directory, path_filter = self._directories[descriptor]
+        path = os.path.join(directory, name) if name else directory
+        is_dir = bool(mask & _IN_ISDIR)
+        if name and path_filter is not None and path_filter.is_excluded(path, is_dir):
+            return
+        if is_dir and path_filter is not None and mask & (_IN_CREATE | _IN_MOVED_TO):
+            changed.update(self._watch_tree(path, path_filter))
+        changed.add(path)
+
+    def _read(self) -> bytes:
+        chunks = []  # type: List[bytes]
+        while True:
+            try:
+                chunk = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def _watch(self, path, path_filter):  # type: (str, Optional[PathFilter]) -> None
+        descriptor = self._libc.inotify_add_watch(self._fd, os.fsencode(path), _WATCHED)
+        if descriptor < 0:
+            error = ctypes.get_errno()
+            # Paths may vanish before they are watched, but running out of
+            # watches means changes would be missed.
+            if error == errno.ENOSPC:
+                raise OSError(error, os.strerror(error), path)
+            return
+        self._directories[descriptor] = (path, path_filter)
+
+    def _watch_tree(
+        self, directory, path_filter
+    ):  # type: (str, PathFilter) -> List[str]
+        files = []  # type: List[str]
+        for path, entries_filter, children in _walk(directory, path_filter):
+            self._watch(path, entries_filter)
+            files.extend(entry.path for entry in children if not entry.is_dir())
+        return files
+
+
+AnyWatcher = Union[InotifyWatcher, PollingWatcher]
+
+
+def open_watcher(
+    root, path_filter, interval=DEFAULT_INTERVAL
+):  # type: (str, PathFilter, float) -> AnyWatcher
+    """An inotify watcher where the system has one, else a polling watcher."""
+    try:
+        return InotifyWatcher(root, path_filter, interval)
+    except OSError:
+        return PollingWatcher(root, path_filter, interval)
+
+
+class Watch:
+    """Keeps the counts of a scan up to date, re-scanning only the changed files."""
+
+    __slots__ = ["scanner", "counts"]
+
+    def __init__(self, scanner, counts):  # type: (Scanner, FileCounts) -> None
+        if scanner.matcher is None:
+            raise ValueError("Only the references of a search can be watched.")
+        self.scanner = scanner
+        self.counts = counts
+
+    def open_watcher(self, interval: float = DEFAULT_INTERVAL) -> AnyWatcher:
+        root = self.counts.root
+        return open_watcher(root, self.scanner.make_filter(Path(root)), interval)
+
+    def update(self, paths: Iterable[str]) -> List[Change]:
+        """Re-scan the given paths, and return the files whose count changed.
+
+        Files are searched as the scanner would, once for all their links: the
+        other hard links to a file searched get its count too. Paths that are no
+        longer files searched drop the counts of everything under them.
+        """
+        changes = []  # type: List[Change]
+        # The count of each file searched, by (device, inode).
+        counted = {}  # type: Dict[Tuple[int, int], int]
+        for path in sorted(paths):
+            status = self.scanner.searched_stat(path)
+            if status is not None:
+                key = (status.st_dev, status.st_ino)
+                if key not in counted:
+                    counted[key] = self._count(path)
+                targets = [
+                    (link, counted[key]) for link in [path] + self._links(path, status)
+                ]
+            else:
+                targets = [(path, 0)] + [
+                    (file, 0)
+                    for file in self.counts.files_under(path)
+                    if not os.path.isfile(file)
+                ]
+            for target, count in targets:
+                previous = self.counts.get(target)
+                if self.counts.set(target, count):
+                    changes.append((target, previous, count))
+        return changes
+
+    def _links(self, path, status):  # type: (str, os.stat_result) -> List[str]
+        # The other files counted that are hard links to the file of path.
+        if status.st_nlink < 2:
+            return []
+        links = []  # type: List[str]
+        for other in self.counts.files_under(self.counts.root):
+            try:
+                other_status = os.stat(other)
+            except OSError:
+                continue
+            if other != path and os.path.samestat(status, other_status):
+                links.append(other)
+        return links
+
+    def _count(self, path: str) -> int:
+        try:
+            count = self.scanner.reader.scan(
+                Path(path), self.scanner.matcher  # type: ignore
+            )[0]
+        except OSError:
+            return 0
+        return 0 if count == SKIPPED else count
@@ -13,6 +13,14 @@ def pytest_configure(config: Config) -> None:
     config.addinivalue_line("markers", "e2e: mark as end-to-end test.")
 
 
+@pytest.fixture(autouse=True)
+def mock_cache_directory(tmp_path_factory, monkeypatch) -> Path:
+    """Fixture for keeping the scan cache out of the user's home."""
+    directory = tmp_path_factory.mktemp("cache")
+    monkeypatch.setenv("HEATFILE_CACHE_DIR", str(directory))
+    return directory
+
+
 @pytest.fixture
 def runner() -> CliRunner:
     """Fixture for invoking command-line interfaces."""
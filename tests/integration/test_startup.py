@@ -0,0 +1,30 @@
+import subprocess  # noqa: S404
+import sys
+
+DEFERRED = (
+    "click_help_colors",
+    "colorama",
+    "concurrent.futures",
+    "csv",
+    "heatfile.console.commands.formats",
+    "heatfile.console.commands.tree",
+    "heatfile.core.scanner",
+    "json",
+    "locale",
+    "multiprocessing",
+    "sqlite3",
+)
+
+
+def test_cli_defers_what_only_a_scan_needs() -> None:
+    """It builds the CLI without importing the engine, nor setting colours up."""
+    code = "import sys, heatfile.console; print('\\n'.join(sys.modules))"
+    output = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", code],
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    ).stdout
+
+    assert "heatfile.console.application" in output.splitlines()
+    assert set(DEFERRED).isdisjoint(output.splitlines())
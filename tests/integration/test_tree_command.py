@@ -1,9 +1,57 @@
+import marshal
 from pathlib import Path
+from typing import Any, Dict
 from unittest.mock import Mock
 
 from click.testing import CliRunner
+from pytest_mock import MockFixture
 
 from heatfile.console import application
+from heatfile.core.defaults import (
+    DEFAULT_BUFFER_SIZE,
+    DEFAULT_IN_FLIGHT,
+    DEFAULT_INTERVAL,
+    DEFAULT_MAX_SIZE,
+)
+
+
+def default_options(**changes: Any) -> Dict[str, Any]:
+    """The options build_tree gets from the tree command, with changes."""
+    options = dict(
+        jobs=1,
+        pool="process",
+        backend="sync",
+        in_flight=DEFAULT_IN_FLIGHT,
+        mode="auto",
+        buffer_size=DEFAULT_BUFFER_SIZE,
+        use_mmap=True,
+        use_cache=True,
+        rebuild_cache=False,
+        cache_size=DEFAULT_MAX_SIZE,
+        excludes=(),
+        includes=(),
+        use_ignore_files=True,
+        skip_binary=True,
+        search_compressed=False,
+        top=0,
+        heat=False,
+        output_format="text",
+        show_matches=False,
+        context=0,
+        max_matches=None,
+        follow_symlinks=True,
+        one_file_system=False,
+        max_depth=None,
+        max_filesize=None,
+        max_files=None,
+        files_with_matches=False,
+        first_match=False,
+        watch=False,
+        watch_interval=DEFAULT_INTERVAL,
+        stats=False,
+    )  # type: Dict[str, Any]
+    options.update(changes)
+    return options
 
 
 def test_invokes_build_tree_method(
@@ -30,7 +78,11 @@ def test_with_only_path_option(
 ) -> None:
     """It uses only path option"""
     runner.invoke(application.tree, [f"--path={mock_current_directory_path}"])
-    mock_tree_build_tree.assert_called_with(mock_current_directory_path, None)
+    mock_tree_build_tree.assert_called_with(
+        mock_current_directory_path,
+        None,
+        **default_options(),
+    )
 
 
 def test_search_string_references(
@@ -44,7 +96,9 @@ def test_search_string_references(
     args, _ = mock_tree_build_tree.call_args
 
     mock_tree_build_tree.assert_called_with(
-        mock_current_directory_path, mock_search_string
+        mock_current_directory_path,
+        mock_search_string,
+        **default_options(),
     )
     assert mock_current_directory_path == args[0]
     assert mock_search_string == args[1]
@@ -62,7 +116,27 @@ def test_search_string_references_for_a_specific_path(
         [f"--path={mock_current_directory_path}", f"--search={mock_search_string}"],
     )
     mock_tree_build_tree.assert_called_with(
-        mock_current_directory_path, mock_search_string
+        mock_current_directory_path,
+        mock_search_string,
+        **default_options(),
+    )
+
+
+def test_search_string_references_with_parallel_jobs(
+    runner: CliRunner,
+    mock_tree_build_tree: Mock,
+    mock_current_directory_path: Path,
+    mock_search_string: str,
+) -> None:
+    """It forwards the number of jobs and the pool type."""
+    runner.invoke(
+        application.tree,
+        [f"--search={mock_search_string}", "--jobs=4", "--pool=thread"],
+    )
+    mock_tree_build_tree.assert_called_with(
+        mock_current_directory_path,
+        mock_search_string,
+        **default_options(jobs=4, pool="thread"),
     )
 
 
@@ -114,3 +188,158 @@ def test_fails_with_file_in_the_path_option_without_search_option(
     result = runner.invoke(application.tree, [f"--path={mock_path_with_file}"])
 
     assert result.exit_code == 1
+
+
+def test_forwards_exclude_and_include_globs(
+    runner: CliRunner, mock_tree_build_tree: Mock, mock_current_directory_path: Path
+) -> None:
+    """It forwards the repeated --exclude/--include globs and --no-ignore."""
+    runner.invoke(
+        application.tree,
+        ["--exclude=*.log", "--exclude=build/", "--include=*.py", "--no-ignore"],
+    )
+    _, kwargs = mock_tree_build_tree.call_args
+
+    assert kwargs["excludes"] == ("*.log", "build/")
+    assert kwargs["includes"] == ("*.py",)
+    assert kwargs["use_ignore_files"] is False
+
+
+def test_binary_option_searches_binary_files(
+    runner: CliRunner, mock_tree_build_tree: Mock
+) -> None:
+    """It stops skipping binary files with --binary."""
+    runner.invoke(application.tree, ["--binary"])
+    _, kwargs = mock_tree_build_tree.call_args
+
+    assert kwargs["skip_binary"] is False
+
+
+def test_repeated_search_options_search_a_set(
+    runner: CliRunner, mock_tree_build_tree: Mock, tmp_path: Path
+) -> None:
+    """It searches every string given with -s and in --patterns-file at once."""
+    patterns_file = tmp_path / "patterns.txt"
+    patterns_file.write_text("baz\n\nqux\n")
+    runner.invoke(
+        application.tree, ["-s", "foo", "-s", "bar", f"--patterns-file={patterns_file}"]
+    )
+    args, _ = mock_tree_build_tree.call_args
+
+    assert args[1] == ["foo", "bar", "baz", "qux"]
+
+
+def test_watch_option(runner: CliRunner, mock_tree_build_tree: Mock) -> None:
+    """It watches the references with --watch, only of a search in text."""
+    runner.invoke(application.tree, ["-s", "x", "--watch", "--watch-interval=0.5"])
+    _, kwargs = mock_tree_build_tree.call_args
+
+    assert kwargs["watch"] is True
+    assert kwargs["watch_interval"] == 0.5
+    assert runner.invoke(application.tree, ["--watch"]).exit_code == 2
+    assert (
+        runner.invoke(
+            application.tree, ["-s", "x", "--watch", "--format=csv"]
+        ).exit_code
+        == 2
+    )
+
+
+def test_stats_option(runner: CliRunner, mock_tree_build_tree: Mock) -> None:
+    """It collects stats with --stats, but not for csv."""
+    runner.invoke(application.tree, ["--stats"])
+    _, kwargs = mock_tree_build_tree.call_args
+
+    assert kwargs["stats"] is True
+    assert runner.invoke(application.tree, ["--stats", "--format=csv"]).exit_code == 2
+
+
+def test_profile_option(
+    runner: CliRunner, mock_tree_build_tree: Mock, tmp_path: Path
+) -> None:
+    """It writes cProfile data of the run to --profile."""
+    profile = tmp_path / "out.prof"
+    result = runner.invoke(application.tree, [f"--profile={profile}"])
+
+    assert result.exit_code == 0
+    assert mock_tree_build_tree.called
+    assert "profile" not in mock_tree_build_tree.call_args[1]
+    # The profiled functions and their timings, as pstats loads them.
+    assert marshal.loads(profile.read_bytes())
+
+
+def test_limit_options(runner: CliRunner, mock_tree_build_tree: Mock) -> None:
+    """It forwards the limits of the walk and the match modes."""
+    runner.invoke(
+        application.tree,
+        ["-s", "x", "--max-depth=2", "--max-filesize=10", "--max-files=3", "-l"],
+    )
+    _, kwargs = mock_tree_build_tree.call_args
+
+    assert (kwargs["max_depth"], kwargs["max_filesize"], kwargs["max_files"]) == (
+        2,
+        10,
+        3,
+    )
+    assert kwargs["files_with_matches"] is True
+    assert runner.invoke(application.tree, ["--first-match"]).exit_code == 2
+    assert runner.invoke(application.tree, ["-s", "x", "-l", "--watch"]).exit_code == 2
+
+
+def test_link_options(runner: CliRunner, mock_tree_build_tree: Mock) -> None:
+    """It stops following links with --no-follow, and stays on one file system."""
+    runner.invoke(application.tree, ["--no-follow", "--one-file-system"])
+    _, kwargs = mock_tree_build_tree.call_args
+
+    assert kwargs["follow_symlinks"] is False
+    assert kwargs["one_file_system"] is True
+
+
+def test_search_compressed_option(
+    runner: CliRunner, mock_tree_build_tree: Mock
+) -> None:
+    """It searches compressed files and archives only along with a string."""
+    runner.invoke(application.tree, ["-s", "x", "--search-compressed"])
+    _, kwargs = mock_tree_build_tree.call_args
+
+    assert kwargs["search_compressed"] is True
+    assert runner.invoke(application.tree, ["--search-compressed"]).exit_code == 2
+
+
+def test_daemon_option(
+    runner: CliRunner, mock_tree_build_tree: Mock, mocker: MockFixture, tmp_path: Path
+) -> None:
+    """It has the daemon answer with --daemon, instead of building the tree."""
+    mock_query = mocker.patch("heatfile.console.daemon.query", return_value=3)
+    socket_path = str(tmp_path / "d.sock")
+    result = runner.invoke(
+        application.tree, ["-s", "x", "--daemon", f"--socket={socket_path}"]
+    )
+    args, _ = mock_query.call_args
+
+    assert result.exit_code == 3
+    assert not mock_tree_build_tree.called
+    assert (args[0], args[2], args[3]["jobs"]) == (socket_path, "x", 1)
+    assert runner.invoke(application.tree, ["--daemon", "--watch"]).exit_code == 2
+
+    mock_query.side_effect = FileNotFoundError(2, "No such file")
+    result = runner.invoke(application.tree, ["--daemon", f"--socket={socket_path}"])
+    assert result.exit_code == 1
+    assert "No daemon answered" in result.output
+
+
+def test_serve_command(runner: CliRunner, mocker: MockFixture, tmp_path: Path) -> None:
+    """It warms the daemon up on its roots, then serves."""
+    mock_daemon = mocker.patch("heatfile.console.daemon.Daemon")
+    socket_path = str(tmp_path / "d.sock")
+    mock_daemon.return_value.socket_path = socket_path
+    result = runner.invoke(
+        application.cli, ["serve", f"--root={tmp_path}", f"--socket={socket_path}"]
+    )
+    daemon = mock_daemon.return_value
+
+    assert result.exit_code == 0
+    mock_daemon.assert_called_once_with([tmp_path], socket_path)
+    assert daemon.warm.called
+    daemon.serve_forever.assert_called_once_with(daemon.bind.return_value)
+    assert f"Listening on {socket_path}" in result.output
@@ -0,0 +1,133 @@
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Any, List
+
+import pytest
+
+from heatfile.core.aio import AsyncBackend, FileSystem
+from heatfile.core.scanner import Scanner
+
+
+class SlowFileSystem(FileSystem):
+    """Every call waits for latency seconds, like on a network mount, and the
+    most calls running at once are recorded."""
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.running = 0
+        self.most_running = 0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _wait(self) -> None:
+        with self._lock:
+            self.calls += 1
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        time.sleep(self.latency)
+        with self._lock:
+            self.running -= 1
+
+    def list_directory(self, path: str) -> List[os.DirEntry]:
+        self._wait()
+        return super().list_directory(path)
+
+    def scan(self, *args: Any) -> Any:
+        self._wait()
+        return super().scan(*args)
+
+
+@pytest.fixture
+def mock_tree(tmp_path: Path) -> Path:
+    for directory in range(4):
+        for subdirectory in range(3):
+            path = tmp_path / f"d{directory}" / f"s{subdirectory}"
+            path.mkdir(parents=True)
+            for file in range(5):
+                (path / f"f{file}.txt").write_text("test " * (file % 3))
+    (tmp_path / "d0" / "blob.bin").write_bytes(b"test\0")
+    return tmp_path
+
+
+def nodes(scanner: Scanner, path: Path) -> List[tuple]:
+    return [(str(node.path), node.references) for node in scanner.scan(path)]
+
+
+@pytest.mark.parametrize("search_string", [None, "test", ["test", "none"]])
+def test_async_scan_keeps_the_order_of_the_nodes(
+    mock_tree: Path, search_string
+) -> None:
+    filesystem = SlowFileSystem(0.001)
+    expected = nodes(Scanner(search_string, use_cache=False), mock_tree)
+    scanner = Scanner(
+        search_string,
+        use_cache=False,
+        backend="async",
+        in_flight=4,
+        filesystem=filesystem,
+    )
+
+    assert nodes(scanner, mock_tree) == expected
+    assert 1 < filesystem.most_running <= 4
+
+
+def test_async_scan_overlaps_the_latency(mock_tree: Path) -> None:
+    # 17 listings and 61 reads would take 0.78s one after the other.
+    filesystem = SlowFileSystem(0.01)
+    scanner = Scanner(
+        "test", use_cache=False, backend="async", in_flight=16, filesystem=filesystem
+    )
+
+    start = time.perf_counter()
+    result = scanner.scan(mock_tree)
+    list(result)
+
+    assert filesystem.calls == 17 + 61
+    assert time.perf_counter() - start < filesystem.calls * filesystem.latency / 2
+    assert (result.files_count, result.total_refs, result.skipped_files) == (36, 48, 1)
+
+
+def test_async_scan_with_limits_and_stats(mock_tree: Path) -> None:
+    filesystem = SlowFileSystem(0)
+    result = Scanner(
+        "test",
+        use_cache=False,
+        backend="async",
+        filesystem=filesystem,
+        max_depth=1,
+        stats=True,
+    ).scan(mock_tree)
+
+    assert list(result)[1:] == []
+    assert filesystem.calls == 1
+    assert result.stats is not None and result.stats.directories == 1
+
+
+def test_backend_closes_when_the_scan_is_left(mock_tree: Path) -> None:
+    filesystem = SlowFileSystem(0.001)
+    scanner = Scanner(backend="async", in_flight=2, filesystem=filesystem)
+    nodes = iter(scanner.scan(mock_tree))
+    next(nodes)
+    next(nodes)
+    nodes.close()  # type: ignore
+
+    assert threading.active_count() == 1
+
+
+def test_backend_raises_the_errors_of_the_calls(tmp_path: Path) -> None:
+    with AsyncBackend(in_flight=2) as backend:
+        backend.prefetch([str(tmp_path / "missing")])
+
+        with pytest.raises(FileNotFoundError):
+            backend.list_directory(tmp_path / "missing")
+        assert backend.list_directory(tmp_path) == []
+
+    with pytest.raises(ValueError, match="in flight"):
+        AsyncBackend(in_flight=0)
+
+
+def test_unknown_backend() -> None:
+    with pytest.raises(ValueError, match="Unknown backend"):
+        Scanner(backend="uring")
@@ -0,0 +1,59 @@
+import io
+from pathlib import Path
+import tarfile
+import zipfile
+
+import pytest
+
+from heatfile.core.archives import compression_of, is_archive, iter_members
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("app.log.gz", "gzip"),
+        ("app.log.BZ2", "bz2"),
+        ("app.log.xz", "lzma"),
+        ("bundle.tar.gz", "tar"),
+        ("bundle.tgz", "tar"),
+        ("bundle.tar", "tar"),
+        ("bundle.zip", "zip"),
+        ("app.log", None),
+        ("gz", None),
+    ],
+)
+def test_compression_of(name: str, expected) -> None:
+    assert compression_of(Path(name)) == expected
+    assert is_archive(expected) == (expected in ("zip", "tar"))
+
+
+def test_iter_members_of_a_zip(tmp_path: Path) -> None:
+    with zipfile.ZipFile(tmp_path / "a.zip", "w") as archive:
+        archive.writestr("docs/", "")
+        archive.writestr("docs/b.txt", "test")
+        archive.writestr("a.txt", "")
+
+    members = [
+        (name, size, content.read())
+        for name, size, content in iter_members(tmp_path / "a.zip", "zip")
+    ]
+
+    assert members == [("docs/b.txt", 4, b"test"), ("a.txt", 0, b"")]
+
+
+def test_iter_members_of_a_compressed_tar(tmp_path: Path) -> None:
+    with tarfile.open(tmp_path / "a.tar.xz", "w:xz") as archive:
+        directory = tarfile.TarInfo("docs")
+        directory.type = tarfile.DIRTYPE
+        archive.addfile(directory)
+        for name, content in [("docs/b.txt", b"test"), ("a.txt", b"x" * 100000)]:
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+
+    sizes = [
+        (name, size, len(content.read(10)))
+        for name, size, content in iter_members(tmp_path / "a.tar.xz", "tar")
+    ]
+
+    assert sizes == [("docs/b.txt", 4, 4), ("a.txt", 100000, 10)]
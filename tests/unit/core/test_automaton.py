@@ -0,0 +1,34 @@
+import pytest
+
+from heatfile.core.automaton import AhoCorasick
+
+CONTENT = b"she sells sea shells by the sea shore, aaaa hers"
+
+
+@pytest.mark.parametrize(
+    "literals",
+    [
+        [b"she", b"he", b"hers", b"sea"],
+        [b"a", b"aa", b"aaa"],
+        [b"shells", b"sell", b"ell", b"l"],
+        [b"missing", b"e"],
+    ],
+)
+@pytest.mark.parametrize("chunk_size", [1, 3, 100])
+def test_count_like_bytes_count(literals: list, chunk_size: int) -> None:
+    chunks = [
+        CONTENT[start : start + chunk_size]
+        for start in range(0, len(CONTENT), chunk_size)
+    ]
+
+    assert AhoCorasick(literals).count(chunks) == [
+        CONTENT.count(literal) for literal in literals
+    ]
+
+
+def test_count_duplicated_literals() -> None:
+    assert AhoCorasick([b"sea", b"sea"]).count([CONTENT]) == [2, 2]
+
+
+def test_count_empty_content() -> None:
+    assert AhoCorasick([b"sea"]).count([]) == [0]
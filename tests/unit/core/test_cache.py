@@ -0,0 +1,149 @@
+import os
+from pathlib import Path
+import sqlite3
+from typing import Iterator
+
+import pytest
+
+from heatfile.core.cache import AnyCache, MemoryCache, open_cache, ScanCache
+from heatfile.core.engine import SearchEngine
+from heatfile.core.index import build_filter
+from heatfile.core.matcher import Matcher
+from heatfile.core.reader import Reader, SKIPPED
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def mock_cache(tmp_path: Path, request) -> Iterator[AnyCache]:
+    # Both caches answer lookups the same way.
+    cache = (
+        ScanCache(tmp_path / "cache") if request.param == "sqlite" else MemoryCache()
+    )
+    with cache:
+        yield cache
+
+
+@pytest.fixture
+def mock_file(tmp_path: Path) -> Path:
+    file = tmp_path / "file.txt"
+    file.write_bytes(b"a test file")
+    return file
+
+
+def test_lookup_after_store(mock_cache: AnyCache, mock_file: Path) -> None:
+    matcher = Matcher("test")
+    count, stat = mock_cache.lookup(mock_file, matcher)
+    assert count is None
+    assert stat is not None
+
+    mock_cache.store(mock_file, stat, matcher, 1)
+    mock_cache.flush()
+
+    assert mock_cache.lookup(mock_file, matcher) == (1, stat)
+    assert mock_cache.lookup(mock_file, Matcher("file"))[0] is None
+
+
+def test_lookup_ignores_modified_files(mock_cache: AnyCache, mock_file: Path) -> None:
+    matcher = Matcher("test")
+    mock_cache.store(mock_file, os.stat(mock_file), matcher, 1)
+    mock_cache.flush()
+    mock_file.write_bytes(b"a test file with another test")
+
+    assert mock_cache.lookup(mock_file, matcher)[0] is None
+
+
+def test_lookup_skips_files_without_the_trigrams(
+    mock_cache: AnyCache, mock_file: Path
+) -> None:
+    trigrams = build_filter(mock_file.read_bytes())
+    mock_cache.store(mock_file, os.stat(mock_file), Matcher("test"), 1, trigrams)
+    mock_cache.flush()
+
+    assert mock_cache.lookup(mock_file, Matcher("missing"))[0] == 0
+    assert mock_cache.lookup(mock_file, Matcher("FILE"))[0] is None
+    assert mock_cache.lookup(mock_file, Matcher("fi.e"))[0] is None
+
+
+def test_lookup_of_missing_file(mock_cache: AnyCache, tmp_path: Path) -> None:
+    assert mock_cache.lookup(tmp_path / "missing", Matcher("test")) == (None, None)
+
+
+def test_rebuild_drops_entries(tmp_path: Path, mock_file: Path) -> None:
+    matcher = Matcher("test")
+    with ScanCache(tmp_path / "cache") as cache:
+        cache.store(mock_file, os.stat(mock_file), matcher, 1)
+
+    with ScanCache(tmp_path / "cache", rebuild=True) as cache:
+        assert cache.lookup(mock_file, matcher)[0] is None
+
+
+def test_evict_least_recently_used(tmp_path: Path) -> None:
+    matcher = Matcher("test")
+    with ScanCache(tmp_path / "cache", max_size=64 * 1024) as cache:
+        for index in range(2000):
+            file = tmp_path / f"file_{index}.txt"
+            file.write_bytes(b"test")
+            cache.store(file, os.stat(file), matcher, 1, build_filter(b"x" * index))
+        cache.flush()
+        cache.evict()
+
+        assert cache._size() <= 64 * 1024
+        assert cache.lookup(tmp_path / "file_1999.txt", matcher)[0] == 1
+        assert cache.lookup(tmp_path / "file_0.txt", matcher)[0] is None
+
+
+def test_open_cache_in_unusable_directory(mock_file: Path) -> None:
+    assert open_cache(directory=mock_file) is None
+
+
+def test_engine_does_not_read_cached_files(
+    mock_cache: AnyCache, mock_file: Path, mocker
+) -> None:
+    engine = SearchEngine(Matcher("test"), cache=mock_cache)
+    assert list(engine.count([mock_file], key=lambda file: file)) == [(mock_file, 1)]
+    mock_cache.flush()
+
+    scan = mocker.spy(Reader, "scan")
+    assert list(engine.count([mock_file], key=lambda file: file)) == [(mock_file, 1)]
+    assert scan.call_count == 0
+
+
+def test_lookup_of_binary_files(mock_cache: AnyCache, mock_file: Path) -> None:
+    matcher = Matcher("test")
+    mock_cache.store(mock_file, os.stat(mock_file), matcher, SKIPPED, binary=True)
+    mock_cache.flush()
+
+    assert mock_cache.lookup(mock_file, matcher)[0] == SKIPPED
+    assert mock_cache.lookup(mock_file, matcher, skip_binary=False)[0] is None
+
+    mock_cache.store(mock_file, os.stat(mock_file), matcher, 1, binary=True)
+    mock_cache.flush()
+
+    assert mock_cache.lookup(mock_file, matcher)[0] == SKIPPED
+    assert mock_cache.lookup(mock_file, matcher, skip_binary=False)[0] == 1
+
+
+def test_outdated_schema_is_rebuilt(tmp_path: Path, mock_file: Path) -> None:
+    connection = sqlite3.connect(str(tmp_path / "index.sqlite3"))
+    connection.execute("CREATE TABLE files (path TEXT PRIMARY KEY)")
+    connection.commit()
+    connection.close()
+
+    with ScanCache(tmp_path) as cache:
+        cache.store(mock_file, os.stat(mock_file), Matcher("test"), 1)
+        cache.flush()
+        assert cache.lookup(mock_file, Matcher("test"))[0] == 1
+
+
+def test_memory_cache_keeps_the_most_recently_used(tmp_path: Path) -> None:
+    cache = MemoryCache(max_files=2)
+    matcher = Matcher("test")
+    files = [tmp_path / f"{index}.txt" for index in range(3)]
+    for file in files[:2]:
+        file.write_text("test")
+        cache.store(file, os.stat(file), matcher, 1)
+    cache.lookup(files[0], matcher)
+    files[2].write_text("test")
+    cache.store(files[2], os.stat(files[2]), matcher, 1)
+
+    assert len(cache) == 2
+    assert [cache.lookup(file, matcher)[0] for file in files] == [1, None, 1]
@@ -0,0 +1,56 @@
+import os
+
+from heatfile.core.counts import FileCounts
+
+
+def test_set_rolls_counts_up_to_the_root(tmp_path) -> None:
+    root = str(tmp_path)
+    counts = FileCounts(root)
+    first = os.path.join(root, "a", "b", "x.txt")
+    second = os.path.join(root, "a", "y.txt")
+
+    assert counts.set(first, 3) == 3
+    assert counts.set(second, 2) == 2
+    assert counts.set(first, 1) == -2
+
+    assert counts.get(first) == 1
+    assert counts.directory_total(os.path.join(root, "a", "b")) == 1
+    assert counts.directory_total(os.path.join(root, "a")) == 3
+    assert counts.total == 3
+    assert list(counts.ancestors(first)) == [
+        os.path.join(root, "a", "b"),
+        os.path.join(root, "a"),
+        root,
+    ]
+
+
+def test_set_to_zero_frees_the_entries(tmp_path) -> None:
+    root = str(tmp_path)
+    counts = FileCounts(root)
+    path = os.path.join(root, "a", "x.txt")
+    counts.set(path, 3)
+
+    assert counts.set(path, 0) == -3
+    assert len(counts) == 0
+    assert counts.set(os.path.join(root, "y.txt"), 1) == 1
+    assert len(counts._counts) == 3
+
+
+def test_files_under(tmp_path) -> None:
+    root = str(tmp_path)
+    counts = FileCounts(root)
+    for name in ("a/x.txt", "a/b/y.txt", "ab.txt"):
+        counts.set(os.path.join(root, name), 1)
+
+    assert sorted(counts.files_under(os.path.join(root, "a"))) == [
+        os.path.join(root, "a", "b", "y.txt"),
+        os.path.join(root, "a", "x.txt"),
+    ]
+
+
+def test_count_of_a_single_file(tmp_path) -> None:
+    root = str(tmp_path / "x.txt")
+    counts = FileCounts(root)
+    counts.set(root, 4)
+
+    assert counts.total == 4
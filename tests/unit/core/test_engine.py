@@ -0,0 +1,51 @@
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from heatfile.core.engine import SearchEngine
+from heatfile.core.matcher import Matcher
+
+
+@pytest.fixture
+def mock_files(tmp_path: Path) -> List[Path]:
+    files = []
+    for index in range(100):
+        file = tmp_path / f"file_{index:03}.txt"
+        file.write_text("Test test\n" * index)
+        files.append(file)
+    return files
+
+
+def test_count_serial_keeps_order(mock_files: List[Path]) -> None:
+    engine = SearchEngine(Matcher("test"))
+    result = list(engine.count(mock_files, key=lambda file: file))
+
+    assert [file for file, _ in result] == mock_files
+    assert [count for _, count in result] == [index * 2 for index in range(100)]
+
+
+@pytest.mark.parametrize("pool", ["thread", "process"])
+def test_count_in_parallel_keeps_order(mock_files: List[Path], pool: str) -> None:
+    with SearchEngine(Matcher("test"), jobs=3, pool=pool) as engine:
+        result = list(engine.count(mock_files, key=lambda file: file))
+
+    assert [file for file, _ in result] == mock_files
+    assert [count for _, count in result] == [index * 2 for index in range(100)]
+
+
+def test_close_shuts_down_the_pool(mock_files: List[Path]) -> None:
+    engine = SearchEngine(Matcher("test"), jobs=2, pool="thread")
+    list(engine.count(mock_files, key=lambda file: file))
+    engine.close()
+
+    assert engine._executor is None
+
+
+def test_zero_jobs_uses_every_cpu() -> None:
+    assert SearchEngine(Matcher("test"), jobs=0).jobs >= 1
+
+
+def test_fails_with_unknown_pool() -> None:
+    with pytest.raises(ValueError):
+        SearchEngine(Matcher("test"), pool="cluster")
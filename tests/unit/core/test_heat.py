@@ -0,0 +1,44 @@
+from pathlib import Path
+import random
+
+from heatfile.core.heat import HeatMap
+from heatfile.core.scanner import Node, Scanner
+
+
+def test_hottest_are_bounded_and_sorted() -> None:
+    root = Node("/root", is_dir=True)
+    heat = HeatMap(top=3)
+    for index, references in enumerate([5, 1, 9, 5, 7, 2]):
+        heat.add(Node(f"/root/{index}", root, is_dir=False, references=references))
+    heat.finish()
+
+    assert heat.hottest_files() == [
+        (Path("/root/2"), 9),
+        (Path("/root/4"), 7),
+        (Path("/root/0"), 5),
+    ]
+    assert heat.hottest_directories() == []
+
+
+def test_directories_roll_up_their_subtrees(tmp_path: Path) -> None:
+    random.seed(7)
+    expected = {}  # type: dict
+    for index in range(60):
+        depth = random.randint(0, 3)
+        parts = [f"d{random.randint(0, 2)}" for _ in range(depth)]
+        directory = tmp_path.joinpath(*parts)
+        directory.mkdir(parents=True, exist_ok=True)
+        references = random.randint(0, 4)
+        (directory / f"f{index}.txt").write_text("test " * references)
+        for level in range(1, depth + 1):
+            key = tmp_path.joinpath(*parts[:level])
+            expected[key] = expected.get(key, 0) + references
+
+    result = Scanner("test", use_cache=False, top=100).scan(tmp_path)
+    list(result)
+
+    assert result.heat is not None
+    assert dict(result.heat.hottest_directories()) == {
+        path: count for path, count in expected.items() if count
+    }
+    assert sum(count for _, count in result.heat.hottest_files()) == result.total_refs
@@ -0,0 +1,108 @@
+from pathlib import Path
+
+import pytest
+
+from heatfile.core.ignore import PathFilter, Rules
+
+
+@pytest.mark.parametrize(
+    "pattern, path, is_dir, expected",
+    [
+        ("*.log", "debug.log", False, True),
+        ("*.log", "deep/down/debug.log", False, True),
+        ("*.log", "debug.txt", False, None),
+        ("build/", "build", True, True),
+        ("build/", "build", False, None),
+        ("/build", "build", False, True),
+        ("/build", "src/build", False, None),
+        ("docs/*.md", "docs/index.md", False, True),
+        ("docs/*.md", "docs/api/index.md", False, None),
+        ("**/cache", "a/b/cache", True, True),
+        ("logs/**", "logs/a/b.txt", False, True),
+        ("a/**/z", "a/z", False, True),
+        ("a/**/z", "a/b/c/z", False, True),
+        ("file[0-9]", "file7", False, True),
+        ("file[!0-9]", "file7", False, None),
+        ("?.txt", "a.txt", False, True),
+        ("?.txt", "ab.txt", False, None),
+        ("\\#notes", "#notes", False, True),
+        ("# comment", "# comment", False, None),
+    ],
+)
+def test_rules_match_like_gitignore(
+    pattern: str, path: str, is_dir: bool, expected: bool
+) -> None:
+    assert Rules("/base", [pattern]).match(path, is_dir) is expected
+
+
+def test_last_matching_rule_wins() -> None:
+    rules = Rules("/base", ["*.log", "!keep.log", "# comment", ""])
+
+    assert rules.match("debug.log", False) is True
+    assert rules.match("keep.log", False) is False
+    assert Rules("/base", ["!keep.log", "*.log"]).match("keep.log", False) is True
+
+
+def test_path_filter_skips_git_directory(tmp_path: Path) -> None:
+    path_filter = PathFilter.for_root(tmp_path)
+
+    assert path_filter.is_excluded(str(tmp_path / ".git"), is_dir=True)
+    assert not PathFilter.for_root(tmp_path, use_ignore_files=False).is_excluded(
+        str(tmp_path / ".git"), is_dir=True
+    )
+
+
+def test_nested_ignore_files_take_precedence(tmp_path: Path) -> None:
+    (tmp_path / "sub").mkdir()
+    (tmp_path / ".gitignore").write_text("*.log\n")
+    (tmp_path / "sub" / ".ignore").write_text("!keep.log\n")
+
+    root_filter = PathFilter.for_root(tmp_path).for_directory(
+        str(tmp_path), [".gitignore", "sub"]
+    )
+    sub_filter = root_filter.for_directory(str(tmp_path / "sub"), [".ignore"])
+
+    assert root_filter.is_excluded(str(tmp_path / "sub" / "keep.log"), False)
+    assert not sub_filter.is_excluded(str(tmp_path / "sub" / "keep.log"), False)
+    assert sub_filter.is_excluded(str(tmp_path / "sub" / "other.log"), False)
+
+
+def test_ignore_files_of_the_enclosing_repository_apply(tmp_path: Path) -> None:
+    (tmp_path / ".git" / "info").mkdir(parents=True)
+    (tmp_path / ".git" / "info" / "exclude").write_text("*.tmp\n")
+    (tmp_path / ".gitignore").write_text("generated/\n")
+    (tmp_path / "src").mkdir()
+
+    path_filter = PathFilter.for_root(tmp_path / "src")
+
+    assert path_filter.is_excluded(str(tmp_path / "src" / "generated"), True)
+    assert path_filter.is_excluded(str(tmp_path / "src" / "a.tmp"), False)
+    assert not path_filter.is_excluded(str(tmp_path / "src" / "a.py"), False)
+
+
+def test_excludes_and_includes(tmp_path: Path) -> None:
+    path_filter = PathFilter.for_root(
+        tmp_path, excludes=["vendor/"], includes=["*.py"], use_ignore_files=False
+    )
+
+    assert path_filter.is_excluded(str(tmp_path / "vendor"), True)
+    assert path_filter.is_excluded(str(tmp_path / "README.md"), False)
+    assert not path_filter.is_excluded(str(tmp_path / "src"), True)
+    assert not path_filter.is_excluded(str(tmp_path / "src" / "main.py"), False)
+
+
+@pytest.mark.parametrize("base", ["/", "/base/"])
+def test_rules_of_a_base_ending_with_a_separator(base: str) -> None:
+    path_filter = PathFilter(excludes=Rules(base, ["etc/"]), use_ignore_files=False)
+
+    assert path_filter.is_excluded(base + "etc", True)
+    assert not path_filter.is_excluded(base + "tc", True)
+
+
+def test_excludes_under_the_file_system_root() -> None:
+    path_filter = PathFilter.for_root(
+        Path("/"), excludes=["etc/"], use_ignore_files=False
+    )
+
+    assert path_filter.is_excluded("/etc", True)
+    assert not path_filter.is_excluded("/usr", True)
@@ -0,0 +1,30 @@
+from heatfile.core.index import build_filter, may_contain
+
+
+def test_may_contain_ignores_case() -> None:
+    bloom = build_filter(b"Deprecated API call")
+
+    assert may_contain(bloom, b"deprecated")
+    assert may_contain(bloom, b"API CALL")
+
+
+def test_may_not_contain_missing_trigrams() -> None:
+    assert not may_contain(build_filter(b"Deprecated API call"), b"missing")
+
+
+def test_may_contain_short_needles() -> None:
+    assert may_contain(build_filter(b""), b"ab")
+
+
+def test_filter_grows_with_the_trigrams() -> None:
+    words = " ".join(f"word{index}" for index in range(500)).encode()
+    small, big = build_filter(b"abc"), build_filter(words)
+
+    assert len(small) < len(big)
+
+
+def test_may_contain_needles_across_words() -> None:
+    bloom = build_filter(b"call(deprecated_api)")
+
+    assert may_contain(bloom, b"call(deprecated")
+    assert not may_contain(bloom, b"call(removed")
@@ -0,0 +1,30 @@
+import pytest
+
+from heatfile.core.locations import LineIndex, Location
+
+CONTENT = b"zero\r\none test\ntwo\n\nfour test"
+
+
+@pytest.mark.parametrize(
+    "offset, expected",
+    [
+        (0, Location(1, 1, "zero")),
+        (10, Location(2, 5, "one test", ["zero"], ["two"])),
+        (25, Location(5, 6, "four test", [""], [])),
+    ],
+)
+def test_locate(offset: int, expected: Location) -> None:
+    context = 0 if expected.line == 1 else 1
+    assert LineIndex(CONTENT).locate(offset, context) == expected
+
+
+def test_lines_are_indexed_only_up_to_the_last_needed() -> None:
+    lines = LineIndex(b"test\n" + b"line\n" * 1000)
+
+    assert lines.locate(0, context=2).after == ["line", "line"]
+    assert len(lines._newlines) == 3
+
+
+def test_context_stops_at_the_end_of_the_content() -> None:
+    assert LineIndex(b"a\nb test\n").locate(4, context=3).after == []
+    assert LineIndex(b"a test\nb").locate(2, context=3).after == ["b"]
@@ -0,0 +1,104 @@
+from typing import List
+
+import pytest
+
+from heatfile.core.matcher import Matcher, PatternSet
+
+
+@pytest.mark.parametrize(
+    "search_string, mode, is_literal",
+    [
+        ("test", "auto", True),
+        ("t.st", "auto", False),
+        ("t.st", "fixed", True),
+        ("test", "regex", False),
+    ],
+)
+def test_mode(search_string: str, mode: str, is_literal: bool) -> None:
+    assert Matcher(search_string, mode).is_literal == is_literal
+
+
+def test_count_literal_ignores_case() -> None:
+    assert Matcher("test").count(b"Test TEST tEsT tes") == 3
+
+
+def test_count_fixed_string_with_metacharacters() -> None:
+    assert Matcher("a.c", "fixed").count(b"abc a.c A.C") == 2
+
+
+def test_count_regex() -> None:
+    assert Matcher("t.st").count(b"Test TOST tst") == 2
+
+
+def test_count_string_outside_latin1() -> None:
+    assert Matcher("€").count("1€ 2€".encode("utf-8")) == 2
+
+
+@pytest.mark.parametrize("search_string", ["café", "caf\\w", "caf[éx]"])
+def test_count_ignores_case_beyond_ascii(search_string: str) -> None:
+    content = "CAFÉ café caf!".encode("latin-1")
+    matcher = Matcher(search_string)
+
+    assert matcher.count(content) == 2
+    assert matcher.count_until(content, 1, 6) == (1, 9)
+
+
+def test_fails_with_unknown_mode() -> None:
+    with pytest.raises(ValueError):
+        Matcher("test", "glob")
+
+
+@pytest.mark.parametrize("threshold", [1, 64])
+def test_pattern_set_counts_each_string(mocker, threshold: int) -> None:
+    mocker.patch.object(PatternSet, "automaton_threshold", threshold)
+    content = b"Test TEST a.c abc tests"
+    pattern_set = PatternSet(["test", "a.c", "tests"], "fixed")
+
+    assert pattern_set.count_each(content) == [
+        Matcher(search_string, "fixed").count(content)
+        for search_string in pattern_set.search_strings
+    ]
+    assert pattern_set.count(content) == 5
+
+
+def test_pattern_set_of_regexes() -> None:
+    pattern_set = PatternSet(["t(e)st", "a.c", "zzz"])
+
+    assert pattern_set.count_each(b"Test TEST abc") == [2, 1, 0]
+    assert pattern_set.count_each(b"nothing here") == [0, 0, 0]
+
+
+def test_pattern_set_index_of() -> None:
+    pattern_set = PatternSet(["t(e)st", "a(b)(c)", "zzz"])
+    matches = pattern_set.pattern.finditer(b"zzz abc test")
+
+    assert [pattern_set.index_of(match) for match in matches] == [2, 1, 0]
+
+
+def test_pattern_set_ignores_case_beyond_ascii() -> None:
+    content = "CAFÉ café cafe".encode("latin-1")
+    pattern_set = PatternSet(["café", "cafe"])
+    matches = pattern_set.pattern.finditer(content)
+
+    assert pattern_set.count_each(content) == [2, 1]
+    assert [pattern_set.index_of(match) for match in matches] == [0, 0, 1]
+
+
+@pytest.mark.parametrize(
+    "search_strings, expected, indices",
+    [
+        (["(a)\\1", "foo"], [1, 2], [0, 1, 1]),
+        (["foo", "(a)\\1"], [2, 1], [1, 0, 0]),
+        (["(?i)a", "foo"], [3, 2], [0, 0, 1, 1, 0]),
+        (["(?P<x>a)", "(?P<x>b)"], [3, 1], [0, 0, 0, 1]),
+    ],
+)
+def test_pattern_set_of_regexes_that_cant_be_joined(
+    search_strings: List[str], expected: List[int], indices: List[int]
+) -> None:
+    content = b"aa foo FOO ab"
+    pattern_set = PatternSet(search_strings)
+    matches = pattern_set.pattern.finditer(content)
+
+    assert pattern_set.count_each(content) == expected
+    assert [pattern_set.index_of(match) for match in matches] == indices
@@ -0,0 +1,272 @@
+from importlib import import_module
+from io import BytesIO
+from pathlib import Path
+import zipfile
+
+import pytest
+
+from heatfile.core.locations import LineIndex
+from heatfile.core.matcher import Matcher, PatternSet
+from heatfile.core.reader import is_binary, Reader, SKIPPED
+
+
+@pytest.fixture
+def mock_big_file(tmp_path: Path) -> Path:
+    file = tmp_path / "big.log"
+    file.write_bytes(b"xx Test " * 1000 + b"aaaaaaa" + b"\n^tail test")
+    return file
+
+
+@pytest.mark.parametrize("use_mmap", [True, False])
+@pytest.mark.parametrize("buffer_size", [7, 64, 1000, 1 << 20])
+@pytest.mark.parametrize(
+    "search_string, mode", [("test", "auto"), ("aa", "auto"), ("t.st", "regex")]
+)
+def test_count_matches_whole_file(
+    mock_big_file: Path, buffer_size: int, use_mmap: bool, search_string: str, mode: str
+) -> None:
+    matcher = Matcher(search_string, mode)
+    expected = matcher.count(mock_big_file.read_bytes())
+    reader = Reader(buffer_size=buffer_size, use_mmap=use_mmap, overlap=16)
+
+    assert reader.count(mock_big_file, matcher) == expected
+
+
+@pytest.mark.parametrize("search_string", ["^xx", r"\btest"])
+def test_count_stream_keeps_anchors_and_boundaries(
+    mock_big_file: Path, search_string: str
+) -> None:
+    matcher = Matcher(search_string, "regex")
+    expected = matcher.count(mock_big_file.read_bytes())
+    reader = Reader(buffer_size=10, use_mmap=False)
+
+    assert reader.count(mock_big_file, matcher) == expected
+
+
+def test_count_falls_back_to_stream(mock_big_file: Path, mocker) -> None:
+    mocker.patch("heatfile.core.reader.mmap.mmap", side_effect=OSError)
+    reader = Reader(buffer_size=64)
+
+    assert reader.count(mock_big_file, Matcher("test")) == 1001
+
+
+@pytest.mark.parametrize(
+    "matcher", [Matcher("test"), PatternSet(["test", "tail"])], ids=["one", "set"]
+)
+def test_scan_never_maps_files_without_mmap(
+    mock_big_file: Path, mocker, matcher
+) -> None:
+    mapped = mocker.patch("heatfile.core.reader.mmap.mmap")
+
+    assert Reader(64, use_mmap=False, context=0).scan(mock_big_file, matcher)[0] > 0
+    assert Reader(64, use_mmap=False).scan(mock_big_file, matcher)[0] > 0
+    assert not mapped.called
+
+
+def test_count_empty_file(tmp_path: Path) -> None:
+    file = tmp_path / "empty"
+    file.touch()
+
+    assert Reader(buffer_size=1).count(file, Matcher("test")) == 0
+
+
+def test_fails_with_empty_buffer() -> None:
+    with pytest.raises(ValueError):
+        Reader(buffer_size=0)
+
+
+@pytest.mark.parametrize(
+    "head, expected",
+    [
+        (b"plain text\n", False),
+        ("café naïve".encode("utf-8"), False),
+        (b"text\x00with a NUL", True),
+        (b"\x89PNG\r\n\x1a\n", True),
+        (b"\x1f\x8b\x08", True),
+        (b"BZh91AY&SY", True),
+        (b"BZh is not bzip2", False),
+        (b"x" * 10000 + b"\x00", False),
+    ],
+)
+def test_is_binary(head: bytes, expected: bool) -> None:
+    assert is_binary(head) is expected
+
+
+@pytest.mark.parametrize("buffer_size", [16, 1 << 20])
+def test_scan_skips_binary_files(tmp_path: Path, buffer_size: int) -> None:
+    file = tmp_path / "image.png"
+    file.write_bytes(b"\x89PNG test " * 10)
+    matcher = Matcher("test")
+
+    assert Reader(buffer_size).scan(file, matcher, index=True)[:3] == (
+        SKIPPED,
+        None,
+        True,
+    )
+    assert Reader(buffer_size, skip_binary=False).scan(file, matcher)[:3] == (
+        10,
+        None,
+        True,
+    )
+
+
+@pytest.mark.parametrize("use_mmap", [True, False])
+@pytest.mark.parametrize("buffer_size", [16, 1 << 20])
+def test_scan_locates_matches(
+    mock_big_file: Path, buffer_size: int, use_mmap: bool
+) -> None:
+    reader = Reader(buffer_size, use_mmap=use_mmap, context=1)
+    count, _, _, locations, _, _ = reader.scan(mock_big_file, Matcher("test"))
+
+    assert count == 1001
+    assert locations is not None
+    assert [(location.line, location.column) for location in locations[-2:]] == [
+        (1, 7996),
+        (2, 7),
+    ]
+    assert locations[-1].before[0].startswith("xx Test")
+    assert locations[-1].text == "^tail test"
+
+
+@pytest.mark.parametrize("context", [0, 2])
+@pytest.mark.parametrize("buffer_size", [4, 16])
+def test_scan_locates_matches_in_streams_by_chunks(
+    mocker, context: int, buffer_size: int
+) -> None:
+    content = b"".join(b"line %d test\r\n\ntest" % line for line in range(50))
+    expected = Reader(1 << 20, context=context)._match(content, Matcher("test"), False)
+    stream = BytesIO(content)
+    read = mocker.spy(stream, "read")
+    reader = Reader(buffer_size, context=context)
+
+    assert reader._scan_stream(stream, Matcher("test"), False) == expected
+    assert {call[0] for call in read.call_args_list} == {(buffer_size,)}
+    anchored = Matcher("^line", "regex")
+    assert reader._scan_stream(BytesIO(content), anchored, False)[0] == 1
+
+
+def test_scan_locates_matches_in_lines_longer_than_the_buffer(mocker) -> None:
+    content = b"x" * 50000 + b"test" + b"x" * 50000 + b"test\nnext line"
+    expected = Reader(1 << 20, context=1)._match(content, Matcher("test"), False)
+    indexed = mocker.spy(LineIndex, "__init__")
+    reader = Reader(1024, context=1)
+
+    count, _, _, locations, _, _ = reader._scan_stream(
+        BytesIO(content), Matcher("test"), False
+    )
+
+    assert count == 2
+    assert locations is not None and expected[3] is not None
+    assert [(location.line, location.column) for location in locations] == [
+        (location.line, location.column) for location in expected[3]
+    ]
+    # The lines are cut short rather than read whole.
+    assert all(len(location.text) < 10000 for location in locations)
+    assert locations[-1].text.endswith("test")
+    assert locations[-1].after == ["next line"]
+    assert max(len(call[0][1]) for call in indexed.call_args_list) < 10000
+
+
+def test_scan_stops_at_max_matches(mock_big_file: Path) -> None:
+    reader = Reader(16, max_matches=3)
+
+    assert reader.scan(mock_big_file, Matcher("test")) == (
+        3,
+        None,
+        False,
+        None,
+        None,
+        None,
+    )
+
+
+@pytest.mark.parametrize("use_mmap", [True, False])
+@pytest.mark.parametrize("buffer_size", [16, 1 << 20])
+@pytest.mark.parametrize("threshold", [1, 64])
+def test_scan_counts_each_string_of_a_set(
+    mock_big_file: Path, buffer_size: int, use_mmap: bool, mocker, threshold: int
+) -> None:
+    mocker.patch.object(PatternSet, "automaton_threshold", threshold)
+    reader = Reader(buffer_size, use_mmap=use_mmap)
+
+    assert reader.scan(mock_big_file, PatternSet(["test", "tail", "none"])) == (
+        1002,
+        None,
+        False,
+        None,
+        [1001, 1, 0],
+        None,
+    )
+
+
+@pytest.mark.parametrize("use_mmap", [True, False])
+@pytest.mark.parametrize("buffer_size", [16, 1 << 20])
+@pytest.mark.parametrize(
+    "matcher", [Matcher("tail"), PatternSet(["none", "tail"])], ids=["one", "set"]
+)
+def test_scan_any_match_stops_at_the_first_match(
+    mock_big_file: Path, buffer_size: int, use_mmap: bool, matcher
+) -> None:
+    reader = Reader(buffer_size, use_mmap=use_mmap, any_match=True)
+
+    assert reader.scan(mock_big_file, matcher) == (1, None, False, None, None, None)
+    assert reader.scan(mock_big_file, Matcher("none"))[0] == 0
+
+
+def test_scan_any_match_reads_up_to_the_first_match() -> None:
+    reader = Reader(8, use_mmap=False, overlap=3, any_match=True)
+    stream = BytesIO(b"xxtest" + b"x" * 100)
+
+    assert reader._search_stream(stream, Matcher("test"), b"xxxxxxxx") == 1
+    assert stream.tell() == 8
+
+
+@pytest.mark.parametrize(
+    "module, suffix", [("gzip", ".gz"), ("bz2", ".bz2"), ("lzma", ".xz")]
+)
+@pytest.mark.parametrize("context", [None, 0])
+def test_scan_decompresses_streams(
+    mock_big_file: Path, module: str, suffix: str, context
+) -> None:
+    compressed = mock_big_file.with_name("big.log" + suffix)
+    with import_module(module).open(compressed, "wb") as file:
+        file.write(mock_big_file.read_bytes())
+    reader = Reader(16, context=context, search_compressed=True)
+
+    assert reader.scan(compressed, Matcher("test"))[0] == 1001
+    assert Reader(16).scan(compressed, Matcher("test"))[0] == SKIPPED
+
+
+def test_scan_counts_the_members_of_archives(tmp_path: Path) -> None:
+    with zipfile.ZipFile(tmp_path / "a.zip", "w") as archive:
+        archive.writestr("a.txt", "foo bar foo")
+        archive.writestr("b.bin", b"\0foo")
+        archive.writestr("c.txt", "bar")
+    reader = Reader(4, search_compressed=True)
+
+    assert reader.scan(tmp_path / "a.zip", PatternSet(["foo", "bar"])) == (
+        4,
+        None,
+        False,
+        None,
+        [2, 2],
+        [
+            ("a.txt", 11, 3, None, [2, 1]),
+            ("b.bin", 4, SKIPPED, None, None),
+            ("c.txt", 3, 1, None, [0, 1]),
+        ],
+    )
+    reader.any_match = True
+    assert reader.scan(tmp_path / "a.zip", Matcher("foo"))[::5] == (
+        1,
+        [("a.txt", 11, 1, None, None)],
+    )
+
+
+def test_scan_reads_broken_compressed_files_as_they_are(tmp_path: Path) -> None:
+    (tmp_path / "a.gz").write_bytes(b"\x1f\x8b test")
+    (tmp_path / "b.zip").write_text("test")
+    reader = Reader(search_compressed=True)
+
+    assert reader.scan(tmp_path / "a.gz", Matcher("test"))[:3] == (SKIPPED, None, True)
+    assert reader.count(tmp_path / "b.zip", Matcher("test")) == 1
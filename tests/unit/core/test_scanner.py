@@ -0,0 +1,381 @@
+from concurrent.futures import ThreadPoolExecutor
+import gc
+import gzip
+import io
+import os
+from pathlib import Path
+import tarfile
+from typing import List, Optional, Tuple
+import weakref
+
+import pytest
+from pytest_mock import MockFixture
+
+from heatfile.core import scanner
+from heatfile.core.scanner import Node, Scanner
+
+
+@pytest.fixture
+def mock_tree(tmp_path: Path) -> Path:
+    for directory in ["a", "a/b", "c"]:
+        (tmp_path / directory).mkdir()
+    (tmp_path / "a" / "b" / "match.txt").write_text("test test")
+    (tmp_path / "a" / "other.txt").write_text("other")
+    (tmp_path / "c" / "match.txt").write_text("TEST")
+    (tmp_path / "root.txt").write_text("test")
+    return tmp_path
+
+
+def summarize(
+    scanner: Scanner, path: Path
+) -> Tuple[List[Tuple[str, int]], Tuple[int, int, int]]:
+    result = scanner.scan(path)
+    nodes = [(node.display_name, node.references) for node in result]
+    return nodes, (result.directories_count, result.files_count, result.total_refs)
+
+
+def test_scan_without_search_string(mock_tree: Path) -> None:
+    nodes, totals = summarize(Scanner(), mock_tree)
+
+    assert [name for name, _ in nodes] == [
+        f"{mock_tree.name}/",
+        "a/",
+        "b/",
+        "match.txt",
+        "other.txt",
+        "c/",
+        "match.txt",
+        "root.txt",
+    ]
+    assert totals == (3, 4, 0)
+
+
+def test_scan_with_search_string(mock_tree: Path) -> None:
+    nodes, totals = summarize(Scanner("test", use_cache=False), mock_tree)
+
+    assert nodes == [
+        ("a/", 0),
+        ("b/", 0),
+        ("match.txt", 2),
+        (f"{mock_tree.name}/", 0),
+        ("c/", 0),
+        ("match.txt", 1),
+        ("root.txt", 1),
+    ]
+    assert totals == (4, 3, 4)
+
+
+def test_scan_shows_the_directory_and_parent_of_each_match(tmp_path: Path) -> None:
+    for file in ["d1/d2/d3/f.txt", "d1/d2/d4/h.txt", "d1/d2/g.txt", "d1/z.txt"]:
+        (tmp_path / file).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / file).write_text("test")
+    nodes, totals = summarize(Scanner("test", use_cache=False), tmp_path)
+
+    assert [name for name, _ in nodes] == [
+        "d2/",
+        "d3/",
+        "f.txt",
+        "d4/",
+        "h.txt",
+        "d1/",
+        "g.txt",
+        f"{tmp_path.name}/",
+        "z.txt",
+    ]
+    assert totals == (5, 4, 4)
+
+
+def test_scans_are_independent(mock_tree: Path) -> None:
+    scanner = Scanner("test", use_cache=False)
+
+    assert summarize(scanner, mock_tree) == summarize(scanner, mock_tree)
+
+
+def test_concurrent_scans(mock_tree: Path) -> None:
+    scanner = Scanner("test", use_cache=False)
+    expected = summarize(scanner, mock_tree)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda _: summarize(scanner, mock_tree), range(8)))
+
+    assert results == [expected] * 8
+
+
+def test_scan_releases_emitted_subtrees(mock_tree: Path) -> None:
+    result = Scanner("test", use_cache=False).scan(mock_tree)
+    first = next(iter(result))
+    reference = weakref.ref(first)  # type: weakref.ref
+    del first
+
+    remaining = [node.display_name for node in result]
+    gc.collect()
+    released = reference()  # type: Optional[Node]
+
+    assert remaining
+    assert released is None
+
+
+def test_scan_prunes_ignored_directories_before_listing(
+    mock_tree: Path, mocker: MockFixture
+) -> None:
+    (mock_tree / ".gitignore").write_text("b/\nroot.txt\n")
+    list_directory = mocker.spy(scanner, "list_directory")
+
+    nodes, totals = summarize(Scanner(), mock_tree)
+
+    assert [name for name, _ in nodes] == [
+        f"{mock_tree.name}/",
+        ".gitignore",
+        "a/",
+        "other.txt",
+        "c/",
+        "match.txt",
+    ]
+    assert totals == (2, 3, 0)
+    assert mock_tree / "a" / "b" not in [
+        Path(call.args[0]) for call in list_directory.call_args_list
+    ]
+
+
+def test_scan_with_excludes_and_includes(mock_tree: Path) -> None:
+    nodes, totals = summarize(
+        Scanner("test", use_cache=False, excludes=["c/"], includes=["match.*"]),
+        mock_tree,
+    )
+
+    assert nodes == [("a/", 0), ("b/", 0), ("match.txt", 2)]
+    assert totals == (2, 1, 2)
+    assert summarize(Scanner(use_ignore_files=False), mock_tree)[1] == (3, 4, 0)
+
+
+@pytest.mark.parametrize("use_cache", [False, True])
+def test_scan_skips_binary_files(mock_tree: Path, use_cache: bool) -> None:
+    (mock_tree / "c" / "blob.bin").write_bytes(b"test\x00" * 10)
+
+    for _ in range(2):
+        result = Scanner("test", use_cache=use_cache).scan(mock_tree)
+        assert "blob.bin" not in [node.display_name for node in result]
+        assert (result.total_refs, result.skipped_files, result.skipped_bytes) == (
+            4,
+            1,
+            50,
+        )
+
+    result = Scanner("test", use_cache=use_cache, skip_binary=False).scan(mock_tree)
+    assert ("blob.bin", 10) in [(node.display_name, node.references) for node in result]
+    assert (result.total_refs, result.skipped_files) == (14, 0)
+
+
+def test_scan_prunes_the_walk_at_max_depth(
+    mock_tree: Path, mocker: MockFixture
+) -> None:
+    list_directory = mocker.spy(scanner, "list_directory")
+
+    nodes, totals = summarize(Scanner(max_depth=1), mock_tree)
+
+    assert [name for name, _ in nodes] == [f"{mock_tree.name}/", "a/", "c/", "root.txt"]
+    assert totals == (2, 1, 0)
+    assert list_directory.call_count == 1
+    assert summarize(Scanner("test", use_cache=False, max_depth=1), mock_tree) == (
+        [(f"{mock_tree.name}/", 0), ("root.txt", 1)],
+        (1, 1, 1),
+    )
+
+
+def test_scan_skips_files_over_max_filesize(mock_tree: Path) -> None:
+    nodes, totals = summarize(Scanner(max_filesize=4), mock_tree)
+
+    assert [name for name, _ in nodes] == [
+        f"{mock_tree.name}/",
+        "a/",
+        "b/",
+        "c/",
+        "match.txt",
+        "root.txt",
+    ]
+    assert totals == (3, 2, 0)
+
+
+def test_scan_stops_after_max_files(mock_tree: Path) -> None:
+    nodes, totals = summarize(Scanner(max_files=2), mock_tree)
+
+    assert [name for name, _ in nodes] == [
+        f"{mock_tree.name}/",
+        "a/",
+        "b/",
+        "match.txt",
+        "other.txt",
+    ]
+    assert totals == (2, 2, 0)
+    assert summarize(Scanner("test", use_cache=False, max_files=2), mock_tree) == (
+        [("a/", 0), ("b/", 0), ("match.txt", 2)],
+        (2, 1, 2),
+    )
+
+
+def test_scan_files_with_matches(mock_tree: Path) -> None:
+    nodes, totals = summarize(
+        Scanner("test", use_cache=True, files_with_matches=True), mock_tree
+    )
+
+    assert [references for name, references in nodes if not name.endswith("/")] == [
+        1,
+        1,
+        1,
+    ]
+    assert totals[1:] == (3, 3)
+
+
+def test_scan_stops_at_the_first_match(mock_tree: Path) -> None:
+    assert summarize(Scanner("test", first_match=True), mock_tree) == (
+        [("a/", 0), ("b/", 0), ("match.txt", 1)],
+        (2, 1, 1),
+    )
+
+
+@pytest.fixture
+def mock_links(mock_tree: Path) -> Path:
+    (mock_tree / "a" / "b" / "loop").symlink_to("../..", target_is_directory=True)
+    os.link(mock_tree / "root.txt", mock_tree / "c" / "hard.txt")
+    (mock_tree / "link.txt").symlink_to("a/b/match.txt")
+    (mock_tree / "broken.txt").symlink_to("missing.txt")
+    return mock_tree
+
+
+def test_scan_walks_each_directory_once(mock_links: Path) -> None:
+    nodes, totals = summarize(Scanner(), mock_links)
+
+    # The loop is shown, but not walked again.
+    assert [name for name, _ in nodes].count("loop/") == 1
+    assert totals == (4, 7, 0)
+    assert summarize(Scanner(follow_symlinks=False), mock_links)[1] == (3, 8, 0)
+
+
+def test_scan_shows_the_later_links_to_a_directory(tmp_path: Path) -> None:
+    (tmp_path / "z").mkdir()
+    (tmp_path / "z" / "f.txt").write_text("test")
+    (tmp_path / "a").symlink_to("z", target_is_directory=True)
+
+    nodes, totals = summarize(Scanner(), tmp_path)
+
+    assert [name for name, _ in nodes] == [f"{tmp_path.name}/", "a/", "f.txt", "z/"]
+    assert totals == (2, 1, 0)
+
+
+def test_scan_searches_each_file_once(mock_links: Path, mocker: MockFixture) -> None:
+    scan = mocker.spy(scanner.Reader, "scan")
+
+    nodes, totals = summarize(Scanner("test", use_cache=False), mock_links)
+
+    # The links found after their file are shown with its references.
+    assert [node for node in nodes if not node[0].endswith("/")] == [
+        ("match.txt", 2),
+        ("hard.txt", 1),
+        ("match.txt", 1),
+        ("link.txt", 2),
+        ("root.txt", 1),
+    ]
+    assert totals == (4, 5, 7)
+    assert sorted(Path(call[0][1]).name for call in scan.call_args_list) == [
+        "hard.txt",
+        "match.txt",
+        "match.txt",
+        "other.txt",
+    ]
+
+
+def test_scan_shows_the_hard_links_of_a_file(tmp_path: Path) -> None:
+    for directory in ["a", "b"]:
+        (tmp_path / directory).mkdir()
+    (tmp_path / "a" / "x.txt").write_text("foo foo")
+    os.link(tmp_path / "a" / "x.txt", tmp_path / "b" / "y.txt")
+
+    nodes, totals = summarize(Scanner("foo", use_cache=False), tmp_path)
+
+    assert nodes == [
+        (f"{tmp_path.name}/", 0),
+        ("a/", 0),
+        ("x.txt", 2),
+        ("b/", 0),
+        ("y.txt", 2),
+    ]
+    assert totals == (3, 2, 4)
+
+
+def test_scan_keeps_the_references_of_files_with_other_links(tmp_path: Path) -> None:
+    (tmp_path / "x.txt").write_text("foo\nfoo")
+    (tmp_path / "z.txt").write_text("foo")
+    os.link(tmp_path / "x.txt", tmp_path / "y.txt")
+
+    result = Scanner(
+        "foo", use_cache=False, follow_symlinks=False, show_matches=True
+    ).scan(tmp_path)
+    nodes = [(node.display_name, node.references, node.matches) for node in result]
+
+    # Only their counts are kept: the locations are shown with the file searched.
+    assert [(name, references) for name, references, _ in nodes[1:]] == [
+        ("x.txt", 2),
+        ("y.txt", 2),
+        ("z.txt", 1),
+    ]
+    assert nodes[1][2] and nodes[2][2] is None
+    assert list(result._found.values()) == [(2, None)]
+
+
+def test_scan_without_following_links(mock_links: Path) -> None:
+    (mock_links / "a" / "b" / "match.txt").unlink()
+
+    nodes, totals = summarize(
+        Scanner("test", use_cache=False, follow_symlinks=False), mock_links
+    )
+
+    assert totals == (2, 3, 3)
+    assert "link.txt" not in [name for name, _ in nodes]
+
+
+def test_scan_stays_on_one_file_system(mock_tree: Path, mocker: MockFixture) -> None:
+    stat_key = Scanner._stat_key
+
+    def other_device(
+        entry: os.DirEntry, result: scanner.ScanResult
+    ) -> Optional[Tuple[int, int]]:
+        key = stat_key(entry, result)
+        assert key is not None
+        return (-1, key[1]) if entry.name == "c" else key
+
+    mocker.patch.object(Scanner, "_stat_key", side_effect=other_device)
+
+    nodes, _ = summarize(Scanner(one_file_system=True), mock_tree)
+
+    assert "c/" not in [name for name, _ in nodes]
+    assert "c/" in [name for name, _ in summarize(Scanner(), mock_tree)[0]]
+
+
+def test_scan_shows_the_members_of_archives(mock_tree: Path) -> None:
+    with tarfile.open(mock_tree / "c" / "d.tar.gz", "w:gz") as archive:
+        for name in ["x/y/match.txt", "x/none.txt", "a.txt", "b.bin"]:
+            info = tarfile.TarInfo(name)
+            content = b"\0" if name == "b.bin" else name.encode()
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+    (mock_tree / "c" / "e.txt.gz").write_bytes(gzip.compress(b"test test"))
+
+    result = Scanner("match", search_compressed=True).scan(mock_tree / "c")
+    nodes = [
+        (str(node.path.relative_to(mock_tree)), node.is_dir, node.references)
+        for node in result
+    ]
+
+    assert nodes == [
+        ("c", True, 0),
+        ("c/d.tar.gz", False, 1),
+        ("c/d.tar.gz/x", True, 0),
+        ("c/d.tar.gz/x/y", True, 0),
+        ("c/d.tar.gz/x/y/match.txt", False, 1),
+    ]
+    assert (result.directories_count, result.files_count) == (3, 2)
+    assert (result.skipped_files, result.skipped_bytes) == (1, 1)
+    assert summarize(Scanner("test", search_compressed=True), mock_tree / "c") == (
+        [("c/", 0), ("e.txt.gz", 2), ("match.txt", 1)],
+        (1, 2, 3),
+    )
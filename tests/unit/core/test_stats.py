@@ -0,0 +1,148 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from heatfile.core.engine import SearchEngine
+from heatfile.core.matcher import Matcher, PatternSet
+from heatfile.core.reader import Reader, SKIPPED
+from heatfile.core.scanner import Scanner
+from heatfile.core.stats import (
+    measured_matcher,
+    MeasuredReader,
+    scan_batch_measured,
+    Stats,
+)
+
+
+def test_slowest_files_are_bounded() -> None:
+    stats = Stats(slowest_size=2)
+    stats.add_file("a", 0.3, 10, False)
+    stats.add_file("b", 0.1, 20, False)
+    stats.add_file("c", 0.2, 30, True)
+
+    assert stats.slowest() == [(Path("a"), 0.3), (Path("c"), 0.2)]
+    assert (stats.files_read, stats.bytes_read, stats.files_skipped) == (2, 30, 1)
+
+
+def test_merge_adds_counters_and_keeps_the_slowest() -> None:
+    stats, other = Stats(slowest_size=1), Stats()
+    stats.add_file("a", 0.1, 10, False)
+    other.add_file("b", 0.2, 5, False)
+    other.add_directory(0.5)
+    stats.merge(other)
+
+    assert stats.files_read == 2
+    assert stats.bytes_read == 15
+    assert stats.directories == 1
+    assert stats.read_time == pytest.approx(0.3)
+    assert stats.slowest() == [(Path("b"), 0.2)]
+
+
+def test_interleaved_scans_leave_os_alone(tmp_path: Path) -> None:
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "x.txt").write_text("test")
+    stat = os.stat
+    scans = [
+        iter(Scanner("test", use_cache=False, stats=True).scan(tmp_path))
+        for _ in range(2)
+    ]
+    for nodes in scans:
+        next(nodes)
+    for nodes in scans:
+        list(nodes)
+
+    assert os.stat is stat
+
+
+def test_measure_times_the_nodes() -> None:
+    stats = Stats()
+
+    assert list(stats.measure(iter([1, 2]))) == [1, 2]
+    assert stats.scan_time > 0
+
+
+@pytest.mark.parametrize(
+    "matcher", [Matcher("test"), PatternSet(["test", "other"])], ids=["one", "set"]
+)
+def test_measured_scans_count_as_the_reader(tmp_path: Path, matcher) -> None:
+    (tmp_path / "a.txt").write_text("test " * 10)
+    (tmp_path / "b.bin").write_bytes(b"\0test")
+    paths = [tmp_path / "a.txt", tmp_path / "b.bin"]
+
+    scanned, stats = scan_batch_measured(Reader(buffer_size=8), matcher, False, paths)
+
+    assert [scan[0] for scan in scanned] == [10, SKIPPED]
+    assert (stats.files_read, stats.bytes_read, stats.files_skipped) == (1, 50, 1)
+    assert 0 < stats.match_time < stats.read_time
+
+
+def test_measured_reader_times_the_located_matches(tmp_path: Path) -> None:
+    (tmp_path / "a.txt").write_text("one test\ntwo test\n")
+    stats = Stats()
+    reader = MeasuredReader(Reader(context=0), stats)
+
+    assert reader.scan(tmp_path / "a.txt", Matcher("test"))[0] == 2
+    assert stats.match_time > 0
+
+
+@pytest.mark.parametrize(
+    "reader, matcher, bytes_read, stat_calls",
+    [
+        # Read up to its first match.
+        (Reader(buffer_size=8, use_mmap=False, any_match=True), Matcher("t"), 8, 0),
+        (Reader(buffer_size=8, use_mmap=False, context=0), Matcher("t"), 1010, 0),
+        (Reader(buffer_size=8, use_mmap=False), Matcher("t.st"), 1010, 0),
+        (
+            Reader(buffer_size=8, use_mmap=False),
+            PatternSet(["test"] * PatternSet.automaton_threshold),
+            1010,
+            0,
+        ),
+        # Mapped, and matched in place.
+        (Reader(buffer_size=8, any_match=True), Matcher("t"), 1010, 1),
+    ],
+)
+def test_measured_reader_counts_the_bytes_read_and_times_the_matches(
+    tmp_path: Path, reader: Reader, matcher, bytes_read: int, stat_calls: int
+) -> None:
+    (tmp_path / "a.txt").write_text("test\n" + "x" * 1000 + "test\n")
+    stats = Stats()
+    measured = MeasuredReader(reader, stats)
+
+    assert measured.scan(tmp_path / "a.txt", measured_matcher(matcher, stats))[0] > 0
+    assert (stats.files_read, stats.bytes_read) == (1, bytes_read)
+    assert stats.stat_calls == stat_calls
+    assert 0 < stats.match_time < stats.read_time
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_engine_merges_the_stats_of_every_batch(tmp_path: Path, jobs: int) -> None:
+    for index in range(40):
+        (tmp_path / f"{index}.txt").write_text("test")
+    stats = Stats()
+    paths = sorted(tmp_path.iterdir())
+
+    with SearchEngine(Matcher("test"), jobs=jobs, pool="thread", stats=stats) as engine:
+        assert sum(count for _, count in engine.count(paths, key=Path)) == 40
+
+    assert stats.files_read == 40
+    assert len(stats.slowest()) == 10
+
+
+def test_scanner_collects_stats_only_when_asked(tmp_path: Path) -> None:
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "x.txt").write_text("test")
+    (tmp_path / "link.txt").symlink_to(tmp_path / "a" / "x.txt")
+
+    assert Scanner("test", use_cache=False).scan(tmp_path).stats is None
+
+    result = Scanner("test", use_cache=False, stats=True).scan(tmp_path)
+    list(result)
+
+    assert result.stats is not None
+    assert result.stats.directories == 2
+    assert result.stats.files_read == 1
+    # Two of the root, one of each directory listed, of the entries that aren't
+    # plain files, and of the size of the file read.
+    assert result.stats.stat_calls == 6
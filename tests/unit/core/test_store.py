@@ -0,0 +1,79 @@
+from contextlib import redirect_stdout
+import io
+from pathlib import Path
+from typing import cast, Iterable
+import zipfile
+
+import pytest
+
+from heatfile.console.commands import Tree
+from heatfile.core.scanner import Node, Scanner
+from heatfile.core.store import NodeStore
+
+
+@pytest.fixture
+def mock_tree(tmp_path: Path) -> Path:
+    for directory in ("a/b/c", "a/b/d", "a/e", "f"):
+        (tmp_path / directory).mkdir(parents=True)
+    for file, content in (
+        ("a/b/c/one.txt", "test"),
+        ("a/b/d/two.txt", "nothing"),
+        ("a/b/three.txt", "test test"),
+        ("a/e/four.txt", "test"),
+        ("f/five.txt", "test\ntest\nnone"),
+        ("f/one.txt", "none"),
+        ("six.txt", "none"),
+    ):
+        (tmp_path / file).write_text(content)
+    with zipfile.ZipFile(tmp_path / "a" / "e" / "seven.zip", "w") as archive:
+        archive.writestr("g/eight.txt", "test")
+    return tmp_path
+
+
+def render(nodes: Iterable[Node]) -> str:
+    output = io.StringIO()
+    with redirect_stdout(output):
+        Tree._write_lines(cast(Iterable[Tree], nodes), patterns=["test", "none"])
+    return output.getvalue()
+
+
+@pytest.mark.parametrize(
+    "search_string, options",
+    [
+        (None, {}),
+        ("test", {}),
+        ("test", {"search_compressed": True}),
+        ("test", {"show_matches": True, "context": 1}),
+        (["test", "none"], {}),
+    ],
+)
+def test_store_renders_like_the_scan(mock_tree: Path, search_string, options) -> None:
+    scanner = Scanner(search_string, node_class=Tree, use_cache=False, **options)
+    store = NodeStore(Tree)
+    store.extend(scanner.scan(mock_tree))
+    nodes = list(scanner.scan(mock_tree))
+
+    assert len(store) == len(nodes)
+    assert [str(node.path) for node in store] == [str(node.path) for node in nodes]
+    assert render(store) == render(nodes)
+
+
+def test_store_of_a_file(mock_tree: Path) -> None:
+    store = NodeStore(Tree)
+    store.extend(Scanner("test", node_class=Tree).scan(mock_tree / "f" / "five.txt"))
+    (node,) = store
+
+    assert (node.path, node.references) == (mock_tree / "f" / "five.txt", 2)
+    assert node.parent_path is not None and node.parent_path.path == node.path
+
+
+def test_store_shares_the_parents(mock_tree: Path) -> None:
+    store = NodeStore()
+    store.extend(Scanner().scan(mock_tree))
+    nodes = {str(node.path): node for node in store}
+
+    assert (
+        nodes[str(mock_tree / "a" / "b" / "c" / "one.txt")].parent_path
+        is nodes[str(mock_tree / "a" / "b" / "c")]
+    )
+    assert store._names.count("one.txt") == 1
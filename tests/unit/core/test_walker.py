@@ -0,0 +1,105 @@
+import os
+from pathlib import Path
+import threading
+
+import pytest
+
+from heatfile.core.scanner import Scanner
+from heatfile.core.walker import CachedLister, list_directory, ParallelLister
+
+
+def test_list_directory_is_sorted_by_name(tmp_path: Path) -> None:
+    for name in ["b.txt", "a", "C.txt", "c.txt"]:
+        (tmp_path / name).touch()
+
+    assert [entry.name for entry in list_directory(tmp_path)] == [
+        "C.txt",
+        "a",
+        "b.txt",
+        "c.txt",
+    ]
+
+
+def test_list_directory_keeps_entry_type(tmp_path: Path) -> None:
+    (tmp_path / "directory").mkdir()
+    (tmp_path / "file").touch()
+
+    assert [entry.is_dir() for entry in list_directory(tmp_path)] == [True, False]
+
+
+@pytest.fixture
+def mock_tree(tmp_path: Path) -> Path:
+    for directory in range(5):
+        for subdirectory in range(4):
+            path = tmp_path / f"d{directory}" / f"s{subdirectory}" / "deep"
+            path.mkdir(parents=True)
+            (path.parent / "file.txt").touch()
+    (tmp_path / "d0" / "link").symlink_to(tmp_path / "d1")
+    return tmp_path
+
+
+@pytest.mark.parametrize(
+    "options",
+    [{}, {"max_depth": 2}, {"follow_symlinks": False}, {"excludes": ["s1"]}],
+    ids=["all", "depth", "no-follow", "excludes"],
+)
+def test_parallel_walk_keeps_the_order_of_the_tree(mock_tree: Path, options) -> None:
+    expected = [str(node.path) for node in Scanner(**options).scan(mock_tree)]
+
+    result = Scanner(jobs=4, **options).scan(mock_tree)
+
+    assert [str(node.path) for node in result] == expected
+    assert threading.active_count() == 1
+
+
+def test_parallel_lister_lists_at_most_window_ahead(mock_tree: Path) -> None:
+    paths = [str(path) for path in sorted(mock_tree.iterdir()) if path.is_dir()]
+    with ParallelLister(jobs=2, window=3) as lister:
+        lister.prefetch(paths)
+        assert list(lister._listings) == paths[:3]
+
+        # The subdirectories of a listed directory come first.
+        children = lister.list_directory(paths[0])
+        lister.prefetch(entry.path for entry in children if entry.is_dir())
+        assert list(lister._listings) == paths[1:3] + [children[0].path]
+
+        # Directories left out by the walk are dropped.
+        listing = lister.list_directory(paths[1])
+        assert [entry.name for entry in listing] == ["s0", "s1", "s2", "s3"]
+        assert list(lister._upcoming) == paths[2:]
+        assert list(lister._listings) == paths[2:3]
+
+
+def test_cached_lister_lists_again_modified_directories(tmp_path: Path) -> None:
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b.txt").write_text("x")
+    lister = CachedLister()
+    listing = lister.list_directory(tmp_path)
+
+    assert [(entry.name, entry.is_dir()) for entry in listing] == [
+        ("a", True),
+        ("b.txt", False),
+    ]
+    assert lister.list_directory(tmp_path) is listing
+
+    (tmp_path / "b.txt").write_text("xyz")
+    assert lister.list_directory(tmp_path) is listing
+    assert listing[1].stat().st_size == 3
+
+    (tmp_path / "c.txt").touch()
+    os.utime(tmp_path, ns=(0, 0))
+    assert [entry.name for entry in lister.list_directory(tmp_path)] == [
+        "a",
+        "b.txt",
+        "c.txt",
+    ]
+
+
+def test_scanner_walks_through_a_cached_lister(mock_tree: Path) -> None:
+    lister = CachedLister()
+    expected = [str(node.path) for node in Scanner().scan(mock_tree)]
+
+    for _ in range(2):
+        result = Scanner(lister=lister).scan(mock_tree)
+        assert [str(node.path) for node in result] == expected
+    assert len(lister) == 1 + 5 + 5 * 4 * 2
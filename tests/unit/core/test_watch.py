@@ -0,0 +1,292 @@
+import errno
+import os
+from pathlib import Path
+from typing import Optional, Set
+
+import pytest
+from pytest_mock import MockFixture
+
+from heatfile.core import watch
+from heatfile.core.reader import Reader
+from heatfile.core.scanner import Scanner
+from heatfile.core.watch import InotifyWatcher, PollingWatcher, Watch
+
+
+@pytest.fixture
+def mock_tree(tmp_path: Path) -> Path:
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "x.txt").write_text("test test")
+    (tmp_path / "y.txt").write_text("test")
+    (tmp_path / "z.log").write_text("test")
+    return tmp_path
+
+
+def make_watch(root: Path, **options) -> Watch:
+    scanner = Scanner("test", use_cache=False, keep_counts=True, **options)
+    result = scanner.scan(root)
+    list(result)
+    return Watch(scanner, result.counts)  # type: ignore
+
+
+def test_scan_keeps_counts(mock_tree: Path) -> None:
+    counts = make_watch(mock_tree).counts
+
+    assert counts.total == 4
+    assert counts.directory_total(str(mock_tree / "a")) == 2
+
+
+def test_update_scans_only_the_changed_files(
+    mock_tree: Path, mocker: MockFixture
+) -> None:
+    session = make_watch(mock_tree)
+    scan = mocker.spy(Reader, "scan")
+    (mock_tree / "a" / "x.txt").write_text("test")
+    (mock_tree / "a" / "new.txt").write_text("test test test")
+    (mock_tree / "y.txt").unlink()
+
+    changes = session.update(
+        str(mock_tree / name) for name in ("a/x.txt", "a/new.txt", "y.txt")
+    )
+
+    assert changes == [
+        (str(mock_tree / "a" / "new.txt"), 0, 3),
+        (str(mock_tree / "a" / "x.txt"), 2, 1),
+        (str(mock_tree / "y.txt"), 1, 0),
+    ]
+    assert scan.call_count == 2
+    assert session.counts.total == 5
+    assert session.counts.directory_total(str(mock_tree / "a")) == 4
+
+
+def test_update_drops_deleted_directories(mock_tree: Path) -> None:
+    session = make_watch(mock_tree)
+    (mock_tree / "a" / "x.txt").unlink()
+    (mock_tree / "a").rmdir()
+
+    assert session.update([str(mock_tree / "a")]) == [
+        (str(mock_tree / "a" / "x.txt"), 2, 0)
+    ]
+    assert session.counts.total == 2
+
+
+def test_update_skips_the_files_a_scan_skips(mock_tree: Path) -> None:
+    (mock_tree / "link.txt").symlink_to(mock_tree / "y.txt")
+    session = make_watch(mock_tree, max_filesize=20, follow_symlinks=False)
+    (mock_tree / "a" / "x.txt").write_text("test " * 10)
+    (mock_tree / "y.txt").write_text("test test")
+
+    changes = session.update(
+        str(mock_tree / name) for name in ("a/x.txt", "y.txt", "link.txt")
+    )
+
+    assert changes == [
+        (str(mock_tree / "a" / "x.txt"), 2, 0),
+        (str(mock_tree / "y.txt"), 1, 2),
+    ]
+
+
+def test_update_counts_the_hard_links_of_a_file_once(
+    mock_tree: Path, mocker: MockFixture
+) -> None:
+    os.link(mock_tree / "a" / "x.txt", mock_tree / "hard.txt")
+    session = make_watch(mock_tree)
+    scan = mocker.spy(Reader, "scan")
+    (mock_tree / "a" / "x.txt").write_text("test")
+    (mock_tree / "y.txt").unlink()
+
+    changes = session.update([str(mock_tree / "a" / "x.txt")])
+
+    assert changes == [
+        (str(mock_tree / "a" / "x.txt"), 2, 1),
+        (str(mock_tree / "hard.txt"), 2, 1),
+    ]
+    assert (
+        session.update([str(mock_tree / "hard.txt"), str(mock_tree / "a" / "x.txt")])
+        == []
+    )
+    assert scan.call_count == 2
+
+
+def test_update_counts_unreadable_files_as_empty(
+    mock_tree: Path, mocker: MockFixture
+) -> None:
+    session = make_watch(mock_tree)
+    mocker.patch.object(Reader, "scan", side_effect=PermissionError)
+
+    assert session.update([str(mock_tree / "y.txt")]) == [
+        (str(mock_tree / "y.txt"), 1, 0)
+    ]
+
+
+def test_watch_needs_a_search(mock_tree: Path) -> None:
+    with pytest.raises(ValueError):
+        Watch(Scanner(), make_watch(mock_tree).counts)
+
+
+def test_polling_watcher(mock_tree: Path) -> None:
+    path_filter = Scanner(excludes=["*.log"]).make_filter(mock_tree)
+    with PollingWatcher(str(mock_tree), path_filter, interval=0) as watcher:
+        os.utime(mock_tree / "y.txt", ns=(0, 0))
+        (mock_tree / "a" / "x.txt").unlink()
+        (mock_tree / "a" / "new.txt").touch()
+        (mock_tree / "z.log").write_text("ignored")
+
+        assert watcher.changes() == {
+            str(mock_tree / "y.txt"),
+            str(mock_tree / "a" / "x.txt"),
+            str(mock_tree / "a" / "new.txt"),
+        }
+        assert watcher.changes() == set()
+
+
+@pytest.mark.skipif(watch._inotify() is None, reason="inotify is not available")
+def test_inotify_watcher(mock_tree: Path) -> None:
+    path_filter = Scanner(excludes=["*.log"]).make_filter(mock_tree)
+    with InotifyWatcher(str(mock_tree), path_filter, interval=1) as watcher:
+        (mock_tree / "y.txt").write_text("changed")
+        (mock_tree / "z.log").write_text("ignored")
+        (mock_tree / "b").mkdir()
+        (mock_tree / "b" / "new.txt").touch()
+
+        changed = watcher.changes()
+        # The file may be created before the new directory is watched.
+        changed.discard(str(mock_tree / "b" / "new.txt"))
+        assert changed == {str(mock_tree / "y.txt"), str(mock_tree / "b")}
+
+        (mock_tree / "b" / "other.txt").touch()
+        assert watcher.changes() == {str(mock_tree / "b" / "other.txt")}
+
+
+def test_open_watcher_falls_back_to_polling(
+    mock_tree: Path, mocker: MockFixture
+) -> None:
+    mocker.patch.object(watch, "_inotify", return_value=None)
+
+    watcher = watch.open_watcher(str(mock_tree), Scanner().make_filter(mock_tree))
+
+    assert isinstance(watcher, PollingWatcher)
+
+
+def test_polling_watcher_ends_link_cycles(mock_tree: Path) -> None:
+    (mock_tree / "a" / "loop").symlink_to("..", target_is_directory=True)
+    watcher = PollingWatcher(str(mock_tree), Scanner().make_filter(mock_tree), 0)
+
+    assert sorted(watcher._signatures) == [
+        str(mock_tree / "a" / "x.txt"),
+        str(mock_tree / "y.txt"),
+        str(mock_tree / "z.log"),
+    ]
+
+
+@pytest.mark.skipif(watch._inotify() is None, reason="inotify is not available")
+def test_inotify_watcher_rescans_the_tree_after_an_overflow(mock_tree: Path) -> None:
+    path_filter = Scanner(excludes=["*.log"]).make_filter(mock_tree)
+    with InotifyWatcher(str(mock_tree), path_filter, interval=0) as watcher:
+        changed = set()  # type: Set[str]
+        watcher._handle(-1, watch._IN_Q_OVERFLOW, "", changed)
+
+        assert changed == {
+            str(mock_tree),
+            str(mock_tree / "a" / "x.txt"),
+            str(mock_tree / "y.txt"),
+        }
+
+
+@pytest.mark.skipif(watch._inotify() is None, reason="inotify is not available")
+def test_inotify_watcher_forgets_removed_watches(mock_tree: Path) -> None:
+    with InotifyWatcher(str(mock_tree), Scanner().make_filter(mock_tree)) as watcher:
+        descriptor = next(
+            descriptor
+            for descriptor, (path, _) in watcher._directories.items()
+            if path == str(mock_tree / "a")
+        )
+        changed = set()  # type: Set[str]
+        watcher._handle(descriptor, watch._IN_IGNORED, "", changed)
+        watcher._handle(descriptor, watch._IN_MODIFY, "x.txt", changed)
+
+        assert descriptor not in watcher._directories
+        assert changed == set()
+
+
+@pytest.mark.parametrize("error, watched", [(errno.ENOENT, 1), (errno.ENOSPC, None)])
+@pytest.mark.skipif(watch._inotify() is None, reason="inotify is not available")
+def test_inotify_watcher_fails_without_watches_left(
+    mock_tree: Path, mocker: MockFixture, error: int, watched: Optional[int]
+) -> None:
+    # Paths that vanish aren't watched; running out of watches falls back on
+    # polling.
+    libc = watch._inotify()
+    assert libc is not None
+    add_watch = libc.inotify_add_watch
+    mocker.patch.object(
+        libc,
+        "inotify_add_watch",
+        side_effect=lambda fd, path, mask: (
+            -1 if path.endswith(b"/a") else add_watch(fd, path, mask)
+        ),
+    )
+    mocker.patch.object(watch.ctypes, "get_errno", return_value=error)
+    path_filter = Scanner().make_filter(mock_tree)
+
+    opened = watch.open_watcher(str(mock_tree), path_filter)
+
+    with opened:
+        if watched is None:
+            assert isinstance(opened, PollingWatcher)
+        else:
+            assert isinstance(opened, InotifyWatcher)
+            assert len(opened._directories) == watched
+
+
+def test_watch_opens_a_watcher_of_its_root(mock_tree: Path) -> None:
+    with make_watch(mock_tree).open_watcher(interval=0) as watcher:
+        assert watcher.root == str(mock_tree)
+        assert watcher.changes() == set()
+
+
+def test_polling_watcher_of_a_file(mock_tree: Path) -> None:
+    path_filter = Scanner().make_filter(mock_tree)
+
+    assert list(PollingWatcher(str(mock_tree / "y.txt"), path_filter)._signatures) == [
+        str(mock_tree / "y.txt")
+    ]
+    assert PollingWatcher(str(mock_tree / "missing"), path_filter)._signatures == {}
+    assert list(watch._walk(str(mock_tree / "missing"), path_filter)) == []
+
+
+def test_inotify_is_unavailable_without_libc(mocker: MockFixture) -> None:
+    mocker.patch.object(watch.ctypes, "CDLL", side_effect=OSError)
+
+    assert watch._inotify.__wrapped__() is None
+
+
+def test_inotify_watcher_fails_without_an_instance(
+    mock_tree: Path, mocker: MockFixture
+) -> None:
+    libc = mocker.Mock()
+    libc.inotify_init1.return_value = -1
+    mocker.patch.object(watch, "_inotify", return_value=libc)
+
+    with pytest.raises(OSError):
+        InotifyWatcher(str(mock_tree), Scanner().make_filter(mock_tree))
+
+
+@pytest.mark.skipif(watch._inotify() is None, reason="inotify is not available")
+def test_inotify_watcher_of_a_file(mock_tree: Path) -> None:
+    path_filter = Scanner().make_filter(mock_tree)
+    with InotifyWatcher(str(mock_tree / "y.txt"), path_filter, interval=1) as watcher:
+        (mock_tree / "y.txt").write_text("changed")
+
+        assert watcher.changes() == {str(mock_tree / "y.txt")}
+
+
+@pytest.mark.skipif(watch._inotify() is None, reason="inotify is not available")
+def test_inotify_watcher_reads_until_the_end_of_its_events(mock_tree: Path) -> None:
+    with InotifyWatcher(str(mock_tree), Scanner().make_filter(mock_tree)) as watcher:
+        read, write = os.pipe()
+        os.write(write, b"events")
+        os.close(write)
+        os.close(watcher._fd)
+        watcher._fd = read
+
+        assert watcher._read() == b"events"
@@ -0,0 +1,17 @@
+import io
+
+from heatfile.console.colors import colors_enabled
+
+
+class Terminal(io.StringIO):
+    def isatty(self) -> bool:
+        return True
+
+
+def test_colors_enabled(monkeypatch) -> None:
+    monkeypatch.delenv("NO_COLOR", raising=False)
+
+    assert colors_enabled(Terminal())
+    assert not colors_enabled(io.StringIO())
+    monkeypatch.setenv("NO_COLOR", "1")
+    assert not colors_enabled(Terminal())
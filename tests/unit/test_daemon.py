@@ -0,0 +1,191 @@
+import os
+from pathlib import Path
+import socket
+import stat
+import tempfile
+import threading
+from typing import Any, Dict, Iterator, List, Tuple
+
+import pytest
+from pytest_mock import MockFixture
+
+from heatfile.console.commands import Tree
+from heatfile.console.daemon import Daemon, default_socket_path, query
+
+
+@pytest.fixture
+def daemon(tmp_path_factory) -> Iterator[Tuple[Daemon, Any]]:
+    root = tmp_path_factory.mktemp("root")
+    (root / "a").mkdir()
+    (root / "a" / "one.txt").write_text("test\ntest\n")
+    (root / "two.txt").write_text("test\n")
+    daemon = Daemon([root], str(tmp_path_factory.mktemp("socket") / "d.sock"))
+    server = daemon.bind()
+    daemon.warm()
+    yield daemon, server
+    server.close()
+
+
+def ask(
+    daemon: Daemon, server: Any, path: Path, search: str, options: Dict[str, Any]
+) -> int:
+    # The daemon answers the one query in a thread, like serve_forever does.
+    def answer() -> None:
+        connection, _ = server.accept()
+        with connection:
+            daemon.answer(connection)
+
+    thread = threading.Thread(target=answer)
+    thread.start()
+    try:
+        return query(daemon.socket_path, path, search, options, colors=False)
+    finally:
+        thread.join()
+
+
+def build_tree(path: Path, capsys: Any) -> str:
+    Tree.build_tree(path, "test", colors=False, use_cache=False)
+    return capsys.readouterr().out
+
+
+def test_daemon_answers_like_the_tree_command(daemon, capsys) -> None:
+    daemon, server = daemon
+    root = daemon.roots[0]
+    expected = build_tree(root, capsys)
+
+    assert ask(daemon, server, root, "test", {}) == 0
+    assert capsys.readouterr().out == expected
+    assert len(daemon.cache) == 2
+
+    (root / "two.txt").write_text("test test test\n")
+    expected = build_tree(root, capsys)
+
+    assert ask(daemon, server, root, "test", {}) == 0
+    assert capsys.readouterr().out == expected
+
+
+def test_daemon_refuses_paths_outside_its_roots(daemon, capsys, tmp_path) -> None:
+    daemon, server = daemon
+
+    assert ask(daemon, server, tmp_path, "test", {}) == 1
+    assert "is not under the roots" in capsys.readouterr().err
+    assert ask(daemon, server, daemon.roots[0], "test", {"watch": True}) == 2
+
+
+def test_daemon_refuses_a_socket_in_use(daemon) -> None:
+    daemon, _ = daemon
+
+    with pytest.raises(OSError, match="already listens"):
+        Daemon(daemon.roots, daemon.socket_path).bind()
+
+
+def test_daemon_answers_a_bad_request(daemon) -> None:
+    daemon, server = daemon
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(daemon.socket_path)
+        client.sendall(b"{}\n")
+        connection, _ = server.accept()
+        with connection:
+            daemon.answer(connection)
+        answers = client.makefile("rb").read().decode()
+
+    assert "Bad request" in answers
+    assert answers.endswith('{"exit": 2}\n')
+
+
+def test_daemon_clears_its_cache_when_asked(daemon) -> None:
+    daemon, server = daemon
+    root = daemon.roots[0]
+    ask(daemon, server, root / "a", "test", {})
+    ask(daemon, server, root / "two.txt", "test", {"rebuild_cache": True})
+
+    assert len(daemon.cache) == 1
+
+
+def test_query_fails_when_the_daemon_hangs_up(daemon) -> None:
+    daemon, server = daemon
+
+    def hang_up() -> None:
+        connection, _ = server.accept()
+        connection.close()
+
+    thread = threading.Thread(target=hang_up)
+    thread.start()
+    try:
+        with pytest.raises(ConnectionError):
+            query(daemon.socket_path, daemon.roots[0], "test", {}, colors=False)
+    finally:
+        thread.join()
+
+
+def test_daemon_replaces_a_stale_socket(daemon) -> None:
+    daemon, server = daemon
+    server.close()
+    # The socket is left behind, with no one listening on it.
+    assert os.path.exists(daemon.socket_path)
+
+    Daemon(daemon.roots, daemon.socket_path).bind().close()
+
+
+def test_daemon_serves_until_interrupted(daemon, mocker: MockFixture) -> None:
+    daemon, server = daemon
+    answer = Daemon.answer
+
+    def answer_once(self: Daemon, connection: socket.socket) -> None:
+        answer(self, connection)
+        raise KeyboardInterrupt
+
+    mocker.patch.object(Daemon, "answer", answer_once)
+    statuses = []  # type: List[int]
+    thread = threading.Thread(
+        target=lambda: statuses.append(
+            query(daemon.socket_path, daemon.roots[0], "test", {}, colors=False)
+        )
+    )
+    thread.start()
+    try:
+        with pytest.raises(KeyboardInterrupt):
+            daemon.serve_forever(server)
+    finally:
+        thread.join()
+
+    assert statuses == [0]
+    assert not os.path.exists(daemon.socket_path)
+
+
+@pytest.fixture
+def temporary_directory(monkeypatch, tmp_path: Path) -> Path:
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    return tmp_path / f"heatfile-{os.getuid()}"
+
+
+def test_default_socket_path_in_the_runtime_directory(monkeypatch, tmp_path) -> None:
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+
+    assert default_socket_path() == str(tmp_path / f"heatfile-{os.getuid()}.sock")
+
+
+def test_default_socket_path_in_a_private_directory(temporary_directory) -> None:
+    expected = str(temporary_directory / "heatfile.sock")
+
+    assert default_socket_path() == expected
+    assert stat.S_IMODE(temporary_directory.stat().st_mode) == 0o700
+    assert default_socket_path() == expected
+
+
+def test_default_socket_path_refuses_an_open_directory(temporary_directory) -> None:
+    temporary_directory.mkdir(mode=0o755)
+    temporary_directory.chmod(0o755)
+
+    with pytest.raises(OSError, match="private"):
+        default_socket_path()
+
+
+def test_default_socket_path_refuses_a_link(temporary_directory, tmp_path) -> None:
+    (tmp_path / "elsewhere").mkdir(mode=0o700)
+    temporary_directory.symlink_to(tmp_path / "elsewhere")
+
+    with pytest.raises(OSError, match="private"):
+        default_socket_path()
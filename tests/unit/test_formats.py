@@ -0,0 +1,140 @@
+import csv
+from io import StringIO
+import json
+from pathlib import Path
+from typing import List
+
+import pytest
+from pytest_mock import MockFixture
+
+from heatfile.console.commands import Tree
+from heatfile.console.commands.formats import NDJSONWriter, RecordWriter, WRITERS
+from heatfile.core.scanner import Scanner
+
+
+@pytest.fixture
+def mock_tree(tmp_path: Path) -> Path:
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "match.txt").write_text("test, test")
+    (tmp_path / "root.txt").write_text("nothing")
+    return tmp_path
+
+
+def expected_records(root: Path) -> List[dict]:
+    return [
+        {"path": str(root), "type": "directory", "depth": 0, "references": 0},
+        {"path": str(root / "a"), "type": "directory", "depth": 1, "references": 0},
+        {
+            "path": str(root / "a" / "match.txt"),
+            "type": "file",
+            "depth": 2,
+            "references": 2,
+        },
+    ]
+
+
+def write(output_format: str, root: Path, search_string: str = "test") -> str:
+    stream = StringIO()
+    result = Scanner(search_string, use_cache=False, top=1).scan(root)
+    WRITERS[output_format](stream, root).write(result, search_string)
+    return stream.getvalue()
+
+
+def test_json(mock_tree: Path) -> None:
+    document = json.loads(write("json", mock_tree))
+
+    assert document["nodes"] == expected_records(mock_tree)
+    assert document["summary"] == {
+        "directories": 2,
+        "files": 1,
+        "references": 2,
+        "skipped_files": 0,
+        "skipped_bytes": 0,
+        "hottest_files": [
+            {"path": str(mock_tree / "a" / "match.txt"), "references": 2}
+        ],
+        "hottest_directories": [{"path": str(mock_tree / "a"), "references": 2}],
+    }
+
+
+def test_json_without_nodes(mock_tree: Path) -> None:
+    assert json.loads(write("json", mock_tree, "missing"))["nodes"] == []
+
+
+def test_ndjson(mock_tree: Path) -> None:
+    records = [json.loads(line) for line in write("ndjson", mock_tree).splitlines()]
+
+    assert records[:-1] == expected_records(mock_tree)
+    assert records[-1]["type"] == "summary"
+    assert records[-1]["references"] == 2
+
+
+def test_csv(mock_tree: Path) -> None:
+    rows = list(csv.DictReader(StringIO(write("csv", mock_tree))))
+
+    assert rows == [
+        {key: str(value) for key, value in record.items()}
+        for record in expected_records(mock_tree)
+    ]
+
+
+def test_records_are_written_in_batches(mock_tree: Path, mocker: MockFixture) -> None:
+    mocker.patch.object(RecordWriter, "_batch_size", 1)
+    stream = StringIO()
+    write_to_stream = mocker.spy(stream, "write")
+
+    NDJSONWriter(stream, mock_tree).write(Scanner().scan(mock_tree), None)
+
+    assert write_to_stream.call_count == 5
+    assert [json.loads(line) for line in stream.getvalue().splitlines()][:3] == [
+        {**record, "references": 0} for record in expected_records(mock_tree)
+    ]
+
+
+def test_build_tree_with_format(mock_tree: Path, capsys) -> None:
+    Tree.build_tree(mock_tree, "test", output_format="ndjson", use_cache=False)
+
+    captured = capsys.readouterr()
+
+    assert json.loads(captured.out.splitlines()[0])["path"] == str(mock_tree)
+    assert "references found" not in captured.out
+
+
+def test_records_have_the_match_locations(mock_tree: Path) -> None:
+    stream = StringIO()
+    result = Scanner("test", show_matches=True).scan(mock_tree)
+    NDJSONWriter(stream, mock_tree).write(result, "test")
+
+    record = json.loads(stream.getvalue().splitlines()[2])
+
+    assert record["matches"] == [
+        {"line": 1, "column": 1, "text": "test, test", "before": [], "after": []},
+        {"line": 1, "column": 7, "text": "test, test", "before": [], "after": []},
+    ]
+
+
+def test_records_have_the_references_of_each_string(mock_tree: Path) -> None:
+    stream = StringIO()
+    search_strings = ["test", "nothing", "none"]
+    result = Scanner(search_strings).scan(mock_tree)
+    NDJSONWriter(stream, mock_tree).write(result, search_strings)
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    assert records[2]["pattern_references"] == {"test": 2, "nothing": 0, "none": 0}
+    assert records[-1]["pattern_references"] == {"test": 2, "nothing": 1, "none": 0}
+
+
+def test_summary_has_the_stats(mock_tree: Path) -> None:
+    stream = StringIO()
+    result = Scanner("test", use_cache=False, stats=True).scan(mock_tree)
+    WRITERS["json"](stream, mock_tree).write(result, "test")
+    stats = json.loads(stream.getvalue())["summary"]["stats"]
+
+    assert stats["directories_listed"] == 2
+    assert stats["files_read"] == 2
+    assert stats["render_seconds"] >= 0
+    assert {file["path"] for file in stats["slowest_files"]} == {
+        str(mock_tree / "a" / "match.txt"),
+        str(mock_tree / "root.txt"),
+    }
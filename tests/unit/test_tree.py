@@ -1,21 +1,23 @@
 import logging
 from pathlib import Path
+from typing import cast, Iterable, Iterator
 from unittest.mock import Mock
+import zipfile
 
+from colorama import Fore, Style
 import pytest
 from pytest_mock import MockFixture
 
 from heatfile.console.commands import Tree
+from heatfile.core.scanner import Node, Scanner
 from .helpers import get_tree_line, tree_line
 
 logger = logging.getLogger(__name__)
 
 
-@pytest.fixture
-def mock_get_previous_parents(mocker: MockFixture) -> Mock:
-    return mocker.patch(
-        "heatfile.console.commands.tree.Tree._get_previous_parents", autospec=True
-    )
+def trees(nodes: Iterable[Node]) -> Iterator[Tree]:
+    # The nodes of a scan with node_class=Tree.
+    return cast(Iterator[Tree], iter(nodes))
 
 
 @pytest.fixture
@@ -28,8 +30,8 @@ def mock_validate_inputs(mocker: MockFixture) -> Mock:
 def test_make_only_tree(mock_current_directory_path: Path) -> None:
     directories_expected = 0
     files_expected = 0
-    result = Tree._make_only_tree(mock_current_directory_path)
-    for line in result:
+    result = Scanner(node_class=Tree).scan(mock_current_directory_path)
+    for line in trees(result):
         display_name = get_tree_line(tree_line(line))
         assert isinstance(line, Tree)
         assert line.display_name == display_name
@@ -41,63 +43,42 @@ def test_make_only_tree(mock_current_directory_path: Path) -> None:
 
 
 def test_make_tree_with_references_from_directory(
-    mock_get_previous_parents: Mock,
     mock_current_directory_path: Path,
     mock_search_string: str,
 ) -> None:
     directories_expected = 0
     files_expected = 0
-    result = Tree._make_tree_with_references(
-        path=mock_current_directory_path, search_string=mock_search_string
+    result = Scanner(mock_search_string, node_class=Tree).scan(
+        mock_current_directory_path
     )
-    for line in result:
+    for line in trees(result):
         display_name = get_tree_line(tree_line(line))
-        args, _ = mock_get_previous_parents.call_args
 
         assert isinstance(line, Tree)
-
-        if Path(line.path).is_dir():
-            assert line in line._found_directories
-
-        if not line._found_directories.get(line.parent_path):
-            if line.parent_path is None:
-                assert Tree._get_previous_parents(line).call_args is None
-            else:
-                assert isinstance(args[0], Tree)
-
-        assert line._mount_tree_line() == tree_line(line, line._string_references)
-        assert mock_get_previous_parents.called
+        assert line._mount_tree_line() == tree_line(line, line.references)
         assert line.display_name == display_name
-        directories_expected += 1
-        files_expected += 1
-    assert directories_expected > 0
-    assert files_expected > 0
+        if line.is_dir:
+            directories_expected += 1
+        else:
+            files_expected += 1
+            assert line.references > 0
+    assert directories_expected == result.directories_count > 0
+    assert files_expected == result.files_count > 0
 
 
-def test_make_tree_with_references_from_file(
-    mock_get_previous_parents: Mock, mock_path_with_file: Path
-) -> None:
+def test_make_tree_with_references_from_file(mock_path_with_file: Path) -> None:
     files_expected = 0
-    result = Tree._make_tree_with_references(
-        path=mock_path_with_file, search_string="tree",
-    )
-    for line in result:
+    result = Scanner("tree", node_class=Tree).scan(mock_path_with_file)
+    for line in trees(result):
         display_name = get_tree_line(tree_line(line))
-        args, _ = mock_get_previous_parents.call_args
 
         assert isinstance(line, Tree)
-
-        if not line._found_directories.get(line.parent_path):
-            if line.parent_path is None:
-                assert Tree._get_previous_parents(line).call_args is None
-            else:
-                assert isinstance(args[0], Tree)
-
-        assert mock_get_previous_parents.called
-        assert line._mount_tree_line() == tree_line(line, line._string_references)
+        assert line.parent_path is not None
+        assert line._mount_tree_line() == tree_line(line, line.references)
         assert line.display_name == display_name
         files_expected += 1
-    assert files_expected > 0
+    assert files_expected == result.files_count == 1
+    assert result.directories_count == 0
 
 
 def test_build_tree_without_search_string(
@@ -163,3 +144,209 @@ def test_fails_build_tree_for_a_nonexistent_path(
     assert SystemExit()
     assert mock_validate_inputs.called
     assert "Directory/File not found." == caplog.messages[0]
+
+
+@pytest.mark.parametrize("pool", ["thread", "process"])
+def test_make_tree_with_references_in_parallel_keeps_output(
+    mock_current_directory_path: Path, mock_search_string: str, pool: str
+) -> None:
+    serial = [
+        line._mount_tree_line()
+        for line in trees(
+            Scanner(mock_search_string, node_class=Tree).scan(
+                mock_current_directory_path
+            )
+        )
+    ]
+    scanner = Scanner(mock_search_string, jobs=2, pool=pool, node_class=Tree)
+    parallel = [
+        line._mount_tree_line()
+        for line in trees(scanner.scan(mock_current_directory_path))
+    ]
+
+    assert parallel == serial
+
+
+def test_build_tree_with_fixed_strings(
+    mock_current_directory_path: Path, capsys
+) -> None:
+    Tree.build_tree(mock_current_directory_path, "Tree(", mode="fixed")
+
+    captured = capsys.readouterr()
+
+    assert "references found." in captured.out
+
+
+def test_make_only_tree_does_not_stat_entries(
+    mock_current_directory_path: Path, mocker: MockFixture
+) -> None:
+    is_dir = mocker.spy(Path, "is_dir")
+    lines = list(trees(Scanner(node_class=Tree).scan(mock_current_directory_path)))
+
+    assert all(line._mount_tree_line() for line in lines)
+    assert is_dir.call_count == 0
+
+
+def test_build_tree_twice_prints_the_same_totals(
+    mock_current_directory_path: Path, mock_search_string: str, capsys
+) -> None:
+    Tree.build_tree(mock_current_directory_path, mock_search_string)
+    first = capsys.readouterr().out
+    Tree.build_tree(mock_current_directory_path, mock_search_string)
+    second = capsys.readouterr().out
+
+    assert first == second
+
+
+def test_write_lines_in_batches(
+    mock_current_directory_path: Path, mocker: MockFixture, capsys
+) -> None:
+    mocker.patch.object(Tree, "_output_batch_size", 3)
+    lines = list(trees(Scanner(node_class=Tree).scan(mock_current_directory_path)))
+    Tree._write_lines(lines)
+
+    captured = capsys.readouterr()
+
+    assert captured.out.splitlines() == [line._mount_tree_line() for line in lines]
+
+
+def test_build_tree_reports_skipped_binary_files(tmp_path: Path, capsys) -> None:
+    (tmp_path / "notes.txt").write_text("test")
+    (tmp_path / "image.png").write_bytes(b"\x89PNG test")
+    Tree.build_tree(tmp_path, "test")
+
+    captured = capsys.readouterr()
+
+    assert "image.png" not in captured.out
+    assert "1 binary files skipped (9 bytes)." in captured.out
+
+
+def test_build_tree_reports_the_hottest_files(tmp_path: Path, capsys) -> None:
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "hot.txt").write_text("test " * 12)
+    (tmp_path / "cold.txt").write_text("test")
+    Tree.build_tree(tmp_path, "test", heat=True, top=1, colors=True)
+
+    captured = capsys.readouterr()
+
+    assert f"{Fore.CYAN}(12){Style.RESET_ALL}" in captured.out
+    assert f"Hottest files:{Style.RESET_ALL}\n          12  sub/hot.txt" in captured.out
+    assert f"Hottest directories:{Style.RESET_ALL}\n          12  sub/" in captured.out
+
+
+def test_build_tree_shows_matches_with_context(tmp_path: Path, capsys) -> None:
+    (tmp_path / "a.txt").write_text("one\ntwo test\nthree\nfour\nfive\nsix test\n")
+    (tmp_path / "b.txt").write_text("test")
+    Tree.build_tree(tmp_path, "test", show_matches=True, context=1)
+
+    captured = capsys.readouterr()
+
+    assert (
+        "├── a.txt (2)\n│   1- one\n│   2:5: two test\n│   3- three\n│   --\n"
+        + "│   5- five\n│   6:5: six test\n└── b.txt (1)\n    1:1: test\n"
+    ) in captured.out
+
+
+def test_build_tree_shows_every_match_within_context(tmp_path: Path, capsys) -> None:
+    (tmp_path / "a.txt").write_text("foo\nbar\nfoo x\nfoo foo\n")
+    Tree.build_tree(tmp_path, "foo", show_matches=True, context=2)
+
+    captured = capsys.readouterr()
+
+    assert (
+        "└── a.txt (4)\n    1:1: foo\n    2- bar\n    3:1: foo x\n"
+        + "    4:1: foo foo\n    4:5: foo foo\n"
+    ) in captured.out
+
+
+def test_build_tree_counts_each_search_string(tmp_path: Path, capsys) -> None:
+    (tmp_path / "a.txt").write_text("foo bar foo")
+    (tmp_path / "b.txt").write_text("bar")
+    Tree.build_tree(tmp_path, ["foo", "bar", "baz"], use_cache=False)
+
+    captured = capsys.readouterr()
+
+    assert "├── a.txt (3) [foo: 2, bar: 1]\n└── b.txt (1) [bar: 1]\n" in captured.out
+    assert "4 references found.\n           2  foo\n           2  bar\n" in captured.out
+    assert "           0  baz\n" in captured.out
+
+
+def test_build_tree_watches_the_changed_files(
+    tmp_path: Path, capsys, mocker: MockFixture
+) -> None:
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "x.txt").write_text("test")
+    (tmp_path / "y.txt").write_text("test")
+    watcher = mocker.patch("heatfile.core.watch.open_watcher").return_value
+    watcher.__enter__.return_value = watcher
+
+    def change() -> set:
+        (tmp_path / "a" / "x.txt").write_text("test test test")
+        watcher.changes.side_effect = KeyboardInterrupt
+        return {str(tmp_path / "a" / "x.txt")}
+
+    watcher.changes.side_effect = change
+    Tree.build_tree(tmp_path, "test", watch=True, use_cache=False)
+
+    captured = capsys.readouterr()
+
+    assert "a/x.txt (1 -> 3)\na/ (3)\n" in captured.out
+    assert "4 references found." in captured.out
+
+
+def test_build_tree_colors_only_terminals(tmp_path: Path, capsys) -> None:
+    (tmp_path / "a.txt").write_text("test")
+    Tree.build_tree(tmp_path, "test", heat=True)
+
+    captured = capsys.readouterr()
+
+    assert "\x1b[" not in captured.out
+    assert "└── a.txt (1)\n\n1 references found.\n" in captured.out
+
+
+def test_build_tree_reports_stats(tmp_path: Path, capsys) -> None:
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "a.txt").write_text("test")
+    (tmp_path / "b.txt").write_text("nothing")
+    Tree.build_tree(tmp_path, "test", stats=True, use_cache=False)
+
+    captured = capsys.readouterr()
+
+    assert "\n2 directories, 1 files\n\nStats:\n           2  directories listed\n" in (
+        captured.out
+    )
+    assert "           2  files read\n          11  bytes read\n" in captured.out
+    assert " s  regex matching\n" in captured.out
+    assert "\nSlowest files:\n" in captured.out
+    assert " s  sub/a.txt\n" in captured.out
+
+
+def test_build_tree_lists_files_with_matches(tmp_path: Path, capsys) -> None:
+    (tmp_path / "a.txt").write_text("test test")
+    (tmp_path / "b.txt").write_text("none")
+    Tree.build_tree(tmp_path, "test", files_with_matches=True)
+
+    captured = capsys.readouterr()
+
+    assert "├── a.txt \n\n1 files with matches.\n" in captured.out
+
+
+def test_validate_inputs_reports_other_errors(tmp_path: Path, caplog) -> None:
+    Tree._validate_inputs(tmp_path, "test", PermissionError("Permission denied"))
+
+    assert caplog.messages[-1] == "Permission denied"
+
+
+def test_build_tree_shows_the_members_of_archives(tmp_path: Path, capsys) -> None:
+    with zipfile.ZipFile(tmp_path / "a.zip", "w") as archive:
+        archive.writestr("docs/b.txt", "one test\ntwo test\n")
+        archive.writestr("c.txt", "test")
+    Tree.build_tree(tmp_path, "test", search_compressed=True, show_matches=True)
+
+    captured = capsys.readouterr()
+
+    assert (
+        "└── a.zip (3)\n    ├── c.txt (1)\n    │   1:1: test\n    └── docs/ \n"
+        + "        └── b.txt (2)\n            1:5: one test\n            2:5: two test\n"
+    ) in captured.out
+    assert "2 directories, 3 files" in captured.out